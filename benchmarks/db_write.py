@@ -0,0 +1,376 @@
+"""
+Rows per second and latency of the database write path: the upserts in planning_applications/db.py, run the way
+PostgresPipeline runs them. Each application is written with its documents and geometry in one transaction, and each
+appeal and appeal document in its own.
+
+Creates a scratch database on DATABASE_URL's server, loads db/db.sql into it, and runs three workloads in turn:
+
+- insert: every application, document, geometry, appeal and appeal document is new
+- update: the same rows again with some columns changed, so every upsert takes the ON CONFLICT path
+- mixed: half of the applications and appeals again, interleaved with as many new ones
+
+Each upsert, and each transaction from its first upsert to its commit, is timed. Results can be saved with `--output`
+and compared with a saved run with `--baseline`, to measure a change to the write path. The scratch database is
+dropped at the end unless `--keep` is passed. DATABASE_URL's own database isn't touched, but its user needs CREATEDB.
+
+    python benchmarks/db_write.py
+    python benchmarks/db_write.py --applications 1000 --documents 20 --output before.json
+    python benchmarks/db_write.py --applications 1000 --documents 20 --baseline before.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import psycopg  # noqa: E402
+from psycopg.conninfo import conninfo_to_dict, make_conninfo  # noqa: E402
+
+from planning_applications.db import (  # noqa: E402
+    upsert_planning_application,
+    upsert_planning_application_appeal,
+    upsert_planning_application_appeal_document,
+    upsert_planning_application_document,
+    upsert_planning_application_geometry,
+)
+from planning_applications.items import (  # noqa: E402
+    PlanningApplication,
+    PlanningApplicationAppeal,
+    PlanningApplicationAppealDocument,
+    PlanningApplicationDocument,
+    PlanningApplicationGeometry,
+)
+from planning_applications.utils import getenv  # noqa: E402
+
+SCHEMA = Path(__file__).resolve().parent.parent / "db" / "db.sql"
+
+LPA = "benchmark"
+FIRST_CASE_ID = 3_000_000
+STATUSES = ("Pending Consideration", "Decided")
+DOCUMENT_TYPES = ("Plans", "Site Location Plan", "Design and Access Statement", "Decision Notice")
+
+WORKLOADS = ("insert", "update", "mixed")
+
+# What each row written is counted under, in the order they're reported
+FUNCTIONS = (
+    "upsert_planning_application",
+    "upsert_planning_application_document",
+    "upsert_planning_application_geometry",
+    "upsert_planning_application_appeal",
+    "upsert_planning_application_appeal_document",
+)
+TRANSACTION = "transaction"
+
+
+# Rows
+# -------------------------------------------------------------------------------------------------
+
+
+def make_application(number: int, documents: int, revision: int) -> PlanningApplication:
+    """Application `number`, with `documents` documents and a geometry. Each `revision` changes some columns."""
+    reference = f"24/{number:06d}/FUL"
+    validated = datetime(2024, 1, 1) + timedelta(days=number % 365)
+    url = f"https://planning.example.gov.uk/online-applications/applicationDetails.do?keyVal=BENCH{number}"
+
+    x, y = -1.5 + (number % 1000) / 10000, 52.0 + (number // 1000) / 10000
+    ring = [[x, y], [x + 0.0005, y], [x + 0.0005, y + 0.0005], [x, y + 0.0005], [x, y]]
+
+    return PlanningApplication(
+        lpa=LPA,
+        reference=reference,
+        website_reference=f"BENCH{number}",
+        url=url,
+        submitted_date=validated - timedelta(days=3),
+        validated_date=validated,
+        address=f"{number} High Street, Exampletown, EX1 {number % 10}AB",
+        description=f"Erection of a single storey rear extension and associated works (revision {revision})",
+        application_status=STATUSES[revision % 2],
+        application_decision="Grant Permission" if revision % 2 else None,
+        application_decision_date=validated + timedelta(days=56) if revision % 2 else None,
+        application_type="Full Planning Permission",
+        expected_decision_level="Delegated",
+        actual_decision_level="Delegated" if revision % 2 else None,
+        case_officer="A Planner",
+        parish="Exampletown",
+        ward="Central",
+        district_reference=reference,
+        applicant_name="A Applicant",
+        applicant_address=f"{number} High Street, Exampletown",
+        is_active=not revision % 2,
+        documents=[
+            PlanningApplicationDocument(
+                lpa=LPA,
+                application_reference=reference,
+                url=f"https://planning.example.gov.uk/online-applications/files/BENCH{number}/{d}.pdf",
+                date_published=validated + timedelta(days=d % 30),
+                document_type=DOCUMENT_TYPES[d % len(DOCUMENT_TYPES)],
+                description=f"Document {d} for {reference} (revision {revision})",
+                drawing_number=f"{reference}-{d:03d}",
+            )
+            for d in range(documents)
+        ],
+        geometry=PlanningApplicationGeometry(
+            lpa=LPA,
+            application_reference=reference,
+            reference=reference,
+            geometry=json.dumps({"type": "Polygon", "coordinates": [ring]}),
+        ),
+    )
+
+
+def make_appeal(number: int, documents: int, revision: int) -> Tuple[PlanningApplicationAppeal, List]:
+    case_id = FIRST_CASE_ID + number
+    reference = f"APP/Q1234/W/24/{case_id}"
+    started = datetime(2024, 1, 1) + timedelta(days=number % 365)
+
+    appeal = PlanningApplicationAppeal(
+        lpa=LPA,
+        url=f"https://acp.planninginspectorate.gov.uk/ViewCase.aspx?caseid={case_id}",
+        reference=reference,
+        case_id=case_id,
+        appellant_name="A Appellant",
+        agent_name="An Agent",
+        site_address=f"{number} High Street, Exampletown",
+        case_type="Planning Appeal (W)",
+        case_officer="An Inspector",
+        procedure="Written Representations",
+        status="Complete" if revision % 2 else "Valid",
+        decision="Dismissed" if revision % 2 else None,
+        start_date=started,
+        questionnaire_due_date=started + timedelta(days=7),
+        statement_due_date=started + timedelta(days=35),
+        final_comments_due_date=started + timedelta(days=49),
+        decision_date=started + timedelta(days=120) if revision % 2 else None,
+        linked_case_ids=[case_id + 1] if number % 10 == 0 else None,
+    )
+    appeal_documents = [
+        PlanningApplicationAppealDocument(
+            appeal_case_id=case_id,
+            reference=reference,
+            name=f"Document {d} (revision {revision})",
+            url=f"https://acp.planninginspectorate.gov.uk/ViewDocument.aspx?fileid={case_id}{d:03d}",
+        )
+        for d in range(documents)
+    ]
+    return appeal, appeal_documents
+
+
+def workload_numbers(workload: str, count: int) -> Iterator[Tuple[int, int]]:
+    """The (row number, revision) of each application or appeal written by `workload`, in order."""
+    if workload == "insert":
+        for number in range(count):
+            yield number, 0
+    elif workload == "update":
+        for number in range(count):
+            yield number, 1
+    else:
+        # Rows written by both earlier workloads, alternating with ones that aren't in the database yet
+        for i in range(count // 2):
+            yield i, 2
+            yield count + i, 0
+
+
+# Running
+# -------------------------------------------------------------------------------------------------
+
+
+class Timings:
+    def __init__(self):
+        self.seconds: Dict[str, List[float]] = defaultdict(list)
+
+    def run(self, name: str, function: Callable, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        self.seconds[name].append(time.perf_counter() - started)
+        return result
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        summary = {}
+        for name in FUNCTIONS + (TRANSACTION,):
+            seconds = self.seconds.get(name)
+            if not seconds:
+                continue
+            percentiles = (
+                statistics.quantiles(seconds, n=100, method="inclusive") if len(seconds) > 1 else seconds * 99
+            )
+            # Each function's rate is over the time spent in it, and all rows' over the whole workload
+            summary[name] = {
+                "rows": len(seconds),
+                "rows_per_second": round(len(seconds) / sum(seconds), 1),
+                "p50_ms": round(percentiles[49] * 1000, 3),
+                "p99_ms": round(percentiles[98] * 1000, 3),
+            }
+        rows = sum(len(self.seconds[name]) for name in FUNCTIONS)
+        summary["all rows"] = {"rows": rows, "rows_per_second": round(rows / elapsed, 1)}
+        return summary
+
+
+def write_application(connection: psycopg.Connection, timings: Timings, application: PlanningApplication):
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        uuid, _ = timings.run("upsert_planning_application", upsert_planning_application, cursor, application)
+        for document in application.documents:
+            timings.run(
+                "upsert_planning_application_document", upsert_planning_application_document, cursor, uuid, document
+            )
+        timings.run(
+            "upsert_planning_application_geometry",
+            upsert_planning_application_geometry,
+            cursor,
+            uuid,
+            application.geometry,
+        )
+    connection.commit()
+    timings.seconds[TRANSACTION].append(time.perf_counter() - started)
+
+
+def write_appeal(
+    connection: psycopg.Connection,
+    timings: Timings,
+    appeal: PlanningApplicationAppeal,
+    appeal_documents: List[PlanningApplicationAppealDocument],
+):
+    with connection.cursor() as cursor:
+        started = time.perf_counter()
+        timings.run("upsert_planning_application_appeal", upsert_planning_application_appeal, cursor, appeal)
+        connection.commit()
+        timings.seconds[TRANSACTION].append(time.perf_counter() - started)
+
+        for document in appeal_documents:
+            started = time.perf_counter()
+            timings.run(
+                "upsert_planning_application_appeal_document",
+                upsert_planning_application_appeal_document,
+                cursor,
+                document,
+            )
+            connection.commit()
+            timings.seconds[TRANSACTION].append(time.perf_counter() - started)
+
+
+def run_workload(connection: psycopg.Connection, workload: str, args: argparse.Namespace) -> Dict:
+    timings = Timings()
+    generating = 0.0
+    started = time.perf_counter()
+
+    for number, revision in workload_numbers(workload, args.applications):
+        generated = time.perf_counter()
+        application = make_application(number, args.documents, revision)
+        generating += time.perf_counter() - generated
+        write_application(connection, timings, application)
+
+    for number, revision in workload_numbers(workload, args.appeals):
+        generated = time.perf_counter()
+        appeal, appeal_documents = make_appeal(number, args.appeal_documents, revision)
+        generating += time.perf_counter() - generated
+        write_appeal(connection, timings, appeal, appeal_documents)
+
+    # Making the items isn't part of the write path
+    elapsed = time.perf_counter() - started - generating
+    return {"seconds": round(elapsed, 3), "functions": timings.summary(elapsed)}
+
+
+def scratch_database_url(database_url: str, name: str) -> str:
+    return make_conninfo(**{**conninfo_to_dict(database_url), "dbname": name})
+
+
+def create_database(database_url: str, name: str):
+    with psycopg.connect(database_url, autocommit=True) as admin:
+        admin.execute(f'DROP DATABASE IF EXISTS "{name}"')
+        admin.execute(f'CREATE DATABASE "{name}"')
+
+    with psycopg.connect(scratch_database_url(database_url, name)) as connection:
+        connection.execute(SCHEMA.read_text())
+
+
+def drop_database(database_url: str, name: str):
+    with psycopg.connect(database_url, autocommit=True) as admin:
+        admin.execute(f'DROP DATABASE IF EXISTS "{name}"')
+
+
+# Reporting
+# -------------------------------------------------------------------------------------------------
+
+
+def change(value: float, baseline: float) -> str:
+    return f"{(value - baseline) / baseline * 100:+.1f}%" if baseline else ""
+
+
+def print_results(results: Dict, baseline: Dict):
+    for workload, result in results["workloads"].items():
+        print(f"\n{workload}: {result['seconds']:.1f}s")
+        print(f"  {'':<44} {'rows':>9} {'rows/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, summary in result["functions"].items():
+            line = f"  {name:<44} {summary['rows']:>9} {summary['rows_per_second']:>10.1f}"
+            if "p99_ms" in summary:
+                line += f" {summary['p50_ms']:>8.3f} {summary['p99_ms']:>8.3f}"
+
+            before = baseline.get("workloads", {}).get(workload, {}).get("functions", {}).get(name)
+            if before:
+                line += f"   rows/s {change(summary['rows_per_second'], before['rows_per_second']):>7}"
+                if "p99_ms" in summary and "p99_ms" in before:
+                    line += f"  p99 {change(summary['p99_ms'], before['p99_ms']):>7}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the database upserts against a scratch database")
+    parser.add_argument("--applications", type=int, default=10_000, help="Applications (default 10000)")
+    parser.add_argument("--documents", type=int, default=200, help="Documents per application (default 200)")
+    parser.add_argument("--appeals", type=int, default=1_000, help="Appeals (default 1000)")
+    parser.add_argument("--appeal-documents", type=int, default=20, help="Documents per appeal (default 20)")
+    parser.add_argument(
+        "--workloads",
+        nargs="+",
+        choices=WORKLOADS,
+        default=list(WORKLOADS),
+        help="Workloads to run, in order (default all)",
+    )
+    parser.add_argument(
+        "--database",
+        default="planning_applications_benchmark",
+        help="Scratch database to create (default %(default)s)",
+    )
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards")
+    parser.add_argument("--output", type=Path, help="Save the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="Compare with the results saved by an earlier --output")
+    args = parser.parse_args()
+
+    database_url = getenv("DATABASE_URL")
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+
+    create_database(database_url, args.database)
+    try:
+        results = {
+            "applications": args.applications,
+            "documents": args.documents,
+            "appeals": args.appeals,
+            "appeal_documents": args.appeal_documents,
+            "workloads": {},
+        }
+        with psycopg.connect(scratch_database_url(database_url, args.database)) as connection:
+            for workload in args.workloads:
+                results["workloads"][workload] = run_workload(connection, workload, args)
+    finally:
+        if not args.keep:
+            drop_database(database_url, args.database)
+
+    print(
+        f"{args.applications} applications with {args.documents} documents each, "
+        f"{args.appeals} appeals with {args.appeal_documents} documents each"
+    )
+    print_results(results, baseline)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+A fake Idox Public Access server, with ArcGIS geometries, for load testing the Idox spider and the pipelines without
+touching real councils.
+
+Serves `--councils` councils under /loadtest_<n>/, each with `--applications` applications validated over the
+`--days` days up to today. Each council has the advanced search form, the paged search results (with the results per
+page selector), the summary, details and documents tabs, and the ArcGIS `FeatureServer/2/query` GeoJSON. Responses
+take `--latency` seconds on average, and `--error-rate` of them are 503s.
+
+    python benchmarks/fake_idox.py --port 8800
+    python benchmarks/fake_idox.py --councils 10 --applications 2000 --latency 0.2 --error-rate 0.02
+
+benchmarks/idox_load.py starts it and crawls it with the whole stack.
+"""
+
+import argparse
+import json
+import random
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+from html import escape
+from typing import Dict, List, NamedTuple, Set, Tuple
+from urllib.parse import quote
+
+from twisted.web.resource import Resource
+from twisted.web.server import NOT_DONE_YET, Site
+
+# The reactor is imported where it's used, so that importing this (as benchmarks/idox_load.py does) doesn't install
+# Twisted's default reactor before Scrapy installs the asyncio one
+
+COUNCIL_PREFIX = "loadtest_"
+
+RESULTS_PER_PAGE_OPTIONS = (10, 25, 50, 100)
+
+ARCGIS_PATH = "server/rest/services/PALIVE/LIVEUniformPA_Planning/FeatureServer/2/query"
+
+STATUSES = ("Pending Consideration", "Awaiting decision", "Decided", "Withdrawn")
+DOCUMENT_TYPES = ("Application Form", "Plans", "Site Location Plan", "Design and Access Statement", "Decision Notice")
+
+
+class Application(NamedTuple):
+    keyval: str
+    reference: str
+    received: date
+    validated: date
+    address: str
+    proposal: str
+    status: str
+    easting: float
+    northing: float
+
+
+def council_name(number: int) -> str:
+    return f"{COUNCIL_PREFIX}{number}"
+
+
+def make_applications(council: str, applications: int, days: int, today: date) -> List[Application]:
+    """`applications` applications for `council`, spread evenly over the `days` days to `today`, newest first."""
+    rng = random.Random(council)
+    result = []
+    for i in range(applications):
+        validated = today - timedelta(days=i * days // max(applications, 1))
+        result.append(
+            Application(
+                keyval=f"LT{council.removeprefix(COUNCIL_PREFIX)}X{i:07d}",
+                reference=f"{validated:%y}/{i:05d}/FUL",
+                received=validated - timedelta(days=rng.randint(0, 14)),
+                validated=validated,
+                address=f"{rng.randint(1, 200)} High Street, {council.title()}",
+                proposal=f"Erection of a single storey rear extension and associated works ({i})",
+                status=rng.choice(STATUSES),
+                easting=-1.5 + rng.random(),
+                northing=51.0 + rng.random(),
+            )
+        )
+    return result
+
+
+def idox_date(value: date) -> str:
+    return value.strftime("%a %d %b %Y")
+
+
+class Search(NamedTuple):
+    start: date
+    end: date
+    results_per_page: int
+
+
+class FakeCouncil(Resource):
+    """One council's Idox Public Access site and ArcGIS server."""
+
+    isLeaf = True
+
+    def __init__(self, name: str, applications: List[Application], documents: int, root: "FakeIdoxServer"):
+        super().__init__()
+        self.name = name
+        self.applications = applications
+        self.by_keyval = {application.keyval: application for application in applications}
+        self.documents = documents
+        self.root = root
+        # Like Idox, the search being paged through is kept in the session
+        self.searches: Dict[str, Search] = {}
+        self.tokens: Set[str] = set()
+
+    def render(self, request):
+        from twisted.internet import reactor
+
+        delay = random.expovariate(1 / self.root.latency) if self.root.latency else 0
+        call = reactor.callLater(delay, self._respond, request)
+        # The crawler gave up waiting
+        request.notifyFinish().addErrback(lambda _: call.active() and call.cancel())
+        return NOT_DONE_YET
+
+    def _respond(self, request):
+        if random.random() < self.root.error_rate:
+            status, content_type, body = 503, "text/html", "<html><body>Service Unavailable</body></html>"
+        else:
+            status, content_type, body = self._route(request)
+
+        request.setResponseCode(status)
+        request.setHeader(b"Content-Type", f"{content_type}; charset=utf-8".encode())
+        request.write(body.encode())
+        request.finish()
+
+    def _route(self, request) -> Tuple[int, str, str]:
+        path = "/".join(segment.decode() for segment in request.postpath)
+        args = {key.decode(): values[0].decode() for key, values in request.args.items()}
+
+        if path == ARCGIS_PATH:
+            return 200, "application/json", self._arcgis(args)
+        if path == "online-applications/search.do":
+            return 200, "text/html", self._search_form()
+        if path == "online-applications/advancedSearchResults.do":
+            return self._first_page(request, args)
+        if path == "online-applications/pagedSearchResults.do":
+            return self._results_page(request, args)
+        if path == "online-applications/applicationDetails.do":
+            application = self.by_keyval.get(args.get("keyVal", ""))
+            tab = args.get("activeTab")
+            if application and tab == "summary":
+                return 200, "text/html", self._summary_tab(application)
+            if application and tab == "details":
+                return 200, "text/html", self._details_tab(application)
+            if application and tab == "documents":
+                return 200, "text/html", self._documents_tab(application)
+
+        return 404, "text/html", "<html><body>Not Found</body></html>"
+
+    # Search
+    # -------------------------------------------------------------------------
+
+    def _session(self, request) -> str:
+        session = request.getCookie(b"JSESSIONID")
+        if session:
+            return session.decode()
+
+        session = uuid.uuid4().hex
+        request.addCookie(b"JSESSIONID", session.encode(), path=f"/{self.name}/".encode())
+        return session
+
+    def _search_form(self) -> str:
+        token = uuid.uuid4().hex
+        self.tokens.add(token)
+        return f"""<html><body>
+<form id="advancedSearchForm" method="post" action="/{self.name}/online-applications/advancedSearchResults.do?action=firstPage">
+    <input type="hidden" name="_csrf" value="{token}" />
+    <input type="text" name="reference" value="" />
+    <input type="text" name="date(applicationValidatedStart)" value="" />
+    <input type="text" name="date(applicationValidatedEnd)" value="" />
+    <input type="hidden" name="searchType" value="Application" />
+    <input type="hidden" name="caseAddressType" value="Application" />
+</form>
+</body></html>"""
+
+    def _first_page(self, request, args: Dict[str, str]) -> Tuple[int, str, str]:
+        if args.get("_csrf") not in self.tokens:
+            return 403, "text/html", "<html><body>Forbidden</body></html>"
+
+        try:
+            start = datetime.strptime(args["date(applicationValidatedStart)"], "%d/%m/%Y").date()
+            end = datetime.strptime(args["date(applicationValidatedEnd)"], "%d/%m/%Y").date()
+        except (KeyError, ValueError):
+            return 200, "text/html", self._search_form()
+
+        session = self._session(request)
+        self.searches[session] = Search(start, end, RESULTS_PER_PAGE_OPTIONS[0])
+        return 200, "text/html", self._results(self.searches[session], 1)
+
+    def _results_page(self, request, args: Dict[str, str]) -> Tuple[int, str, str]:
+        search = self.searches.get(self._session(request))
+        if search is None:
+            return 200, "text/html", self._search_form()
+
+        results_per_page = args.get("searchCriteria.resultsPerPage")
+        if results_per_page and results_per_page.isdigit():
+            search = search._replace(results_per_page=min(int(results_per_page), RESULTS_PER_PAGE_OPTIONS[-1]))
+            self.searches[self._session(request)] = search
+
+        page = args.get("searchCriteria.page", "1")
+        return 200, "text/html", self._results(search, int(page) if page.isdigit() else 1)
+
+    def _results(self, search: Search, page: int) -> str:
+        found = [a for a in self.applications if search.start <= a.validated <= search.end]
+        if not found:
+            return '<html><body><div class="messagebox"><ul><li>No results found.</li></ul></div></body></html>'
+
+        offset = (page - 1) * search.results_per_page
+        rows = "".join(self._result_row(a) for a in found[offset : offset + search.results_per_page])
+        options = "".join(
+            f'<option value="{size}"{" selected" if size == search.results_per_page else ""}>{size}</option>'
+            for size in RESULTS_PER_PAGE_OPTIONS
+        )
+        next_link = ""
+        if offset + search.results_per_page < len(found):
+            next_link = (
+                f'<a class="next" href="/{self.name}/online-applications/pagedSearchResults.do'
+                f'?action=page&amp;searchCriteria.page={page + 1}">Next</a>'
+            )
+
+        return f"""<html><body>
+<form id="searchResults" method="post" action="/{self.name}/online-applications/pagedSearchResults.do">
+    <input type="hidden" name="searchCriteria.page" value="1" />
+    <input type="hidden" name="action" value="page" />
+    <select name="searchCriteria.resultsPerPage">{options}</select>
+</form>
+<ul id="searchresults">{rows}</ul>
+<p class="pager bottom">{next_link}</p>
+</body></html>"""
+
+    def _result_row(self, application: Application) -> str:
+        return f"""
+<li class="searchresult">
+    <a href="/{self.name}/online-applications/applicationDetails.do?keyVal={application.keyval}&amp;activeTab=summary">
+        <div class="summaryLinkTextClamp">{escape(application.proposal)}</div>
+    </a>
+    <p class="address">{escape(application.address)}</p>
+    <p class="metaInfo">
+        Ref. No: {application.reference} <span class="divider">|</span>
+        Received: {idox_date(application.received)} <span class="divider">|</span>
+        Validated: {idox_date(application.validated)} <span class="divider">|</span>
+        Status: {application.status}
+    </p>
+</li>"""
+
+    # Application tabs
+    # -------------------------------------------------------------------------
+
+    def _summary_tab(self, application: Application) -> str:
+        rows = {
+            "Reference": application.reference,
+            "Application Received": idox_date(application.received),
+            "Application Validated": idox_date(application.validated),
+            "Address": escape(application.address),
+            "Proposal": escape(application.proposal),
+            "Status": application.status,
+            "Appeal Status": "Unknown",
+        }
+        if application.status == "Decided":
+            rows["Decision"] = "Grant Permission"
+            rows["Decision Issued Date"] = idox_date(application.validated + timedelta(days=56))
+        return self._tab("simpleDetailsTable", rows)
+
+    def _details_tab(self, application: Application) -> str:
+        rows = {
+            "Application Type": "Householder Application",
+            "Expected Decision Level": "Delegated",
+            "Case Officer": "A Planner",
+            "Parish": "Not Applicable",
+            "Ward": "Central",
+            "Applicant Name": "A Applicant",
+            "Applicant Address": escape(application.address),
+            "Environmental Assessment Requested": "No",
+        }
+        return self._tab("applicationDetails", rows)
+
+    def _tab(self, table_id: str, rows: Dict[str, str]) -> str:
+        cells = "".join(f"<tr><th>{name}</th><td>{value}</td></tr>" for name, value in rows.items())
+        return f"""<html><body>
+<table id="{table_id}">{cells}</table>
+</body></html>"""
+
+    def _documents_tab(self, application: Application) -> str:
+        rows = "".join(
+            f"""<tr>
+    <td>{application.validated + timedelta(days=i % 7):%d %b %Y}</td>
+    <td>{DOCUMENT_TYPES[i % len(DOCUMENT_TYPES)]}</td>
+    <td>{application.reference}-{i:02d}</td>
+    <td>Document {i} for {application.reference}</td>
+    <td><a href="/{self.name}/online-applications/files/{application.keyval}/{i}.pdf">View</a></td>
+</tr>"""
+            for i in range(self.documents)
+        )
+        return f"""<html><body>
+<table id="Documents">
+    <tr><th>Date Published</th><th>Document Type</th><th>Drawing Number</th><th>Description</th><th>View</th></tr>
+    {rows}
+</table>
+</body></html>"""
+
+    # ArcGIS
+    # -------------------------------------------------------------------------
+
+    def _arcgis(self, args: Dict[str, str]) -> str:
+        # where=KEYVAL='<keyval>'
+        keyval = args.get("where", "").partition("=")[2].strip("'")
+        application = self.by_keyval.get(keyval)
+        if application is None:
+            return json.dumps({"type": "FeatureCollection", "features": []})
+
+        x, y, size = application.easting, application.northing, 0.0005
+        ring = [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+        return json.dumps(
+            {
+                "type": "FeatureCollection",
+                "features": [
+                    {
+                        "type": "Feature",
+                        "id": application.keyval,
+                        "geometry": {"type": "Polygon", "coordinates": [ring]},
+                        "properties": {"KEYVAL": application.keyval, "REFVAL": application.reference},
+                    }
+                ],
+            }
+        )
+
+
+class FakeIdoxServer(Resource):
+    def __init__(self, councils: int, applications: int, documents: int, days: int, latency: float, error_rate: float):
+        super().__init__()
+        self.latency = latency
+        self.error_rate = error_rate
+
+        today = date.today()
+        for number in range(1, councils + 1):
+            name = council_name(number)
+            council = FakeCouncil(name, make_applications(name, applications, days, today), documents, self)
+            self.putChild(name.encode(), council)
+
+
+def council_urls(base_url: str, number: int) -> Tuple[str, str]:
+    """The start URL and ArcGIS URL of council `number` on the fake server at `base_url`."""
+    council = f"{base_url}/{quote(council_name(number))}"
+    return f"{council}/online-applications/search.do?action=advanced", f"{council}/{ARCGIS_PATH}"
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--port", type=int, default=8800, help="Port to listen on (default 8800)")
+    parser.add_argument("--councils", type=int, default=3, help="Number of councils (default 3)")
+    parser.add_argument("--applications", type=int, default=500, help="Applications per council (default 500)")
+    parser.add_argument("--documents", type=int, default=10, help="Documents per application (default 10)")
+    parser.add_argument("--days", type=int, default=56, help="Days the applications are validated over (default 56)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Mean response time in seconds (default 0.05)")
+    parser.add_argument(
+        "--error-rate", type=float, default=0.01, help="Share of responses that are 503s (default 0.01)"
+    )
+
+
+def main():
+    from twisted.internet import reactor
+
+    parser = argparse.ArgumentParser(description="Serve fake Idox Public Access councils for load testing")
+    add_server_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (default 127.0.0.1)")
+    args = parser.parse_args()
+
+    server = FakeIdoxServer(args.councils, args.applications, args.documents, args.days, args.latency, args.error_rate)
+    site = Site(server)
+    site.noisy = False
+    reactor.listenTCP(args.port, site, interface=args.host)
+    print(f"Serving {args.councils} fake councils at http://{args.host}:{args.port}/", file=sys.stderr, flush=True)
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+End-to-end load test of the Idox spider, the pipelines and Postgres, against the fake councils of
+benchmarks/fake_idox.py, reporting items per second and database rows per second.
+
+Starts the fake server, crawls each of its councils with an IdoxSpider subclass using the project's settings,
+middlewares and pipelines, and counts the rows written. Only the ScrapeOps monitor and the Zyte API add-on are turned
+off, so nothing leaves the machine. The fake councils' rows (lpa `loadtest_<n>`) are deleted first, so every
+application is new. Needs DATABASE_URL, which shouldn't point at production.
+
+    python benchmarks/idox_load.py
+    python benchmarks/idox_load.py --councils 10 --applications 2000 --latency 0.2 --error-rate 0.02
+"""
+
+import argparse
+import socket
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fake_idox import add_server_arguments, council_name, council_urls  # noqa: E402
+from scrapy.crawler import CrawlerProcess  # noqa: E402
+from scrapy.utils.project import get_project_settings  # noqa: E402
+
+from planning_applications.spiders.idox import IdoxSpider  # noqa: E402
+from shared.db import get_connection  # noqa: E402
+
+FAKE_IDOX = Path(__file__).resolve().parent / "fake_idox.py"
+
+# Rows written for the fake councils, by table
+ROW_COUNTS = {
+    "planning_applications": "SELECT count(*) FROM planning_applications WHERE lpa = ANY(%s)",
+    "planning_application_documents": """
+        SELECT count(*) FROM planning_application_documents d
+        JOIN planning_applications a ON a.uuid = d.planning_application_uuid
+        WHERE a.lpa = ANY(%s)
+        """,
+    "planning_application_geometries": """
+        SELECT count(*) FROM planning_application_geometries g
+        JOIN planning_applications a ON a.uuid = g.planning_application_uuid
+        WHERE a.lpa = ANY(%s)
+        """,
+}
+
+
+def start_server(args: argparse.Namespace) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, str(FAKE_IDOX)]
+        + ["--port", str(args.port), "--councils", str(args.councils), "--applications", str(args.applications)]
+        + ["--documents", str(args.documents), "--days", str(args.days)]
+        + ["--latency", str(args.latency), "--error-rate", str(args.error_rate)]
+    )
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The fake Idox server exited with {server.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", args.port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError(f"The fake Idox server didn't start listening on port {args.port}")
+
+
+def make_spider_class(base_url: str, number: int) -> type:
+    start_url, arcgis_url = council_urls(base_url, number)
+    return type(
+        f"LoadTest{number}Spider",
+        (IdoxSpider,),
+        {
+            "__module__": "benchmarks.idox_load",
+            "name": council_name(number),
+            "allowed_domains": ["127.0.0.1"],
+            "start_url": start_url,
+            "arcgis_url": arcgis_url,
+        },
+    )
+
+
+def delete_rows(lpas: List[str]):
+    connection = get_connection()
+    with connection.cursor() as cursor:
+        for table in ("planning_application_documents", "planning_application_geometries"):
+            cursor.execute(
+                f"""
+                DELETE FROM {table} WHERE planning_application_uuid IN (
+                    SELECT uuid FROM planning_applications WHERE lpa = ANY(%s)
+                )
+                """,
+                (lpas,),
+            )
+        cursor.execute("DELETE FROM planning_applications WHERE lpa = ANY(%s)", (lpas,))
+    connection.commit()
+    connection.close()
+
+
+def count_rows(lpas: List[str]) -> Dict[str, int]:
+    connection = get_connection()
+    with connection.cursor() as cursor:
+        counts = {}
+        for table, query in ROW_COUNTS.items():
+            cursor.execute(query, (lpas,))
+            counts[table] = cursor.fetchone()[0]
+    connection.close()
+    return counts
+
+
+def crawl(args: argparse.Namespace, spider_classes: List[type]) -> Tuple[float, List]:
+    settings = get_project_settings()
+    settings.set("REQUIRED_SETTINGS", [])
+    settings.set("ADDONS", {**settings.getdict("ADDONS"), "scrapy_zyte_api.Addon": None})
+    settings.set("EXTENSIONS", {**settings.getdict("EXTENSIONS"), "scrapeops_scrapy.extension.ScrapeOpsMonitor": None})
+    settings.set("DOWNLOAD_FILES", False)
+    settings.set("LOG_PROFILE", args.log_profile)
+
+    today = date.today()
+    process = CrawlerProcess(settings)
+    crawlers = []
+    for spider_class in spider_classes:
+        crawler = process.create_crawler(spider_class)
+        crawlers.append(crawler)
+        process.crawl(
+            crawler,
+            start_date=(today - timedelta(days=6)).isoformat(),
+            end_date=today.isoformat(),
+            earliest_date=(today - timedelta(days=args.days)).isoformat(),
+            light=str(args.light),
+        )
+
+    started = time.perf_counter()
+    process.start()
+    return time.perf_counter() - started, crawlers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Idox spider, pipelines and Postgres end to end")
+    add_server_arguments(parser)
+    parser.add_argument("--light", action="store_true", help="Run the spiders in light mode")
+    parser.add_argument(
+        "--log-profile", choices=["debug", "production"], default="production", help="(default production)"
+    )
+    args = parser.parse_args()
+
+    spider_classes = [make_spider_class(f"http://127.0.0.1:{args.port}", n) for n in range(1, args.councils + 1)]
+    lpas = [spider_class.name for spider_class in spider_classes]
+
+    delete_rows(lpas)
+    server = start_server(args)
+    try:
+        elapsed, crawlers = crawl(args, spider_classes)
+    finally:
+        server.terminate()
+        server.wait()
+
+    rows = count_rows(lpas)
+    stats = [crawler.stats.get_stats() for crawler in crawlers]
+    items = sum(s.get("item_scraped_count", 0) for s in stats)
+    requests = sum(s.get("downloader/request_count", 0) for s in stats)
+    retries = sum(s.get("retry/count", 0) for s in stats)
+    expected = args.councils * args.applications
+
+    print(f"{args.councils} councils x {args.applications} applications in {elapsed:.1f}s")
+    print(f"{'items':<32} {items:>8} ({items / elapsed:.1f}/s, {expected} applications served)")
+    print(f"{'requests':<32} {requests:>8} ({requests / elapsed:.1f}/s, {retries} retries)")
+    for table, count in rows.items():
+        print(f"{table:<32} {count:>8} ({count / elapsed:.1f} rows/s)")
+    total_rows = sum(rows.values())
+    print(f"{'all rows':<32} {total_rows:>8} ({total_rows / elapsed:.1f} rows/s)")
+
+    for s, spider_class in zip(stats, spider_classes):
+        p50 = s.get("timing/pipeline/PostgresPipeline/p50")
+        p99 = s.get("timing/pipeline/PostgresPipeline/p99")
+        if p50 is not None:
+            print(f"{spider_class.name}: PostgresPipeline p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Import time budgets for the CLI and the modules tests and tools import.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, without the API keys or database URL set,
+and its cumulative import time is compared against its budget. Exits non-zero if any module is over budget.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 10 --show 15
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import time budgets, in milliseconds
+BUDGETS_MS: Dict[str, int] = {
+    "planning_applications.settings": 60,
+    "planning_applications.spiders.registry": 40,
+    "run_spiders": 200,
+    # These need Scrapy, psycopg and pydantic, which take most of the time, but shouldn't need boto3 or pyproj
+    "planning_applications.pipelines": 700,
+    "planning_applications.spiders.lpas.wandsworth_single": 600,
+}
+
+# Set when a crawl runs, but importing shouldn't need them
+UNSET_ENV = ("SCRAPEOPS_API_KEY", "ZYTE_API_KEY", "DATABASE_URL")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """
+    Import `module` in a fresh interpreter, returning (module, self µs, cumulative µs) for it and everything it
+    imported, with `module` itself last
+    """
+    env = {k: v for k, v in os.environ.items() if k not in UNSET_ENV}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    # Top level imports are indented by one space. The interpreter's own startup imports (site, .pth files) come before
+    # the module's, so only the lines after the last top level import before it belong to it
+    times: List[Tuple[str, int, int]] = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+
+        name, self_us, cumulative_us, indent = match.group(4), int(match.group(1)), int(match.group(2)), match.group(3)
+        times.append((name, self_us, cumulative_us))
+        if len(indent) == 1:
+            if name == module:
+                return times
+            times = []
+
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check import times against their budgets")
+    parser.add_argument("--runs", type=int, default=5, help="Imports per module, the median is used (default 5)")
+    parser.add_argument("--show", type=int, default=0, help="Show the N slowest imports of each module")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module, budget_ms in BUDGETS_MS.items():
+        runs = [import_times(module) for _ in range(args.runs)]
+        median_ms = statistics.median(times[-1][2] for times in runs) / 1000
+
+        status = "ok" if median_ms <= budget_ms else "OVER BUDGET"
+        print(f"{module:<55} {median_ms:>7.1f} ms  (budget {budget_ms} ms)  {status}")
+
+        if args.show:
+            for name, _, cumulative in sorted(runs[-1][:-1], key=lambda t: t[2], reverse=True)[: args.show]:
+                print(f"    {name:<51} {cumulative / 1000:>7.1f} ms")
+
+        if median_ms > budget_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
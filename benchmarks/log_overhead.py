@@ -0,0 +1,178 @@
+"""
+CPU spent scraping 1,000 Idox applications under each logging profile.
+
+Runs the Idox spider's callbacks, from the results page to the item, and the item mapping pipeline over synthetic
+pages, with Scrapy's log handler set up from each profile and writing to /dev/null, so the difference between the
+profiles is what logging costs. The database lookup for existing applications is replaced with one that finds nothing.
+
+    python benchmarks/log_overhead.py
+    python benchmarks/log_overhead.py --applications 5000 --documents 40
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scrapy.http.request import Request  # noqa: E402
+from scrapy.http.response.html import HtmlResponse  # noqa: E402
+from scrapy.settings import Settings  # noqa: E402
+from scrapy.utils.log import get_scrapy_root_handler, install_scrapy_root_handler  # noqa: E402
+
+from planning_applications.extensions import LOG_PROFILES, LogProfile  # noqa: E402
+from planning_applications.pipelines import IdoxPlanningApplicationPipeline  # noqa: E402
+from planning_applications.spiders import idox  # noqa: E402
+from planning_applications.spiders.idox import IdoxSpider  # noqa: E402
+from shared.log import SamplingFilter  # noqa: E402
+
+DOMAIN = "planning.example.gov.uk"
+RESULTS_PER_PAGE = 100
+
+
+class BenchmarkIdoxSpider(IdoxSpider):
+    name = "benchmark"
+    domain = DOMAIN
+    allowed_domains = [DOMAIN]
+    start_url = f"https://{DOMAIN}/online-applications/search.do?action=advanced"
+
+
+SUMMARY_TAB = """
+<html><body><table id="simpleDetailsTable">
+    <tr><th>Reference</th><td>24/00001/FUL</td></tr>
+    <tr><th>Application Received</th><td>Mon 01 Jan 2024</td></tr>
+    <tr><th>Application Validated</th><td>Tue 02 Jan 2024</td></tr>
+    <tr><th>Address</th><td>1 High Street, Exampletown</td></tr>
+    <tr><th>Proposal</th><td>Erection of a single storey rear extension</td></tr>
+    <tr><th>Status</th><td>Pending Consideration</td></tr>
+</table></body></html>
+"""
+
+DETAILS_TAB = """
+<html><body><table id="applicationDetails">
+    <tr><th>Application Type</th><td>Full Planning Permission</td></tr>
+    <tr><th>Case Officer</th><td>A Planner</td></tr>
+    <tr><th>Ward</th><td>Central</td></tr>
+</table></body></html>
+"""
+
+
+def results_page(page: int) -> str:
+    results = "".join(
+        f"""
+        <li class="searchresult">
+            <a href="/online-applications/applicationDetails.do?keyVal=KEY{page}X{i}&amp;activeTab=summary">
+                <div class="summaryLinkTextClamp">Erection of a single storey rear extension {i}</div>
+            </a>
+            <p class="address">{i} High Street, Exampletown</p>
+            <p class="metaInfo">
+                Ref. No: 24/{page:02d}{i:03d}/FUL <span class="divider">|</span>
+                Received: Mon 01 Jan 2024 <span class="divider">|</span>
+                Validated: Tue 02 Jan 2024 <span class="divider">|</span>
+                Status: Pending Consideration
+            </p>
+        </li>"""
+        for i in range(RESULTS_PER_PAGE)
+    )
+    return f'<html><body><ul id="searchresults">{results}</ul></body></html>'
+
+
+def documents_tab(documents: int) -> str:
+    rows = "".join(
+        f'<tr><td>02 Jan 2024</td><td>Plans</td><td>Drawing {i}</td><td><a href="/files/{i}.pdf">View</a></td></tr>'
+        for i in range(documents)
+    )
+    return (
+        '<html><body><table id="Documents">'
+        "<tr><th>Date Published</th><th>Document Type</th><th>Description</th><th>View</th></tr>"
+        f"{rows}</table></body></html>"
+    )
+
+
+def follow(request: Request, body: str) -> list:
+    """Call `request`'s callback with a response of `body`."""
+    response = HtmlResponse(request.url, body=body.encode(), encoding="utf-8", request=request)
+    return list(request.callback(response))
+
+
+def scrape(applications: int, documents: int) -> int:
+    """
+    Run the callbacks and item mapping for `applications` applications from their results page to their item, returning
+    the number of items
+    """
+    spider = BenchmarkIdoxSpider(start_date="2024-01-01", end_date="2024-01-07")
+    pipeline = IdoxPlanningApplicationPipeline()
+    documents_html = documents_tab(documents)
+    items = 0
+
+    for page in range(applications // RESULTS_PER_PAGE):
+        url = f"https://{DOMAIN}/online-applications/pagedSearchResults.do?action=page&page={page}"
+        results = follow(Request(url, callback=spider.parse_results), results_page(page))
+
+        for summary_request in (r for r in results if isinstance(r, Request) and r.meta.get("stage") == "summary"):
+            (details_request,) = follow(summary_request, SUMMARY_TAB)
+            (documents_request,) = follow(details_request, DETAILS_TAB)
+            for item in follow(documents_request, documents_html):
+                pipeline.process_item(item, spider)
+                items += 1
+
+    return items
+
+
+def configure_logging(profile: str):
+    settings = Settings({"LOG_FILE": os.devnull, "LOG_PROFILE": profile})
+    LogProfile().update_settings(settings)
+    install_scrapy_root_handler(settings)
+
+    # As LogSampling does when the spider opens
+    if settings.getbool("LOG_SAMPLING_ENABLED"):
+        handler = get_scrapy_root_handler()
+        handler.addFilter(SamplingFilter(burst=10, interval=60.0, rate=100))
+        logging.root.setLevel(handler.level)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the CPU logging costs under each logging profile")
+    parser.add_argument("--applications", type=int, default=1000, help="Applications per run (default 1000)")
+    parser.add_argument("--documents", type=int, default=20, help="Documents per application (default 20)")
+    parser.add_argument("--runs", type=int, default=5, help="Runs of each profile, the fastest is used (default 5)")
+    args = parser.parse_args()
+
+    idox.select_planning_application_by_url = lambda url: None
+
+    # Parsing takes most of the time, so logging's share is measured against runs with logging turned off. The
+    # profiles take turns, so drift in the machine's speed affects them all alike
+    runs: Dict[str, List[float]] = {"no logging": [], **{profile: [] for profile in LOG_PROFILES}}
+    for _ in range(args.runs):
+        for name in runs:
+            if name in LOG_PROFILES:
+                configure_logging(name)
+            else:
+                logging.disable(logging.CRITICAL)
+
+            started = time.process_time()
+            scrape(args.applications, args.documents)
+            runs[name].append((time.process_time() - started) / args.applications * 1000)
+            logging.disable(logging.NOTSET)
+
+    without_logging = min(runs["no logging"])
+    print(f"{'no logging':<12} {without_logging * 1000:>8.0f} ms CPU per 1,000 applications")
+
+    logging_cpu = {}
+    for profile in LOG_PROFILES:
+        total = min(runs[profile])
+        logging_cpu[profile] = max(0.0, total - without_logging)
+        print(
+            f"{profile:<12} {total * 1000:>8.0f} ms CPU per 1,000 applications, {logging_cpu[profile] * 1000:.0f} ms logging"
+        )
+
+    saved = logging_cpu["debug"] - logging_cpu["production"]
+    print(f"production saves {saved * 1000:.0f} ms CPU per 1,000 applications")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,10 @@ CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
 DROP TABLE IF EXISTS public.scraper_runs CASCADE;
 
+DROP TABLE IF EXISTS public.scraper_run_history CASCADE;
+
+DROP TABLE IF EXISTS public.spool_segments CASCADE;
+
 DROP TABLE IF EXISTS public.planning_application_documents CASCADE;
 
 DROP TABLE IF EXISTS public.planning_application_geometries CASCADE;
@@ -23,6 +27,37 @@ CREATE TABLE
         CONSTRAINT scraper_runs_name_pkey PRIMARY KEY (name)
     );
 
+CREATE TABLE
+    public.scraper_run_history (
+        id BIGSERIAL NOT NULL,
+        name TEXT NOT NULL,
+        spider_name TEXT NOT NULL,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP NOT NULL,
+        elapsed_seconds DOUBLE PRECISION,
+        finish_reason TEXT,
+        requests INTEGER NOT NULL DEFAULT 0,
+        response_bytes BIGINT NOT NULL DEFAULT 0,
+        items INTEGER NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0,
+        retries INTEGER NOT NULL DEFAULT 0,
+        stats JSONB,
+        CONSTRAINT scraper_run_history_pkey PRIMARY KEY (id)
+    );
+
+CREATE INDEX scraper_run_history_finished_at_idx ON public.scraper_run_history (finished_at);
+
+CREATE INDEX scraper_run_history_spider_name_finished_at_idx ON public.scraper_run_history (spider_name, finished_at);
+
+CREATE TABLE
+    public.spool_segments (
+        name TEXT NOT NULL,
+        items INTEGER NOT NULL DEFAULT 0,
+        rows INTEGER NOT NULL DEFAULT 0,
+        loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT spool_segments_pkey PRIMARY KEY (name)
+    );
+
 CREATE TABLE
     public.planning_applications (
         uuid uuid DEFAULT uuid_generate_v4 () NOT NULL,
@@ -40,7 +75,7 @@ CREATE TABLE
         appeal_status CHARACTER VARYING(255),
         appeal_decision CHARACTER VARYING(255),
         appeal_decision_date DATE,
-        application_type CHARACTER VARYING(255) NOT NULL,
+        application_type CHARACTER VARYING(255),
         expected_decision_level CHARACTER VARYING(255),
         actual_decision_level CHARACTER VARYING(255),
         case_officer CHARACTER VARYING(255),
@@ -66,6 +101,8 @@ CREATE TABLE
         CONSTRAINT planning_applications_application_decision_date_appeal_decision_date_check CHECK (application_decision_date <= appeal_decision_date)
     );
 
+CREATE INDEX planning_applications_lpa_validated_date_idx ON public.planning_applications (lpa, validated_date);
+
 CREATE TABLE
     public.planning_application_documents (
         uuid uuid NOT NULL DEFAULT uuid_generate_v4 (),
@@ -125,6 +162,8 @@ CREATE TABLE
         CONSTRAINT planning_application_appeals_case_id_key UNIQUE (case_id)
     );
 
+CREATE INDEX planning_application_appeals_linked_case_ids_idx ON public.planning_application_appeals USING GIN (linked_case_ids);
+
 CREATE TABLE
     public.planning_application_appeals_documents (
         uuid uuid DEFAULT public.uuid_generate_v4() NOT NULL,
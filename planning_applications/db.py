@@ -1,5 +1,5 @@
 from datetime import date
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import psycopg
 
@@ -10,6 +10,7 @@ from planning_applications.items import (
     PlanningApplicationAppealDocument,
     PlanningApplicationDocument,
     PlanningApplicationGeometry,
+    PlanningApplicationSearchResult,
 )
 from planning_applications.settings import DEFAULT_DATE_FORMAT
 from planning_applications.utils import to_datetime_or_none
@@ -101,37 +102,126 @@ def get_planning_application_uuid_for_lpa_and_reference(
     return row[0]
 
 
-def get_earliest_date_for_lpa(lpa: str) -> Optional[date]:
-    """Get the earliest validated_date for an LPA from the database."""
+def get_earliest_dates_by_lpa() -> Dict[str, date]:
+    """
+    Get the first day of the month after the earliest validated_date of every LPA, in one query. LPAs without any
+    validated applications are left out, so they use the default dates.
+    """
     conn = get_connection()
 
     with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT validated_date FROM planning_applications WHERE lpa = %s ORDER BY validated_date ASC LIMIT 1
-            """,
-            (lpa,),
+            SELECT lpa, MIN(validated_date) FROM planning_applications
+            WHERE validated_date IS NOT NULL
+            GROUP BY lpa
+            """
         )
-        result = cur.fetchone()
+        rows = cur.fetchall()
 
     conn.close()
 
-    if result and result[0]:
-        # Return the first day of the month after the earliest date
-        earliest_date = result[0]
+    earliest_dates = {}
+    for lpa, earliest_date in rows:
         if earliest_date.month == 12:
-            return date(earliest_date.year + 1, 1, 1)
-        return date(earliest_date.year, earliest_date.month + 1, 1)
+            earliest_dates[lpa] = date(earliest_date.year + 1, 1, 1)
+        else:
+            earliest_dates[lpa] = date(earliest_date.year, earliest_date.month + 1, 1)
+    return earliest_dates
+
+
+def get_max_appeal_case_id() -> Optional[int]:
+    """Get the highest appeal case ID we have in the database."""
+    conn = get_connection()
 
-    # If no records found, return None to use default date
+    with conn.cursor() as cur:
+        cur.execute("SELECT MAX(case_id) FROM planning_application_appeals")
+        result = cur.fetchone()
+
+    conn.close()
+
+    if result and result[0]:
+        return result[0]
     return None
 
 
+def get_finalised_appeal_case_ids() -> Set[int]:
+    """Get the case IDs of appeals that have been decided, and so won't change again."""
+    conn = get_connection()
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT case_id FROM planning_application_appeals WHERE decision_date IS NOT NULL")
+        result = {row[0] for row in cur.fetchall()}
+
+    conn.close()
+
+    return result
+
+
+def get_known_appeal_case_ids() -> Set[int]:
+    """Get the case IDs of every appeal in the database."""
+    conn = get_connection()
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT case_id FROM planning_application_appeals")
+        result = {row[0] for row in cur.fetchall()}
+
+    conn.close()
+
+    return result
+
+
+def get_open_appeals() -> List[PlanningApplicationAppeal]:
+    """Get the appeals that haven't been decided yet, with the dates that tell us when they're next likely to change."""
+    conn = get_connection()
+
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT
+                lpa,
+                url,
+                reference,
+                case_id,
+                questionnaire_due_date,
+                statement_due_date,
+                interested_party_comments_due_date,
+                final_comments_due_date,
+                inquiry_evidence_due_date,
+                event_date
+            FROM planning_application_appeals
+            WHERE decision_date IS NULL
+            """
+        )
+        rows = cur.fetchall()
+
+    conn.close()
+
+    return [
+        PlanningApplicationAppeal(
+            lpa=row[0],
+            url=row[1],
+            reference=row[2],
+            case_id=row[3],
+            questionnaire_due_date=to_datetime_or_none(row[4]),
+            statement_due_date=to_datetime_or_none(row[5]),
+            interested_party_comments_due_date=to_datetime_or_none(row[6]),
+            final_comments_due_date=to_datetime_or_none(row[7]),
+            inquiry_evidence_due_date=to_datetime_or_none(row[8]),
+            event_date=to_datetime_or_none(row[9]),
+        )
+        for row in rows
+    ]
+
+
 # Upserts
 # -------------------------------------------------------------------------------------------------
 
 
-def upsert_planning_application(cursor: psycopg.Cursor, item: PlanningApplication) -> str:
+def upsert_planning_application(cursor: psycopg.Cursor, item: PlanningApplication) -> Tuple[str, bool]:
+    """
+    Insert or update an application, returning its uuid and whether it was inserted
+    """
     cursor.execute(
         """ INSERT INTO planning_applications (
                 lpa,
@@ -198,7 +288,7 @@ def upsert_planning_application(cursor: psycopg.Cursor, item: PlanningApplicatio
                 environmental_assessment_requested = EXCLUDED.environmental_assessment_requested,
                 is_active = EXCLUDED.is_active,
                 last_imported_at = NOW()
-            RETURNING uuid;
+            RETURNING uuid, (xmax = 0) AS inserted;
             """,
         (
             item.lpa,
@@ -238,7 +328,56 @@ def upsert_planning_application(cursor: psycopg.Cursor, item: PlanningApplicatio
     row = cursor.fetchone()
     if not row:
         raise ValueError("No row returned from the upsert query!")
-    return row[0]
+    return row[0], row[1]
+
+
+def upsert_planning_application_search_result(
+    cursor: psycopg.Cursor, item: PlanningApplicationSearchResult
+) -> Tuple[str, bool]:
+    """
+    Insert an application seen in search results, or refresh the columns search results show for an existing one.
+    Columns only found on the application's own pages are left alone. Returns the uuid and whether it was inserted.
+    """
+    cursor.execute(
+        """ INSERT INTO planning_applications (
+                lpa,
+                reference,
+                website_reference,
+                url,
+                submitted_date,
+                validated_date,
+                address,
+                description,
+                application_status
+            ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            ON CONFLICT (lpa, reference)
+            DO UPDATE SET
+                website_reference = EXCLUDED.website_reference,
+                url = EXCLUDED.url,
+                validated_date = COALESCE(EXCLUDED.validated_date, planning_applications.validated_date),
+                address = COALESCE(EXCLUDED.address, planning_applications.address),
+                description = COALESCE(EXCLUDED.description, planning_applications.description),
+                application_status = COALESCE(EXCLUDED.application_status, planning_applications.application_status),
+                last_imported_at = NOW()
+            RETURNING uuid, (xmax = 0) AS inserted;
+            """,
+        (
+            item.lpa,
+            item.reference,
+            item.website_reference,
+            item.url,
+            item.submitted_date,
+            item.validated_date,
+            item.address,
+            item.description,
+            item.application_status,
+        ),
+    )
+
+    row = cursor.fetchone()
+    if not row:
+        raise ValueError("No row returned from the upsert query!")
+    return row[0], row[1]
 
 
 def upsert_planning_application_item(cursor: psycopg.Cursor, item: PlanningApplication) -> str:
@@ -336,36 +475,41 @@ def upsert_planning_application_item(cursor: psycopg.Cursor, item: PlanningAppli
     return row[0]
 
 
+UPSERT_PLANNING_APPLICATION_DOCUMENT = """
+    INSERT INTO planning_application_documents (
+        planning_application_uuid,
+        date_published,
+        document_type,
+        description,
+        url,
+        drawing_number
+    ) VALUES (%s,%s,%s,%s,%s,%s)
+    ON CONFLICT (url)
+    DO UPDATE SET
+        date_published = EXCLUDED.date_published,
+        document_type = EXCLUDED.document_type,
+        description = EXCLUDED.description,
+        drawing_number = EXCLUDED.drawing_number,
+        last_imported_at = NOW()
+    RETURNING uuid;
+    """
+
+
+def document_params(planning_application_uuid: str, document: PlanningApplicationDocument) -> tuple:
+    return (
+        planning_application_uuid,
+        document.date_published,
+        document.document_type,
+        document.description,
+        document.url,
+        document.drawing_number,
+    )
+
+
 def upsert_planning_application_document(
     cursor: psycopg.Cursor, planning_application_uuid: str, document: PlanningApplicationDocument
 ) -> str:
-    cursor.execute(
-        """ INSERT INTO planning_application_documents (
-                planning_application_uuid,
-                date_published,
-                document_type,
-                description,
-                url,
-                drawing_number
-            ) VALUES (%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (url)
-            DO UPDATE SET
-                date_published = EXCLUDED.date_published,
-                document_type = EXCLUDED.document_type,
-                description = EXCLUDED.description,
-                drawing_number = EXCLUDED.drawing_number,
-                last_imported_at = NOW()
-            RETURNING uuid;
-            """,
-        (
-            planning_application_uuid,
-            document.date_published,
-            document.document_type,
-            document.description,
-            document.url,
-            document.drawing_number,
-        ),
-    )
+    cursor.execute(UPSERT_PLANNING_APPLICATION_DOCUMENT, document_params(planning_application_uuid, document))
 
     row = cursor.fetchone()
     if not row:
@@ -373,24 +517,34 @@ def upsert_planning_application_document(
     return row[0]
 
 
+def upsert_planning_application_documents(
+    cursor: psycopg.Cursor, documents: List[Tuple[str, PlanningApplicationDocument]]
+):
+    """Insert or update a batch of (application uuid, document) in one round trip."""
+    cursor.executemany(UPSERT_PLANNING_APPLICATION_DOCUMENT, [document_params(uuid, doc) for uuid, doc in documents])
+
+
+UPSERT_PLANNING_APPLICATION_GEOMETRY = """
+    INSERT INTO planning_application_geometries (
+        planning_application_uuid,
+        reference,
+        geometry
+    ) VALUES (%s,%s,%s)
+    ON CONFLICT (planning_application_uuid, reference)
+    DO UPDATE SET
+        geometry = EXCLUDED.geometry,
+        last_imported_at = NOW()
+    RETURNING uuid;
+    """
+
+
 def upsert_planning_application_geometry(
     cursor: psycopg.Cursor,
     planning_application_uuid: str,
     geometry: PlanningApplicationGeometry | IdoxPlanningApplicationGeometry,
 ) -> str:
     cursor.execute(
-        """ INSERT INTO planning_application_geometries (
-                planning_application_uuid,
-                reference,
-                geometry
-            ) VALUES (%s,%s,%s)
-            ON CONFLICT (planning_application_uuid, reference)
-            DO UPDATE SET
-                geometry = EXCLUDED.geometry,
-                last_imported_at = NOW()
-            RETURNING uuid;
-""",
-        (planning_application_uuid, geometry.reference, geometry.geometry),
+        UPSERT_PLANNING_APPLICATION_GEOMETRY, (planning_application_uuid, geometry.reference, geometry.geometry)
     )
 
     row = cursor.fetchone()
@@ -399,6 +553,16 @@ def upsert_planning_application_geometry(
     return row[0]
 
 
+def upsert_planning_application_geometries(
+    cursor: psycopg.Cursor, geometries: List[Tuple[str, PlanningApplicationGeometry]]
+):
+    """Insert or update a batch of (application uuid, geometry) in one round trip."""
+    cursor.executemany(
+        UPSERT_PLANNING_APPLICATION_GEOMETRY,
+        [(uuid, geometry.reference, geometry.geometry) for uuid, geometry in geometries],
+    )
+
+
 def upsert_planning_application_appeal(cursor: psycopg.Cursor, item: PlanningApplicationAppeal) -> str:
     cursor.execute(
         """
@@ -545,3 +709,379 @@ def upsert_planning_application_appeal_document(
     if not row:
         raise ValueError("No row returned from the upsert query!")
     return row[0]
+
+
+# Bulk loads of spooled items
+# -------------------------------------------------------------------------------------------------
+#
+# Each segment of items spooled by SpoolPipeline is copied into spool_staging, one JSON line per row, and merged into
+# the tables with one statement per table. The merges upsert like the functions above. Where an item appears more than
+# once in a segment, the last one written wins.
+
+# (table, statement) in the order they're run, so applications are there for their documents and geometries, and
+# appeals for theirs
+SPOOL_MERGES: List[Tuple[str, str]] = [
+    (
+        "planning_applications (search results)",
+        """
+        INSERT INTO planning_applications (
+            lpa,
+            reference,
+            website_reference,
+            url,
+            submitted_date,
+            validated_date,
+            address,
+            description,
+            application_status
+        )
+        SELECT DISTINCT ON (r.lpa, r.reference)
+            r.lpa,
+            r.reference,
+            r.website_reference,
+            r.url,
+            r.submitted_date,
+            r.validated_date,
+            r.address,
+            r.description,
+            r.application_status
+        FROM spool_staging s
+        CROSS JOIN jsonb_populate_record(NULL::planning_applications, s.line->'item') r
+        WHERE s.line->>'type' = 'PlanningApplicationSearchResult'
+        ORDER BY r.lpa, r.reference, s.seq DESC
+        ON CONFLICT (lpa, reference)
+        DO UPDATE SET
+            website_reference = EXCLUDED.website_reference,
+            url = EXCLUDED.url,
+            validated_date = COALESCE(EXCLUDED.validated_date, planning_applications.validated_date),
+            address = COALESCE(EXCLUDED.address, planning_applications.address),
+            description = COALESCE(EXCLUDED.description, planning_applications.description),
+            application_status = COALESCE(EXCLUDED.application_status, planning_applications.application_status),
+            last_imported_at = NOW()
+        """,
+    ),
+    (
+        "planning_applications",
+        """
+        INSERT INTO planning_applications (
+            lpa,
+            reference,
+            website_reference,
+            url,
+            submitted_date,
+            validated_date,
+            address,
+            description,
+            application_status,
+            application_decision,
+            application_decision_date,
+            appeal_status,
+            appeal_decision,
+            appeal_decision_date,
+            application_type,
+            expected_decision_level,
+            actual_decision_level,
+            case_officer,
+            case_officer_phone,
+            parish,
+            ward,
+            amenity_society,
+            comments_due_date,
+            committee_date,
+            district_reference,
+            applicant_name,
+            applicant_address,
+            agent_name,
+            agent_address,
+            environmental_assessment_requested,
+            is_active
+        )
+        SELECT DISTINCT ON (r.lpa, r.reference)
+            r.lpa,
+            r.reference,
+            r.website_reference,
+            r.url,
+            r.submitted_date,
+            r.validated_date,
+            r.address,
+            r.description,
+            r.application_status,
+            r.application_decision,
+            r.application_decision_date,
+            r.appeal_status,
+            r.appeal_decision,
+            r.appeal_decision_date,
+            r.application_type,
+            r.expected_decision_level,
+            r.actual_decision_level,
+            r.case_officer,
+            r.case_officer_phone,
+            r.parish,
+            r.ward,
+            r.amenity_society,
+            r.comments_due_date,
+            r.committee_date,
+            r.district_reference,
+            r.applicant_name,
+            r.applicant_address,
+            r.agent_name,
+            r.agent_address,
+            r.environmental_assessment_requested,
+            r.is_active
+        FROM spool_staging s
+        CROSS JOIN jsonb_populate_record(NULL::planning_applications, s.line->'item') r
+        WHERE s.line->>'type' = 'PlanningApplication'
+        ORDER BY r.lpa, r.reference, s.seq DESC
+        ON CONFLICT (lpa, reference)
+        DO UPDATE SET
+            website_reference = EXCLUDED.website_reference,
+            url = EXCLUDED.url,
+            submitted_date = EXCLUDED.submitted_date,
+            validated_date = EXCLUDED.validated_date,
+            address = EXCLUDED.address,
+            description = EXCLUDED.description,
+            application_status = EXCLUDED.application_status,
+            application_decision = EXCLUDED.application_decision,
+            application_decision_date = EXCLUDED.application_decision_date,
+            appeal_status = EXCLUDED.appeal_status,
+            appeal_decision = EXCLUDED.appeal_decision,
+            appeal_decision_date = EXCLUDED.appeal_decision_date,
+            application_type = EXCLUDED.application_type,
+            expected_decision_level = EXCLUDED.expected_decision_level,
+            actual_decision_level = EXCLUDED.actual_decision_level,
+            case_officer = EXCLUDED.case_officer,
+            case_officer_phone = EXCLUDED.case_officer_phone,
+            parish = EXCLUDED.parish,
+            ward = EXCLUDED.ward,
+            amenity_society = EXCLUDED.amenity_society,
+            comments_due_date = EXCLUDED.comments_due_date,
+            committee_date = EXCLUDED.committee_date,
+            district_reference = EXCLUDED.district_reference,
+            applicant_name = EXCLUDED.applicant_name,
+            applicant_address = EXCLUDED.applicant_address,
+            agent_name = EXCLUDED.agent_name,
+            agent_address = EXCLUDED.agent_address,
+            environmental_assessment_requested = EXCLUDED.environmental_assessment_requested,
+            is_active = EXCLUDED.is_active,
+            last_imported_at = NOW()
+        """,
+    ),
+    (
+        "planning_application_documents",
+        """
+        WITH documents AS (
+            -- An application's own documents are saved against it, and the others against the application they name
+            SELECT s.seq, s.line->'item'->>'lpa' AS lpa, s.line->'item'->>'reference' AS reference, d.value AS document
+            FROM spool_staging s
+            CROSS JOIN jsonb_array_elements(
+                CASE WHEN jsonb_typeof(s.line->'item'->'documents') = 'array' THEN s.line->'item'->'documents' END
+            ) d
+            WHERE s.line->>'type' = 'PlanningApplication'
+            UNION ALL
+            SELECT s.seq, s.line->'item'->>'lpa', s.line->'item'->>'application_reference', s.line->'item'
+            FROM spool_staging s
+            WHERE s.line->>'type' = 'PlanningApplicationDocument'
+        )
+        INSERT INTO planning_application_documents (
+            planning_application_uuid,
+            date_published,
+            document_type,
+            description,
+            url,
+            drawing_number
+        )
+        SELECT DISTINCT ON (r.url)
+            a.uuid,
+            r.date_published,
+            r.document_type,
+            r.description,
+            r.url,
+            r.drawing_number
+        FROM documents d
+        CROSS JOIN jsonb_populate_record(NULL::planning_application_documents, d.document) r
+        JOIN planning_applications a ON a.lpa = d.lpa AND a.reference = d.reference
+        ORDER BY r.url, d.seq DESC
+        ON CONFLICT (url)
+        DO UPDATE SET
+            date_published = EXCLUDED.date_published,
+            document_type = EXCLUDED.document_type,
+            description = EXCLUDED.description,
+            drawing_number = EXCLUDED.drawing_number,
+            last_imported_at = NOW()
+        """,
+    ),
+    (
+        "planning_application_geometries",
+        """
+        WITH geometries AS (
+            SELECT s.seq, s.line->'item'->>'lpa' AS lpa, s.line->'item'->>'reference' AS reference,
+                s.line->'item'->'geometry' AS geometry
+            FROM spool_staging s
+            WHERE s.line->>'type' = 'PlanningApplication' AND jsonb_typeof(s.line->'item'->'geometry') = 'object'
+            UNION ALL
+            SELECT s.seq, s.line->'item'->>'lpa', s.line->'item'->>'application_reference', s.line->'item'
+            FROM spool_staging s
+            WHERE s.line->>'type' = 'PlanningApplicationGeometry'
+        )
+        INSERT INTO planning_application_geometries (
+            planning_application_uuid,
+            reference,
+            geometry
+        )
+        SELECT DISTINCT ON (a.uuid, g.geometry->>'reference')
+            a.uuid,
+            g.geometry->>'reference',
+            (g.geometry->>'geometry')::geometry
+        FROM geometries g
+        JOIN planning_applications a ON a.lpa = g.lpa AND a.reference = g.reference
+        ORDER BY a.uuid, g.geometry->>'reference', g.seq DESC
+        ON CONFLICT (planning_application_uuid, reference)
+        DO UPDATE SET
+            geometry = EXCLUDED.geometry,
+            last_imported_at = NOW()
+        """,
+    ),
+    (
+        "planning_application_appeals",
+        """
+        INSERT INTO planning_application_appeals (
+            lpa,
+            reference,
+            case_id,
+            url,
+            appellant_name,
+            agent_name,
+            site_address,
+            case_type,
+            case_officer,
+            procedure,
+            status,
+            decision,
+            start_date,
+            questionnaire_due_date,
+            statement_due_date,
+            interested_party_comments_due_date,
+            final_comments_due_date,
+            inquiry_evidence_due_date,
+            event_date,
+            decision_date,
+            linked_case_ids,
+            first_imported_at,
+            last_imported_at
+        )
+        SELECT DISTINCT ON (r.case_id)
+            r.lpa,
+            r.reference,
+            r.case_id,
+            r.url,
+            r.appellant_name,
+            r.agent_name,
+            r.site_address,
+            r.case_type,
+            r.case_officer,
+            r.procedure,
+            r.status,
+            r.decision,
+            r.start_date,
+            r.questionnaire_due_date,
+            r.statement_due_date,
+            r.interested_party_comments_due_date,
+            r.final_comments_due_date,
+            r.inquiry_evidence_due_date,
+            r.event_date,
+            r.decision_date,
+            r.linked_case_ids,
+            CURRENT_TIMESTAMP,
+            CURRENT_TIMESTAMP
+        FROM spool_staging s
+        CROSS JOIN jsonb_populate_record(NULL::planning_application_appeals, s.line->'item') r
+        WHERE s.line->>'type' = 'PlanningApplicationAppeal'
+        ORDER BY r.case_id, s.seq DESC
+        ON CONFLICT (case_id) DO UPDATE SET
+            reference = EXCLUDED.reference,
+            url = EXCLUDED.url,
+            appellant_name = EXCLUDED.appellant_name,
+            agent_name = EXCLUDED.agent_name,
+            site_address = EXCLUDED.site_address,
+            case_type = EXCLUDED.case_type,
+            case_officer = EXCLUDED.case_officer,
+            procedure = EXCLUDED.procedure,
+            status = EXCLUDED.status,
+            decision = EXCLUDED.decision,
+            start_date = EXCLUDED.start_date,
+            questionnaire_due_date = EXCLUDED.questionnaire_due_date,
+            statement_due_date = EXCLUDED.statement_due_date,
+            interested_party_comments_due_date = EXCLUDED.interested_party_comments_due_date,
+            final_comments_due_date = EXCLUDED.final_comments_due_date,
+            inquiry_evidence_due_date = EXCLUDED.inquiry_evidence_due_date,
+            event_date = EXCLUDED.event_date,
+            decision_date = EXCLUDED.decision_date,
+            linked_case_ids = EXCLUDED.linked_case_ids,
+            last_imported_at = CURRENT_TIMESTAMP
+        """,
+    ),
+    (
+        "planning_application_appeals_documents",
+        """
+        INSERT INTO planning_application_appeals_documents (
+            planning_application_appeal_uuid,
+            appeal_case_id,
+            reference,
+            name,
+            url,
+            s3_path
+        )
+        SELECT DISTINCT ON (r.url)
+            a.uuid,
+            r.appeal_case_id,
+            r.reference,
+            r.name,
+            r.url,
+            r.s3_path
+        FROM spool_staging s
+        CROSS JOIN jsonb_populate_record(NULL::planning_application_appeals_documents, s.line->'item') r
+        JOIN planning_application_appeals a ON a.case_id = r.appeal_case_id
+        WHERE s.line->>'type' = 'PlanningApplicationAppealDocument'
+        ORDER BY r.url, s.seq DESC
+        ON CONFLICT (url) DO UPDATE SET
+            name = EXCLUDED.name,
+            last_imported_at = NOW()
+        """,
+    ),
+]
+
+
+def claim_spool_segment(cursor: psycopg.Cursor, name: str) -> bool:
+    """
+    Record the segment `name` as loaded by the current transaction, returning False if it already has been. If another
+    loader is loading it, this waits for that loader's transaction to finish first.
+    """
+    cursor.execute("INSERT INTO spool_segments (name) VALUES (%s) ON CONFLICT (name) DO NOTHING", (name,))
+    return cursor.rowcount == 1
+
+
+def finish_spool_segment(cursor: psycopg.Cursor, name: str, items: int, rows: int):
+    cursor.execute("UPDATE spool_segments SET items = %s, rows = %s WHERE name = %s", (items, rows, name))
+
+
+def copy_spooled_lines(cursor: psycopg.Cursor, lines: Iterable[str]) -> int:
+    """Copy the JSON `lines` of a segment into spool_staging, which is emptied when the transaction commits."""
+    cursor.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS spool_staging (seq BIGINT NOT NULL, line JSONB NOT NULL) ON COMMIT DELETE ROWS
+        """
+    )
+    count = 0
+    with cursor.copy("COPY spool_staging (seq, line) FROM STDIN") as copy:
+        for count, line in enumerate(lines, 1):
+            copy.write_row((count, line))
+    return count
+
+
+def merge_spooled_items(cursor: psycopg.Cursor) -> Dict[str, int]:
+    """Upsert the items in spool_staging, returning the rows inserted or updated by table."""
+    rows = {}
+    for table, statement in SPOOL_MERGES:
+        cursor.execute(statement)
+        rows[table] = cursor.rowcount
+    return rows
@@ -0,0 +1,147 @@
+import logging
+from typing import Any, ClassVar, Dict, Optional
+
+from scrapy import Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import SETTINGS_PRIORITIES, Settings
+from scrapy.utils.log import get_scrapy_root_handler
+
+from shared.log import SamplingFilter
+from shared.timing import TIMING_STAT, bucket_quantile
+
+LOG_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Everything, including the cookies sent and received and each application, document and item found
+    "debug": {
+        "LOG_LEVEL": "DEBUG",
+        "COOKIES_DEBUG": True,
+        "LOG_SAMPLING_ENABLED": False,
+    },
+    # Progress and problems only. Per-row detail is left to the counters in the run's stats, and repeated INFO lines
+    # from the same callback are sampled (see LogSampling)
+    "production": {
+        "LOG_LEVEL": "INFO",
+        "COOKIES_DEBUG": False,
+        "LOG_SAMPLING_ENABLED": True,
+    },
+}
+
+
+class RequiredSettings:
+    """
+    Stops a crawl before it starts if any of the settings in REQUIRED_SETTINGS (e.g. API keys read from the environment)
+    aren't set.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        for name in crawler.settings.getlist("REQUIRED_SETTINGS"):
+            if not crawler.settings.get(name):
+                raise ValueError(f"{name} is not set")
+        return cls()
+
+
+class LogProfile:
+    """
+    Add-on that applies the settings of the logging profile in LOG_PROFILE. Scrapy sets up the crawl's log handler
+    after add-ons have run, so the profile's LOG_LEVEL takes effect.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls()
+
+    def update_settings(self, settings: Settings):
+        profile = settings.get("LOG_PROFILE", "debug")
+        if profile not in LOG_PROFILES:
+            raise ValueError(f"Unknown logging profile {profile}, expected one of {', '.join(LOG_PROFILES)}")
+
+        priority = settings.getpriority("LOG_PROFILE") or SETTINGS_PRIORITIES["addon"]
+        settings.setdict(LOG_PROFILES[profile], priority=priority)
+
+
+class LogSampling:
+    """
+    Adds a SamplingFilter to Scrapy's log handler, which lets LOG_SAMPLING_BURST INFO lines from each callback through
+    every LOG_SAMPLING_INTERVAL seconds and one in LOG_SAMPLING_RATE after that, and drops records below LOG_LEVEL before
+    they're created. The lines the spider's own logger dropped are counted in `log/sampled_out`.
+    """
+
+    # Shared by the crawlers of every spider in the process
+    shared_filter: ClassVar[Optional[SamplingFilter]] = None
+
+    def __init__(self, crawler: Crawler, sampling_filter: SamplingFilter):
+        self.crawler = crawler
+        self.sampling_filter = sampling_filter
+        self.dropped_at_open = 0
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("LOG_SAMPLING_ENABLED"):
+            raise NotConfigured
+
+        if LogSampling.shared_filter is None:
+            LogSampling.shared_filter = SamplingFilter(
+                crawler.settings.getint("LOG_SAMPLING_BURST"),
+                crawler.settings.getfloat("LOG_SAMPLING_INTERVAL"),
+                crawler.settings.getint("LOG_SAMPLING_RATE"),
+            )
+
+        o = cls(crawler, LogSampling.shared_filter)
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    def spider_opened(self, spider: Spider):
+        # Scrapy replaces its log handler when each crawl starts, after extensions are built
+        handler = get_scrapy_root_handler()
+        if handler is not None:
+            if self.sampling_filter not in handler.filters:
+                handler.addFilter(self.sampling_filter)
+            # Scrapy lets every record through the root logger and leaves it to the handler to drop those below
+            # LOG_LEVEL. Stopping them at the root logger means they aren't created in the first place
+            logging.root.setLevel(handler.level)
+
+        self.dropped_at_open = self.sampling_filter.dropped[spider.name]
+
+    def spider_closed(self, spider: Spider):
+        dropped = self.sampling_filter.dropped[spider.name] - self.dropped_at_open
+        self.crawler.stats.set_value("log/sampled_out", dropped)
+
+
+class StageTiming:
+    """
+    Finishes the timings in the run's stats: AdaptiveTimeoutMiddleware times each download by its `stage` meta
+    (`search` without one) under `timing/download/<stage>/`, and CallbackTimingMiddleware and the pipelines'
+    `timed_process_item` add `timing/callback/<callback>/` and `timing/pipeline/<pipeline>/`, so a slow council can be
+    put down to the network, parsing or the database.
+
+    Each timing has a count, total seconds, longest and histogram of bucket upper bound -> count, and this adds the
+    p50, p90 and p99 when the spider closes, so they're in `scraper_runs` too.
+    """
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("TIMING_ENABLED"):
+            raise NotConfigured
+
+        o = cls(crawler)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    def spider_closed(self, spider: Spider):
+        stats = self.crawler.stats
+        for key, histogram in list(stats.get_stats().items()):
+            if not key.startswith(f"{TIMING_STAT}/") or not key.endswith("/histogram"):
+                continue
+
+            prefix = key.removesuffix("/histogram")
+            longest = stats.get_value(f"{prefix}/max")
+            for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+                stats.set_value(f"{prefix}/{name}", round(min(bucket_quantile(histogram, q), longest), 4))
+            for name in ("seconds", "cpu_seconds", "max"):
+                if stats.get_value(f"{prefix}/{name}") is not None:
+                    stats.set_value(f"{prefix}/{name}", round(stats.get_value(f"{prefix}/{name}"), 4))
@@ -61,6 +61,20 @@ class PlanningApplication(pydantic.BaseModel):
     geometry: Optional[PlanningApplicationGeometry] = None
 
 
+class PlanningApplicationSearchResult(pydantic.BaseModel):
+    """The subset of an application that's shown in a portal's search results, without visiting its pages."""
+
+    lpa: str
+    reference: str
+    website_reference: str
+    url: str
+    submitted_date: datetime
+    validated_date: Optional[datetime] = None
+    address: str
+    description: Optional[str] = None
+    application_status: str
+
+
 # ---------------------------------------------------------------------------------------------------------------------
 # Idox
 
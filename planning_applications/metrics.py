@@ -0,0 +1,227 @@
+"""
+A local HTTP endpoint with the live metrics of the crawls running in the process, in the Prometheus text format, so a
+long backfill can be watched (and alerted on) while it's still running.
+
+Set METRICS_PORT to serve them at http://METRICS_HOST:METRICS_PORT/metrics. Every spider running in the process is
+served from the same endpoint, labelled with its name.
+"""
+
+import logging
+import resource
+import time
+from collections import deque
+from typing import ClassVar, Deque, Dict, List, Optional, Tuple
+
+from scrapy import Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from twisted.internet.task import LoopingCall
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from planning_applications.scheduling import engine_scheduler
+from shared.timing import TIMING_BUCKETS, TIMING_STAT
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "planning_applications"
+
+CONTENT_TYPE = b"text/plain; version=0.0.4; charset=utf-8"
+
+# Crawl stats exported as counters, by metric name
+COUNTER_STATS = {
+    "items_scraped": "item_scraped_count",
+    "items_dropped": "item_dropped_count",
+    "requests": "downloader/request_count",
+    "responses": "downloader/response_count",
+    "retries": "retry/count",
+    "retries_given_up": "retry/max_reached",
+    "download_exceptions": "downloader/exception_count",
+    "spider_exceptions": "spider_exceptions/count",
+}
+
+# Items per second are averaged over the samples taken this many seconds apart in the last minute
+RATE_SAMPLE_INTERVAL = 10.0
+RATE_SAMPLES = 7
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{escape_label(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricFamily:
+    """The lines of one metric, with its HELP and TYPE."""
+
+    def __init__(self, name: str, metric_type: str, help_text: str):
+        self.name = f"{METRIC_PREFIX}_{name}"
+        self.metric_type = metric_type
+        self.help_text = help_text
+        self.samples: List[Tuple[str, Dict[str, str], float]] = []
+
+    def add(self, labels: Dict[str, str], value: float, suffix: str = ""):
+        self.samples.append((suffix, labels, value))
+
+    def render(self) -> List[str]:
+        if not self.samples:
+            return []
+
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        for suffix, labels, value in self.samples:
+            lines.append(f"{self.name}{suffix}{format_labels(labels)} {format_value(value)}")
+        return lines
+
+
+def resident_memory_bytes() -> Optional[int]:
+    """The process's current RSS on Linux, from /proc/self/statm."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class CrawlMetrics:
+    """The live metrics of one crawl."""
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+        self.item_samples: Deque[Tuple[float, int]] = deque(maxlen=RATE_SAMPLES)
+
+    def sample(self):
+        items = self.crawler.stats.get_value("item_scraped_count", 0) if self.crawler.stats else 0
+        self.item_samples.append((time.monotonic(), items))
+
+    def items_per_second(self) -> float:
+        if len(self.item_samples) < 2:
+            return 0.0
+        (first_at, first_items), (last_at, last_items) = self.item_samples[0], self.item_samples[-1]
+        return (last_items - first_items) / (last_at - first_at) if last_at > first_at else 0.0
+
+    def collect(self, families: Dict[str, MetricFamily]):
+        labels = {"spider": self.crawler.spidercls.name}
+        stats = self.crawler.stats.get_stats() if self.crawler.stats else {}
+
+        for name, stat in COUNTER_STATS.items():
+            families[name].add(labels, stats.get(stat, 0))
+        families["items_per_second"].add(labels, round(self.items_per_second(), 3))
+
+        # The engine is only there once the crawl has started
+        if self.crawler.crawling:
+            engine = self.crawler.engine
+            scheduler = engine_scheduler(engine)
+            if scheduler is not None:
+                families["queue_depth"].add(labels, len(scheduler))
+            for slot_key, slot in engine.downloader.slots.items():
+                families["requests_in_flight"].add({**labels, "slot": slot_key}, len(slot.active))
+
+        for key, histogram in stats.items():
+            if key.startswith(f"{TIMING_STAT}/") and key.endswith("/histogram"):
+                prefix = key.removesuffix("/histogram")
+                _, kind, name = prefix.split("/", 2)
+                timing_labels = {**labels, "kind": kind, "name": name}
+                cumulative = 0
+                for bound in TIMING_BUCKETS:
+                    label = f"{bound:g}"
+                    cumulative += histogram.get(label, 0)
+                    le = "+Inf" if label == "inf" else label
+                    families["timing_seconds"].add({**timing_labels, "le": le}, cumulative, "_bucket")
+                families["timing_seconds"].add(timing_labels, stats.get(f"{prefix}/seconds", 0), "_sum")
+                families["timing_seconds"].add(timing_labels, stats.get(f"{prefix}/count", 0), "_count")
+
+
+def render_metrics(crawls: List[CrawlMetrics]) -> str:
+    """The metrics of `crawls` and the process, in the Prometheus text format."""
+    families = {
+        name: MetricFamily(f"{name}_total", "counter", f"Crawl stat {stat}") for name, stat in COUNTER_STATS.items()
+    }
+    for name, metric_type, help_text in (
+        ("items_per_second", "gauge", "Items scraped per second over the last minute"),
+        ("queue_depth", "gauge", "Requests waiting in the scheduler"),
+        ("requests_in_flight", "gauge", "Requests being downloaded, by downloader slot (domain)"),
+        ("timing_seconds", "histogram", "Downloads by stage, spider callbacks and item pipelines (see StageTiming)"),
+        ("resident_memory_bytes", "gauge", "Resident memory of the process"),
+    ):
+        families[name] = MetricFamily(name, metric_type, help_text)
+
+    for crawl in crawls:
+        crawl.collect(families)
+
+    rss = resident_memory_bytes()
+    if rss is not None:
+        families["resident_memory_bytes"].add({}, rss)
+
+    lines = [line for family in families.values() for line in family.render()]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsResource(Resource):
+    isLeaf = True
+
+    def __init__(self, crawls: List[CrawlMetrics]):
+        super().__init__()
+        self.crawls = crawls
+
+    def render_GET(self, request):
+        request.setHeader(b"Content-Type", CONTENT_TYPE)
+        return render_metrics(self.crawls).encode()
+
+
+class MetricsExporter:
+    """
+    Extension that serves the live metrics of every crawl in the process at /metrics on METRICS_PORT. The first crawl
+    to start opens the port, and the last to finish closes it.
+    """
+
+    # Shared by the crawlers of every spider in the process
+    crawls: ClassVar[List[CrawlMetrics]] = []
+    listening_port: ClassVar = None
+
+    def __init__(self, crawler: Crawler, host: str, port: int):
+        self.crawler = crawler
+        self.host = host
+        self.port = port
+        self.crawl = CrawlMetrics(crawler)
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        port = crawler.settings.getint("METRICS_PORT")
+        if not port:
+            raise NotConfigured
+
+        o = cls(crawler, crawler.settings.get("METRICS_HOST"), port)
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    def spider_opened(self, spider: Spider):
+        MetricsExporter.crawls.append(self.crawl)
+        if MetricsExporter.listening_port is None:
+            from twisted.internet import reactor
+
+            site = Site(MetricsResource(MetricsExporter.crawls))
+            site.noisy = False
+            MetricsExporter.listening_port = reactor.listenTCP(self.port, site, interface=self.host)
+            logger.info(f"Serving metrics at http://{self.host}:{self.port}/metrics")
+
+        self.task = LoopingCall(self.crawl.sample)
+        self.task.start(RATE_SAMPLE_INTERVAL)
+
+    def spider_closed(self, spider: Spider):
+        if self.task and self.task.running:
+            self.task.stop()
+
+        MetricsExporter.crawls.remove(self.crawl)
+        if not MetricsExporter.crawls and MetricsExporter.listening_port is not None:
+            MetricsExporter.listening_port.stopListening()
+            MetricsExporter.listening_port = None
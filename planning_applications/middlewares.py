@@ -0,0 +1,343 @@
+import inspect
+import logging
+import time
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set
+from urllib.parse import urlparse
+
+from scrapy import Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.downloadermiddlewares.downloadtimeout import DownloadTimeoutMiddleware
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http.request import Request
+from scrapy.http.response import Response
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet.error import TimeoutError
+
+try:
+    from scrapy.exceptions import DownloadTimeoutError
+except ImportError:
+    # Scrapy before 2.14 raises Twisted's TimeoutError for downloads that time out
+    DownloadTimeoutError = TimeoutError
+
+from shared.timing import TIMING_STAT, bucket_quantile, record_timing
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_BREAKER_STAT = "circuit_breaker"
+CIRCUIT_BREAKER_CLOSE_REASON = "circuit_breaker_open"
+
+DOWNLOAD_LATENCY_STAT = "download_latency"
+ADAPTIVE_TIMEOUT_STAT = "adaptive_timeout"
+
+# The stage of requests without `stage` meta, which are the search forms and results pages
+DEFAULT_STAGE = "search"
+
+
+class CircuitBreakerOpen(IgnoreRequest):
+    """A request was dropped because its domain's circuit breaker is open."""
+
+
+class CircuitBreakerMiddleware:
+    """
+    Downloader middleware that stops hammering a council site that is down.
+
+    Every failed attempt at a domain (an exception such as a timeout, or a status in CIRCUIT_BREAKER_HTTP_CODES) counts
+    towards CIRCUIT_BREAKER_THRESHOLD, and any other response resets the count. When a domain reaches the threshold its
+    breaker opens. Further requests to it are dropped rather than retried. If it's one of the spider's own domains, the
+    spider is closed with the reason `circuit_breaker_open`, which ends up in `scraper_runs`.
+
+    On the spider's next run the breaker starts half-open. The first failure opens it again straight away, and the
+    first success closes it.
+
+    It sits just before the retry middleware, so it sees each attempt's failure before the request is retried.
+    """
+
+    def __init__(self, crawler: Crawler, threshold: int, http_codes: Set[int]):
+        self.crawler = crawler
+        self.threshold = threshold
+        self.http_codes = http_codes
+        self.consecutive_failures: Dict[str, int] = defaultdict(int)
+        self.open_domains: Set[str] = set()
+        self.half_open_domains: Set[str] = set()
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("CIRCUIT_BREAKER_ENABLED"):
+            raise NotConfigured
+
+        o = cls(
+            crawler,
+            crawler.settings.getint("CIRCUIT_BREAKER_THRESHOLD"),
+            {int(code) for code in crawler.settings.getlist("CIRCUIT_BREAKER_HTTP_CODES")},
+        )
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        return o
+
+    @property
+    def stats(self):
+        return self.crawler.stats
+
+    def spider_opened(self, spider: Spider):
+        get_last_run_stats = getattr(spider, "get_last_run_stats", None)
+        if not get_last_run_stats:
+            return
+
+        last_run_stats = get_last_run_stats()
+        if last_run_stats.get("finish_reason") != CIRCUIT_BREAKER_CLOSE_REASON:
+            return
+
+        domain = last_run_stats.get(f"{CIRCUIT_BREAKER_STAT}/opened_domain")
+        if domain:
+            logger.info(f"Circuit breaker for {domain} opened on the last run, probing it half-open")
+            self.half_open_domains.add(domain)
+            self.stats.set_value(f"{CIRCUIT_BREAKER_STAT}/half_open_domain", domain)
+
+    def process_request(self, request: Request, spider: Optional[Spider] = None) -> Optional[Response]:
+        domain = self._domain(request)
+        if domain in self.open_domains:
+            self.stats.inc_value(f"{CIRCUIT_BREAKER_STAT}/dropped")
+            raise CircuitBreakerOpen(f"Circuit breaker for {domain} is open")
+        return None
+
+    def process_response(self, request: Request, response: Response, spider: Optional[Spider] = None) -> Response:
+        if response.status in self.http_codes:
+            self._record_failure(request)
+        else:
+            self._record_success(request)
+        return response
+
+    def process_exception(self, request: Request, exception: Exception, spider: Optional[Spider] = None) -> None:
+        if not isinstance(exception, IgnoreRequest):
+            self._record_failure(request)
+        return None
+
+    def _record_success(self, request: Request):
+        domain = self._domain(request)
+        self.consecutive_failures[domain] = 0
+        if domain in self.half_open_domains:
+            logger.info(f"Circuit breaker for {domain} closed, the site is responding again")
+            self.half_open_domains.discard(domain)
+            self.stats.set_value(f"{CIRCUIT_BREAKER_STAT}/half_open_recovered", True)
+
+    def _record_failure(self, request: Request):
+        domain = self._domain(request)
+        self.consecutive_failures[domain] += 1
+        self.stats.inc_value(f"{CIRCUIT_BREAKER_STAT}/failures")
+
+        threshold = 1 if domain in self.half_open_domains else self.threshold
+        if self.consecutive_failures[domain] >= threshold and domain not in self.open_domains:
+            self._open(domain)
+
+    def _open(self, domain: str):
+        logger.error(
+            f"Circuit breaker for {domain} opened after {self.consecutive_failures[domain]} consecutive failures"
+        )
+        self.open_domains.add(domain)
+        self.stats.set_value(f"{CIRCUIT_BREAKER_STAT}/opened_domain", domain)
+
+        spider = self.crawler.spider
+        if spider is not None and self._is_spider_domain(spider, domain):
+            self._close_spider()
+
+    def _close_spider(self):
+        engine = self.crawler.engine
+        if engine is None:
+            return
+        if hasattr(engine, "close_spider_async"):
+            deferred_from_coro(engine.close_spider_async(reason=CIRCUIT_BREAKER_CLOSE_REASON))
+        else:
+            # Scrapy before 2.14
+            engine.close_spider(self.crawler.spider, reason=CIRCUIT_BREAKER_CLOSE_REASON)
+
+    def _is_spider_domain(self, spider: Spider, domain: str) -> bool:
+        allowed_domains = getattr(spider, "allowed_domains", None) or []
+        return any(domain == d or domain.endswith(f".{d}") for d in allowed_domains)
+
+    def _domain(self, request: Request) -> str:
+        return urlparse(request.url).hostname or ""
+
+
+class AdaptiveTimeoutMiddleware(DownloadTimeoutMiddleware):
+    """
+    Downloader middleware that sets the download timeout of each request from how long the same stage of the same
+    spider took on its last run, in place of Scrapy's DownloadTimeoutMiddleware.
+
+    Each download is timed by its stage (its `stage` meta, or `search`) under `timing/download/<stage>/` in the run's
+    stats (see StageTiming), and the count, p50 and p99 of each stage are taken from those timings into
+    `download_latency/` when the spider closes, and so saved in `scraper_runs`. On the next run, a stage with at least
+    ADAPTIVE_TIMEOUT_MIN_SAMPLES downloads gets a timeout of its p99 times ADAPTIVE_TIMEOUT_MULTIPLIER, between
+    ADAPTIVE_TIMEOUT_MIN and DOWNLOAD_TIMEOUT. Other stages, and requests with their own `download_timeout` meta, keep
+    DOWNLOAD_TIMEOUT. The timeouts chosen are recorded under `adaptive_timeout/`.
+
+    Downloads that time out are counted at the timeout they were given, so a stage that keeps timing out gets a longer
+    timeout next run rather than a shorter one. It sits just before the retry middleware so it sees every attempt.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        timeout: float,
+        enabled: bool,
+        multiplier: float,
+        minimum: float,
+        min_samples: int,
+    ):
+        super().__init__(timeout)
+        self.crawler = crawler
+        self.enabled = enabled
+        self.multiplier = multiplier
+        self.minimum = minimum
+        self.min_samples = min_samples
+        self.stage_timeouts: Dict[str, float] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        o = cls(
+            crawler,
+            crawler.settings.getfloat("DOWNLOAD_TIMEOUT"),
+            crawler.settings.getbool("ADAPTIVE_TIMEOUT_ENABLED"),
+            crawler.settings.getfloat("ADAPTIVE_TIMEOUT_MULTIPLIER"),
+            crawler.settings.getfloat("ADAPTIVE_TIMEOUT_MIN"),
+            crawler.settings.getint("ADAPTIVE_TIMEOUT_MIN_SAMPLES"),
+        )
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    @property
+    def stats(self):
+        return self.crawler.stats
+
+    def spider_opened(self, spider: Spider):
+        super().spider_opened(spider)
+
+        get_last_run_stats = getattr(spider, "get_last_run_stats", None)
+        if not self.enabled or not self._timeout or not get_last_run_stats:
+            return
+
+        self.stage_timeouts = self.stage_timeouts_from(get_last_run_stats())
+        for stage, timeout in self.stage_timeouts.items():
+            logger.info(f"Download timeout for {stage} requests is {timeout}s, from last run's latency")
+            self.stats.set_value(f"{ADAPTIVE_TIMEOUT_STAT}/{stage}", timeout)
+
+    def stage_timeouts_from(self, last_run_stats: dict) -> Dict[str, float]:
+        """The timeout of each stage with enough downloads in `last_run_stats` to go on."""
+        prefix = f"{DOWNLOAD_LATENCY_STAT}/"
+        stages = {key[len(prefix) :].rsplit("/", 1)[0] for key in last_run_stats if key.startswith(prefix)}
+
+        stage_timeouts = {}
+        for stage in sorted(stages):
+            count = last_run_stats.get(f"{prefix}{stage}/count") or 0
+            p99 = last_run_stats.get(f"{prefix}{stage}/p99")
+            if count < self.min_samples or p99 is None:
+                continue
+
+            timeout = min(self._timeout, max(self.minimum, p99 * self.multiplier))
+            stage_timeouts[stage] = round(timeout, 1)
+        return stage_timeouts
+
+    def process_request(self, request: Request, spider: Optional[Spider] = None) -> Optional[Response]:
+        timeout = self.stage_timeouts.get(self._stage(request), self._timeout)
+        if timeout:
+            request.meta.setdefault("download_timeout", timeout)
+        return None
+
+    def process_response(self, request: Request, response: Response, spider: Optional[Spider] = None) -> Response:
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            record_timing(self.stats, "download", self._stage(request), latency)
+        return response
+
+    def process_exception(self, request: Request, exception: Exception, spider: Optional[Spider] = None) -> None:
+        if isinstance(exception, (DownloadTimeoutError, TimeoutError)) and request.meta.get("download_timeout"):
+            stage = self._stage(request)
+            record_timing(self.stats, "download", stage, request.meta["download_timeout"])
+            self.stats.inc_value(f"{ADAPTIVE_TIMEOUT_STAT}/{stage}/timeouts")
+        return None
+
+    def spider_closed(self, spider: Spider):
+        # Connected before LogScraperRunMiddleware, as downloader middlewares are built before spider middlewares, so
+        # these are in the stats it saves to scraper_runs
+        prefix = f"{TIMING_STAT}/download/"
+        for key, histogram in list(self.stats.get_stats().items()):
+            if not key.startswith(prefix) or not key.endswith("/histogram"):
+                continue
+
+            stage = key[len(prefix) :].removesuffix("/histogram")
+            longest = self.stats.get_value(f"{prefix}{stage}/max")
+            self.stats.set_value(f"{DOWNLOAD_LATENCY_STAT}/{stage}/count", sum(histogram.values()))
+            for name, q in (("p50", 0.5), ("p99", 0.99)):
+                quantile = min(bucket_quantile(histogram, q), longest)
+                self.stats.set_value(f"{DOWNLOAD_LATENCY_STAT}/{stage}/{name}", round(quantile, 3))
+
+    def _stage(self, request: Request) -> str:
+        return request.meta.get("stage", DEFAULT_STAGE)
+
+
+class CallbackTimingMiddleware:
+    """
+    Spider middleware that times each spider callback, under `timing/callback/<callback>/` in the run's stats (see
+    StageTiming). It sits closest to the spider, so the time spent producing its output is the callback's own, and
+    counts both the wall time (including any database queries) and the CPU time.
+    """
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("TIMING_ENABLED"):
+            raise NotConfigured
+        return cls(crawler)
+
+    def process_spider_output(self, response: Response, result: Iterable[Any], spider: Optional[Spider] = None):
+        seconds = cpu_seconds = 0.0
+        iterator = iter(result)
+        try:
+            while True:
+                started, started_cpu = time.perf_counter(), time.thread_time()
+                try:
+                    r = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - started
+                    cpu_seconds += time.thread_time() - started_cpu
+                yield r
+        finally:
+            record_timing(self.crawler.stats, "callback", self._callback_name(response), seconds, cpu_seconds)
+
+    async def process_spider_output_async(
+        self, response: Response, result: AsyncIterator[Any], spider: Optional[Spider] = None
+    ):
+        # Other coroutines run while an async callback awaits, so only its wall time is counted. Scrapy wraps the output
+        # of other callbacks, which never wait, when a middleware needs it to be async
+        callback = response.request.callback if response.request else None
+        count_cpu = not (inspect.iscoroutinefunction(callback) or inspect.isasyncgenfunction(callback))
+
+        seconds = cpu_seconds = 0.0
+        iterator = aiter(result)
+        try:
+            while True:
+                started, started_cpu = time.perf_counter(), time.thread_time()
+                try:
+                    r = await anext(iterator)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - started
+                    cpu_seconds += time.thread_time() - started_cpu
+                yield r
+        finally:
+            record_timing(
+                self.crawler.stats,
+                "callback",
+                self._callback_name(response),
+                seconds,
+                cpu_seconds if count_cpu else None,
+            )
+
+    def _callback_name(self, response: Response) -> str:
+        callback = response.request.callback if response.request else None
+        return getattr(callback, "__name__", None) or "parse"
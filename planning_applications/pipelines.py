@@ -1,11 +1,12 @@
 import os
+import statistics
 import tempfile
-from typing import Any
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
 from urllib.parse import urlparse
 
-import boto3
-import requests
-from botocore.exceptions import ClientError
+from scrapy.exceptions import NotConfigured
 
 from planning_applications.db import (
     get_connection,
@@ -15,8 +16,11 @@ from planning_applications.db import (
     upsert_planning_application_appeal,
     upsert_planning_application_appeal_document,
     upsert_planning_application_document,
+    upsert_planning_application_documents,
+    upsert_planning_application_geometries,
     upsert_planning_application_geometry,
     upsert_planning_application_item,
+    upsert_planning_application_search_result,
 )
 from planning_applications.items import (
     IdoxPlanningApplicationGeometry,
@@ -26,16 +30,30 @@ from planning_applications.items import (
     PlanningApplicationAppealDocument,
     PlanningApplicationDocument,
     PlanningApplicationGeometry,
+    PlanningApplicationSearchResult,
 )
+from planning_applications.profiling import profiled_process_item
 from planning_applications.utils import getenv, hasenv
+from shared.timing import timed_process_item
 
 
 class IdoxPlanningApplicationPipeline:
+    @timed_process_item
+    @profiled_process_item
     def process_item(self, idox_item: IdoxPlanningApplicationItem | Any, spider) -> PlanningApplication:
         if not isinstance(idox_item, IdoxPlanningApplicationItem):
             return idox_item
 
-        spider.logger.info("Mapping item")
+        spider.logger.debug("Mapping item")
+
+        geometry = None
+        if idox_item["geometry"] and idox_item["geometry"].geometry:
+            geometry = PlanningApplicationGeometry(
+                lpa=idox_item["lpa"],
+                application_reference=idox_item["reference"],
+                reference=idox_item["geometry"].reference,
+                geometry=idox_item["geometry"].geometry,
+            )
 
         item = PlanningApplication(
             lpa=idox_item["lpa"],
@@ -67,29 +85,85 @@ class IdoxPlanningApplicationPipeline:
             else None,
             is_active=idox_item["is_active"],
             documents=idox_item["documents"],
-            geometry=idox_item["geometry"],
+            geometry=geometry,
         )
 
         return item
 
 
+class ApplicationUuidCache:
+    """The uuids of the `size` most recently used applications, by lpa and reference, counting hits and misses."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.uuids: OrderedDict[Tuple[str, str], str] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, lpa: str, reference: str) -> Optional[str]:
+        uuid = self.uuids.get((lpa, reference))
+        if uuid is None:
+            self.misses += 1
+            return None
+
+        self.uuids.move_to_end((lpa, reference))
+        self.hits += 1
+        return uuid
+
+    def put(self, lpa: str, reference: str, uuid: str):
+        self.uuids[(lpa, reference)] = uuid
+        self.uuids.move_to_end((lpa, reference))
+        if len(self.uuids) > self.size:
+            self.uuids.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
 class PostgresPipeline:
-    def __init__(self):
+    def __init__(self, batch_size: int = 100, uuid_cache_size: int = 10_000):
         self.connection = get_connection()
         self.cur = get_cursor(self.connection)
+        # Days from validation to insert, for each application this run added
+        self.lag_days: List[int] = []
+        # Documents and geometries yielded on their own are written `batch_size` at a time, with their application's
+        # uuid looked up in the cache first, so an application with hundreds of documents isn't hundreds of SELECTs
+        # and commits
+        self.batch_size = batch_size
+        self.uuids = ApplicationUuidCache(uuid_cache_size)
+        self.pending_documents: List[Tuple[str, PlanningApplicationDocument]] = []
+        self.pending_geometries: List[Tuple[str, PlanningApplicationGeometry]] = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        # SpoolPipeline writes the items instead
+        if crawler.settings.getbool("SPOOL_ENABLED"):
+            raise NotConfigured
+        return cls(
+            batch_size=crawler.settings.getint("POSTGRES_BATCH_SIZE", 100),
+            uuid_cache_size=crawler.settings.getint("POSTGRES_UUID_CACHE_SIZE", 10_000),
+        )
 
+    @timed_process_item
+    @profiled_process_item
     def process_item(
         self,
         item: PlanningApplication
         | PlanningApplicationDocument
         | PlanningApplicationAppeal
         | PlanningApplicationAppealDocument
-        | PlanningApplicationGeometry,
+        | PlanningApplicationGeometry
+        | PlanningApplicationSearchResult,
         spider,
     ):
         if isinstance(item, PlanningApplication):
             return self.process_planning_application(item, spider)
 
+        if isinstance(item, PlanningApplicationSearchResult):
+            return self.process_planning_application_search_result(item, spider)
+
         if isinstance(item, PlanningApplicationDocument):
             return self.process_planning_application_document(item, spider)
 
@@ -103,10 +177,10 @@ class PostgresPipeline:
             return self.process_planning_application_geometry(item, spider)
 
     def process_planning_application(self, item: PlanningApplication, spider):
-        spider.logger.info(f"Inserting planning application {item.reference}")
+        spider.logger.debug("Inserting planning application %s", item.reference)
 
         try:
-            uuid = upsert_planning_application(self.cur, item)
+            uuid, inserted = upsert_planning_application(self.cur, item)
 
             for document in item.documents or []:
                 _ = upsert_planning_application_document(self.cur, uuid, document)
@@ -121,28 +195,49 @@ class PostgresPipeline:
             spider.logger.error(f"Error inserting item into the database: {e}")
             raise
 
+        self.uuids.put(item.lpa, item.reference, uuid)
+        if inserted:
+            self._record_lag(item.validated_date)
+
         return item
 
-    def process_planning_application_document(self, item: PlanningApplicationDocument, spider):
-        spider.logger.info(f"Inserting planning application document {item.url}")
+    def process_planning_application_search_result(self, item: PlanningApplicationSearchResult, spider):
+        spider.logger.debug("Inserting planning application search result %s", item.reference)
+
         try:
-            application_uuid = get_planning_application_uuid_for_lpa_and_reference(
-                self.cur, item.lpa, item.application_reference
-            )
-            if not application_uuid:
-                spider.logger.error(
-                    f"Planning application not found for {item.application_reference}, unable to save document"
-                )
-                return item
+            uuid, inserted = upsert_planning_application_search_result(self.cur, item)
+            self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            spider.logger.error(f"Error inserting search result into the database: {e}")
+            raise
 
-            _ = upsert_planning_application_document(self.cur, application_uuid, item)
+        self.uuids.put(item.lpa, item.reference, uuid)
+        if inserted:
+            self._record_lag(item.validated_date)
 
-            self.connection.commit()
+        return item
+
+    def process_planning_application_document(self, item: PlanningApplicationDocument, spider):
+        spider.logger.debug("Inserting planning application document %s", item.url)
+        try:
+            application_uuid = self._application_uuid(item.lpa, item.application_reference)
         except Exception:
             self.connection.rollback()
+            return item
+
+        if not application_uuid:
+            spider.logger.error(
+                f"Planning application not found for {item.application_reference}, unable to save document"
+            )
+            return item
+
+        self.pending_documents.append((application_uuid, item))
+        self._flush_if_full(spider)
+        return item
 
     def process_appeal_case_item(self, item: PlanningApplicationAppeal, spider):
-        spider.logger.info(f"Inserting planning application appeal {item.reference}")
+        spider.logger.debug("Inserting planning application appeal %s", item.reference)
         try:
             _ = upsert_planning_application_appeal(self.cur, item)
             self.connection.commit()
@@ -152,7 +247,7 @@ class PostgresPipeline:
             raise
 
     def process_appeal_case_document_item(self, item: PlanningApplicationAppealDocument, spider):
-        spider.logger.info(f"Inserting planning application appeal document {item.reference}")
+        spider.logger.debug("Inserting planning application appeal document %s", item.reference)
         try:
             _ = upsert_planning_application_appeal_document(self.cur, item)
             self.connection.commit()
@@ -162,23 +257,100 @@ class PostgresPipeline:
             raise
 
     def process_planning_application_geometry(self, item: PlanningApplicationGeometry, spider):
-        spider.logger.info(f"Inserting planning application geometry {item.reference}")
+        spider.logger.debug("Inserting planning application geometry %s", item.reference)
         try:
-            application_uuid = get_planning_application_uuid_for_lpa_and_reference(
-                self.cur, item.lpa, item.application_reference
+            application_uuid = self._application_uuid(item.lpa, item.application_reference)
+        except Exception:
+            self.connection.rollback()
+            return item
+
+        if not application_uuid:
+            spider.logger.error(
+                f"Planning application not found for {item.application_reference}, unable to save geometry"
             )
-            if not application_uuid:
-                spider.logger.error(
-                    f"Planning application not found for {item.application_reference}, unable to save geometry"
-                )
-                return item
+            return item
+
+        self.pending_geometries.append((application_uuid, item))
+        self._flush_if_full(spider)
+        return item
+
+    def _application_uuid(self, lpa: str, reference: str) -> Optional[str]:
+        uuid = self.uuids.get(lpa, reference)
+        if uuid is None:
+            uuid = get_planning_application_uuid_for_lpa_and_reference(self.cur, lpa, reference)
+            if uuid:
+                self.uuids.put(lpa, reference, uuid)
+        return uuid
+
+    def _flush_if_full(self, spider):
+        if len(self.pending_documents) + len(self.pending_geometries) >= self.batch_size:
+            self._flush(spider)
+
+    def _flush(self, spider):
+        """
+        Write the pending documents and geometries in one transaction. If that fails, they're written one at a time,
+        so one bad row doesn't lose the rest of the batch.
+        """
+        documents, self.pending_documents = self.pending_documents, []
+        geometries, self.pending_geometries = self.pending_geometries, []
+        if not documents and not geometries:
+            return
 
-            _ = upsert_planning_application_geometry(self.cur, application_uuid, item)
+        try:
+            upsert_planning_application_documents(self.cur, documents)
+            upsert_planning_application_geometries(self.cur, geometries)
             self.connection.commit()
-        except Exception:
+            return
+        except Exception as e:
             self.connection.rollback()
+            spider.logger.warning(
+                f"Error inserting {len(documents)} documents and {len(geometries)} geometries into the database, "
+                f"inserting them one at a time: {e}"
+            )
+
+        for application_uuid, document in documents:
+            try:
+                _ = upsert_planning_application_document(self.cur, application_uuid, document)
+                self.connection.commit()
+            except Exception as e:
+                self.connection.rollback()
+                spider.logger.error(f"Error inserting document {document.url} into the database: {e}")
+
+        for application_uuid, geometry in geometries:
+            try:
+                _ = upsert_planning_application_geometry(self.cur, application_uuid, geometry)
+                self.connection.commit()
+            except Exception as e:
+                self.connection.rollback()
+                spider.logger.error(f"Error inserting geometry {geometry.reference} into the database: {e}")
+
+    def _record_lag(self, validated_date: Optional[datetime]):
+        if validated_date is not None:
+            self.lag_days.append((date.today() - validated_date.date()).days)
+
+    def _record_freshness_stats(self, spider):
+        """
+        Record how long after validation this run's new applications reached the database, under `freshness/` in the
+        run's stats. Each spider is one council, so these are per LPA.
+        """
+        stats = spider.crawler.stats
+        stats.set_value("freshness/new_applications", len(self.lag_days))
+        if self.lag_days:
+            stats.set_value("freshness/lag_days_p50", statistics.median(self.lag_days))
+            stats.set_value("freshness/lag_days_max", max(self.lag_days))
+
+    def _record_uuid_cache_stats(self, spider):
+        """Record how often an application's uuid was found in the cache, under `postgres/uuid_cache/`."""
+        stats = spider.crawler.stats
+        stats.set_value("postgres/uuid_cache/hits", self.uuids.hits)
+        stats.set_value("postgres/uuid_cache/misses", self.uuids.misses)
+        if self.uuids.hit_rate is not None:
+            stats.set_value("postgres/uuid_cache/hit_rate", round(self.uuids.hit_rate, 3))
 
     def close_spider(self, spider):
+        self._flush(spider)
+        self._record_freshness_stats(spider)
+        self._record_uuid_cache_stats(spider)
         self.cur.close()
         self.connection.close()
 
@@ -207,6 +379,9 @@ class S3FileDownloadPipeline:
 
         self.s3_bucket = s3_bucket
 
+        # Only needed when downloading files, and slow to import
+        import boto3
+
         if hasenv("AWS_ACCESS_KEY_ID") and hasenv("AWS_SECRET_ACCESS_KEY") and hasenv("AWS_REGION"):
             self.s3_client = boto3.client(
                 "s3",
@@ -222,6 +397,8 @@ class S3FileDownloadPipeline:
         except Exception as e:
             raise Exception("AWS credentials not found") from e
 
+    @timed_process_item
+    @profiled_process_item
     def process_item(self, item, spider):
         if not self.download_files:
             return item
@@ -232,6 +409,8 @@ class S3FileDownloadPipeline:
         return item
 
     def _download_and_upload_appeal_document(self, document, spider):
+        import requests
+
         url = self._get_attribute_or_key(document, "url")
         if not url:
             return
@@ -269,6 +448,8 @@ class S3FileDownloadPipeline:
                 os.unlink(temp_file.name)
 
     def _upload_file_to_s3(self, file_path, s3_key, spider):
+        from botocore.exceptions import ClientError
+
         try:
             content_type = self._get_content_type(s3_key)
 
@@ -298,6 +479,8 @@ class S3FileDownloadPipeline:
         return content_types.get(ext, "application/octet-stream")
 
     def _object_exists(self, s3_key):
+        from botocore.exceptions import ClientError
+
         try:
             self.s3_client.head_object(Bucket=self.s3_bucket, Key=s3_key)
             return True
@@ -0,0 +1,301 @@
+"""
+Profiles of each spider's callbacks and pipelines, written to PROFILE_DIR when the spider closes, so the parsers or
+upserts a slow crawl spends its time or memory in can be found without wrapping CrawlerProcess by hand.
+
+Set PROFILE (or pass `--profile` to run_spiders.py) to:
+
+- `cpu` to run cProfile over the spider's callbacks and its items' pipelines. Each spider has its own profiler, which
+  only runs while that spider's code does, so spiders crawling at the same time don't end up in each other's profiles.
+  The `.prof` file can be loaded with pstats or snakeviz, and the `.txt` file has the PROFILE_TOP_N functions by
+  cumulative time, then those in this project.
+- `mem` to trace allocations with tracemalloc while the spider runs, and report the PROFILE_TOP_N lines of code, and of
+  this project's code, holding the most memory allocated since the spider opened, at its peak. Snapshots are taken
+  every PROFILE_SNAPSHOT_INTERVAL seconds, and the largest is kept. Allocations are traced for the whole process, so
+  run one spider on its own to see only its allocations.
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import linecache
+import logging
+import pstats
+import re
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, ClassVar, Iterable, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from scrapy import Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.http.response import Response
+from twisted.internet.task import LoopingCall
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cpu", "mem")
+
+# This project's code, which allocations are attributed to
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+PROJECT_PACKAGES = tuple(str(PROJECT_ROOT / package) + "/" for package in ("planning_applications", "shared"))
+
+# Frames kept for each traced allocation, so it can be put down to the project code it was made from
+TRACEMALLOC_FRAMES = 25
+
+_DONE = object()
+
+
+class CpuProfile:
+    """A spider's cProfile profiler, turned on only while its callbacks and pipelines run."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    @contextmanager
+    def running(self):
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler is running, e.g. the whole process is being profiled
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            self.profile.disable()
+
+
+# The CPU profile of each crawl, made by whichever of CrawlProfiler, CallbackProfilingMiddleware or
+# profiled_process_item needs it first
+cpu_profiles: "WeakKeyDictionary[Crawler, CpuProfile]" = WeakKeyDictionary()
+
+
+def cpu_profile(crawler: Crawler) -> CpuProfile:
+    if crawler not in cpu_profiles:
+        cpu_profiles[crawler] = CpuProfile()
+    return cpu_profiles[crawler]
+
+
+def profiled_process_item(process_item: Callable) -> Callable:
+    """Decorates a pipeline's `process_item` to run it under the spider's CPU profile, if PROFILE is `cpu`."""
+
+    @functools.wraps(process_item)
+    def wrapper(self, item, spider):
+        crawler = getattr(spider, "crawler", None)
+        if crawler is None or crawler.settings.get("PROFILE") != "cpu":
+            return process_item(self, item, spider)
+
+        with cpu_profile(crawler).running():
+            return process_item(self, item, spider)
+
+    return wrapper
+
+
+class CallbackProfilingMiddleware:
+    """
+    Spider middleware that runs each spider callback under the spider's CPU profile, if PROFILE is `cpu`. It sits
+    closest to the spider, so only the callback's own code is profiled. Callbacks that are coroutines let other code
+    run while they wait, so they aren't profiled.
+    """
+
+    def __init__(self, profile: CpuProfile):
+        self.profile = profile
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if crawler.settings.get("PROFILE") != "cpu":
+            raise NotConfigured
+        return cls(cpu_profile(crawler))
+
+    def process_spider_output(self, response: Response, result: Iterable[Any], spider: Optional[Spider] = None):
+        iterator = iter(result)
+        while True:
+            with self.profile.running():
+                r = next(iterator, _DONE)
+            if r is _DONE:
+                break
+            yield r
+
+    async def process_spider_output_async(
+        self, response: Response, result: AsyncIterator[Any], spider: Optional[Spider] = None
+    ):
+        callback = response.request.callback if response.request else None
+        if inspect.iscoroutinefunction(callback) or inspect.isasyncgenfunction(callback):
+            async for r in result:
+                yield r
+            return
+
+        # Scrapy wraps the output of other callbacks, which never wait, when a middleware needs it to be async
+        iterator = aiter(result)
+        while True:
+            with self.profile.running():
+                r = await anext(iterator, _DONE)
+            if r is _DONE:
+                break
+            yield r
+
+
+def format_cpu_report(spider_name: str, profile: cProfile.Profile, top_n: int) -> str:
+    stream = io.StringIO()
+    stream.write(f"CPU profile of {spider_name}'s callbacks and pipelines\n")
+    stats = pstats.Stats(profile, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE)
+    stats.print_stats(top_n)
+    stream.write("\nIn this project's code:\n")
+    stats.print_stats("|".join(re.escape(package) for package in PROJECT_PACKAGES), top_n)
+    return stream.getvalue()
+
+
+def project_frame(traceback: tracemalloc.Traceback) -> Optional[tracemalloc.Frame]:
+    """The innermost frame of `traceback` in this project's code."""
+    # Tracebacks are ordered from the oldest frame to the most recent
+    for frame in reversed(traceback):
+        if frame.filename.startswith(PROJECT_PACKAGES):
+            return frame
+    return None
+
+
+def allocations_by_project_code(
+    snapshot: tracemalloc.Snapshot, since: tracemalloc.Snapshot, top_n: int
+) -> List[Tuple[str, int, int]]:
+    """
+    The `top_n` lines of this project's code holding the most memory allocated since the `since` snapshot, including
+    memory allocated by the library code they called, as (line, bytes, allocations).
+    """
+    by_line = {}
+    for diff in snapshot.compare_to(since, "traceback"):
+        if diff.size_diff <= 0:
+            continue
+        frame = project_frame(diff.traceback)
+        if frame is None:
+            continue
+
+        location = f"{Path(frame.filename).relative_to(PROJECT_ROOT)}:{frame.lineno}"
+        size, count = by_line.get(location, (0, 0))
+        by_line[location] = (size + diff.size_diff, count + max(diff.count_diff, 0))
+
+    top = sorted(by_line.items(), key=lambda item: -item[1][0])[:top_n]
+    return [(location, size, count) for location, (size, count) in top]
+
+
+def format_mem_report(
+    spider_name: str, snapshot: tracemalloc.Snapshot, since: tracemalloc.Snapshot, peak_bytes: int, top_n: int
+) -> str:
+    peak_mb = peak_bytes / 1024 / 1024
+    lines = [
+        f"Memory allocated since {spider_name} opened, at the largest of its snapshots ({peak_mb:.1f} MB traced)",
+        "",
+        f"Top {top_n} lines:",
+    ]
+    for diff in snapshot.compare_to(since, "lineno")[:top_n]:
+        frame = diff.traceback[0]
+        location = f"{frame.filename}:{frame.lineno}"
+        lines.append(f"{diff.size_diff / 1024:>10.1f} KiB {diff.count_diff:>8} blocks  {location}")
+        lines.append(f"{'':>31}{linecache.getline(frame.filename, frame.lineno).strip()}")
+
+    lines += ["", f"Top {top_n} lines of this project's code, with the allocations of the code they call:"]
+    for location, size, count in allocations_by_project_code(snapshot, since, top_n):
+        filename, lineno = location.rsplit(":", 1)
+        lines.append(f"{size / 1024:>10.1f} KiB {count:>8} blocks  {location}")
+        lines.append(f"{'':>31}{linecache.getline(str(PROJECT_ROOT / filename), int(lineno)).strip()}")
+
+    return "\n".join(lines) + "\n"
+
+
+def take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__, all_frames=True),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        )
+    )
+
+
+class CrawlProfiler:
+    """
+    Extension that writes each spider's CPU or memory profile to PROFILE_DIR when it closes, if PROFILE is set. The
+    first spider to start with PROFILE `mem` starts tracemalloc, and the last to finish stops it.
+    """
+
+    # Spiders in the process tracing their allocations
+    tracing: ClassVar[int] = 0
+
+    def __init__(self, crawler: Crawler, mode: str, directory: Path, top_n: int, snapshot_interval: float):
+        self.crawler = crawler
+        self.mode = mode
+        self.directory = directory
+        self.top_n = top_n
+        self.snapshot_interval = snapshot_interval
+        self.opened_at = datetime.now()
+        self.opened_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_bytes = 0
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        mode = crawler.settings.get("PROFILE")
+        if not mode:
+            raise NotConfigured
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile {mode}, expected one of {', '.join(PROFILE_MODES)}")
+
+        o = cls(
+            crawler,
+            mode,
+            Path(crawler.settings.get("PROFILE_DIR")),
+            crawler.settings.getint("PROFILE_TOP_N"),
+            crawler.settings.getfloat("PROFILE_SNAPSHOT_INTERVAL"),
+        )
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        return o
+
+    def spider_opened(self, spider: Spider):
+        self.opened_at = datetime.now()
+        if self.mode != "mem":
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        CrawlProfiler.tracing += 1
+
+        self.opened_snapshot = take_snapshot()
+        self.task = LoopingCall(self.sample)
+        self.task.start(self.snapshot_interval, now=False)
+
+    def sample(self):
+        traced, _ = tracemalloc.get_traced_memory()
+        if self.peak_snapshot is None or traced > self.peak_bytes:
+            self.peak_bytes = traced
+            self.peak_snapshot = take_snapshot()
+
+    def spider_closed(self, spider: Spider):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{spider.name}-{self.opened_at:%Y%m%dT%H%M%S}"
+
+        if self.mode == "cpu":
+            profile = cpu_profile(self.crawler).profile
+            profile.dump_stats(path.with_suffix(".prof"))
+            path.with_suffix(".txt").write_text(format_cpu_report(spider.name, profile, self.top_n))
+            logger.info(f"Wrote the CPU profile of {spider.name} to {path}.prof and {path}.txt")
+            return
+
+        if self.task and self.task.running:
+            self.task.stop()
+        self.sample()
+
+        report = format_mem_report(spider.name, self.peak_snapshot, self.opened_snapshot, self.peak_bytes, self.top_n)
+        path.with_suffix(".txt").write_text(report)
+        logger.info(f"Wrote the memory profile of {spider.name} to {path}.txt")
+
+        CrawlProfiler.tracing -= 1
+        if not CrawlProfiler.tracing:
+            tracemalloc.stop()
@@ -0,0 +1,280 @@
+"""
+Scheduling profiles, which decide the order queued requests are downloaded in.
+
+`breadth_first` (the default) downloads shallower requests first, so new search windows and results pages are
+expanded before the applications they found are scraped. `depth_first` downloads the follow-on requests of the
+applications already found first, so the scheduler's queue (and the meta each queued request holds) stays small on
+big councils.
+
+The profile is picked with `-s SCHEDULING_PROFILE=depth_first`, or per spider with `-a scheduling_profile=depth_first`
+or a `scheduling_profile` class attribute.
+
+Under either profile, requests for recent validated-date windows and for applications we don't have yet are raised
+above historical backfill, and REQUEST_BUDGET can cap the requests made by all the spiders in a run, keeping part of it
+for recent windows.
+"""
+
+from datetime import date
+from typing import Any, AsyncIterator, ClassVar, Dict, Iterable, Optional
+
+from scrapy import Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http.request import Request
+from scrapy.http.response import Response
+from scrapy.settings import SETTINGS_PRIORITIES, Settings
+from twisted.internet.task import LoopingCall
+
+BREADTH_FIRST = "breadth_first"
+DEPTH_FIRST = "depth_first"
+
+SCHEDULING_STAT = "scheduling"
+FRESHNESS_STAT = "freshness"
+
+# Added to the priority of the requests for an application that isn't in the database yet
+NEW_REFERENCE_PRIORITY = 14
+
+# Request priorities by `stage` meta under the depth-first profile. Requests without a stage (search windows, results
+# pages) are left at 0, so the later tabs of applications already found always go first
+DEPTH_FIRST_STAGE_PRIORITIES = {
+    "summary": 10,
+    "details": 20,
+    "documents": 30,
+    "arcgis": 40,
+}
+
+SCHEDULING_PROFILES: Dict[str, Dict[str, Any]] = {
+    BREADTH_FIRST: {
+        "DEPTH_PRIORITY": 1,
+        "SCHEDULER_DISK_QUEUE": "scrapy.squeues.PickleFifoDiskQueue",
+        "SCHEDULER_MEMORY_QUEUE": "scrapy.squeues.FifoMemoryQueue",
+        "SCHEDULING_STAGE_PRIORITIES": {},
+    },
+    DEPTH_FIRST: {
+        "DEPTH_PRIORITY": 0,
+        "SCHEDULER_DISK_QUEUE": "scrapy.squeues.PickleLifoDiskQueue",
+        "SCHEDULER_MEMORY_QUEUE": "scrapy.squeues.LifoMemoryQueue",
+        "SCHEDULING_STAGE_PRIORITIES": DEPTH_FIRST_STAGE_PRIORITIES,
+    },
+}
+
+
+class SchedulingProfile:
+    """
+    Add-on that applies the settings of the scheduling profile in SCHEDULING_PROFILE, or in the spider's
+    `scheduling_profile` attribute if it has one.
+    """
+
+    def __init__(self, crawler: Crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(crawler)
+
+    def update_settings(self, settings: Settings):
+        # The profile's settings take the priority of wherever it was picked, so a profile picked on the command line
+        # overrides the project's settings, and one picked by the spider overrides everything
+        priority = settings.getpriority("SCHEDULING_PROFILE") or SETTINGS_PRIORITIES["addon"]
+        profile = getattr(self.crawler.spider, "scheduling_profile", None)
+        if profile:
+            priority = max(priority, SETTINGS_PRIORITIES["spider"])
+        else:
+            profile = settings.get("SCHEDULING_PROFILE", BREADTH_FIRST)
+
+        if profile not in SCHEDULING_PROFILES:
+            raise ValueError(f"Unknown scheduling profile {profile}, expected one of {', '.join(SCHEDULING_PROFILES)}")
+
+        settings.set("SCHEDULING_PROFILE", profile, priority=priority)
+        settings.setdict(SCHEDULING_PROFILES[profile], priority=priority)
+
+
+class StagePriorityMiddleware:
+    """
+    Spider middleware that sets the priority of each request from its `stage` meta, using SCHEDULING_STAGE_PRIORITIES.
+    """
+
+    def __init__(self, stage_priorities: Dict[str, int]):
+        self.stage_priorities = stage_priorities
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        stage_priorities = crawler.settings.getdict("SCHEDULING_STAGE_PRIORITIES")
+        if not stage_priorities:
+            raise NotConfigured
+        return cls(stage_priorities)
+
+    def _set_priority(self, result: Any) -> Any:
+        if isinstance(result, Request) and result.meta.get("stage") in self.stage_priorities:
+            result.priority = self.stage_priorities[result.meta["stage"]]
+        return result
+
+    def process_spider_output(self, response: Response, result: Iterable[Any], spider: Optional[Spider] = None):
+        for r in result:
+            yield self._set_priority(r)
+
+    async def process_spider_output_async(
+        self, response: Response, result: AsyncIterator[Any], spider: Optional[Spider] = None
+    ):
+        async for r in result:
+            yield self._set_priority(r)
+
+
+def freshness_priority(validated_end: Optional[date], new_reference: bool, today: date, horizon_days: int) -> int:
+    """
+    How much to raise the priority of a request by. A window of validated dates ending today gets `horizon_days`,
+    falling by one a day to nothing for windows ending `horizon_days` or more ago. Requests for applications that
+    aren't in the database yet get NEW_REFERENCE_PRIORITY on top.
+    """
+    priority = 0
+    if validated_end is not None:
+        priority += max(0, horizon_days - (today - validated_end).days)
+    if new_reference:
+        priority += NEW_REFERENCE_PRIORITY
+    return priority
+
+
+def is_backfill(validated_end: Optional[date], today: date, horizon_days: int) -> bool:
+    """Whether a request is for a window of validated dates that ended before the freshness horizon."""
+    return validated_end is not None and (today - validated_end).days >= horizon_days
+
+
+class FreshnessPriorityMiddleware:
+    """
+    Spider middleware that raises the priority of requests for recent validated-date windows and new references, from
+    their `validated_end` and `new_reference` meta, and marks requests for older windows with `backfill` meta.
+    """
+
+    def __init__(self, horizon_days: int, today: Optional[date] = None):
+        self.horizon_days = horizon_days
+        self.today = today or date.today()
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(crawler.settings.getint("FRESHNESS_HORIZON_DAYS"))
+
+    def _set_priority(self, result: Any) -> Any:
+        if isinstance(result, Request):
+            validated_end = result.meta.get("validated_end")
+            new_reference = result.meta.get("new_reference", False)
+            result.priority += freshness_priority(validated_end, new_reference, self.today, self.horizon_days)
+            result.meta["backfill"] = is_backfill(validated_end, self.today, self.horizon_days)
+        return result
+
+    def process_spider_output(self, response: Response, result: Iterable[Any], spider: Optional[Spider] = None):
+        for r in result:
+            yield self._set_priority(r)
+
+    async def process_spider_output_async(
+        self, response: Response, result: AsyncIterator[Any], spider: Optional[Spider] = None
+    ):
+        async for r in result:
+            yield self._set_priority(r)
+
+
+class RequestBudgetSpent(IgnoreRequest):
+    """A request was dropped because the run's REQUEST_BUDGET is spent."""
+
+
+class RequestBudgetMiddleware:
+    """
+    Downloader middleware that shares REQUEST_BUDGET requests between every spider running in the process. Backfill
+    requests are dropped once only REQUEST_BUDGET_FRESH_RESERVE of the budget is left, so the rest goes to recent
+    windows, and everything is dropped once it's all spent.
+    """
+
+    # Shared by the crawlers of every spider in the process
+    spent: ClassVar[int] = 0
+
+    def __init__(self, crawler: Crawler, budget: int, fresh_reserve: float):
+        self.crawler = crawler
+        self.budget = budget
+        self.backfill_budget = int(budget * (1 - fresh_reserve))
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        budget = crawler.settings.getint("REQUEST_BUDGET")
+        if not budget:
+            raise NotConfigured
+        return cls(crawler, budget, crawler.settings.getfloat("REQUEST_BUDGET_FRESH_RESERVE"))
+
+    def process_request(self, request: Request, spider: Optional[Spider] = None):
+        kind = "backfill" if request.meta.get("backfill") else "fresh"
+        limit = self.backfill_budget if kind == "backfill" else self.budget
+
+        if RequestBudgetMiddleware.spent >= limit:
+            self.crawler.stats.inc_value(f"{FRESHNESS_STAT}/budget_dropped/{kind}")
+            raise RequestBudgetSpent(f"Request budget of {limit} for {kind} requests spent")
+
+        RequestBudgetMiddleware.spent += 1
+        self.crawler.stats.inc_value(f"{FRESHNESS_STAT}/requests/{kind}")
+        return None
+
+
+def engine_scheduler(engine) -> Optional[Any]:
+    """The scheduler of a running crawl's engine, if it has one yet."""
+    if engine is None:
+        return None
+    if hasattr(engine, "scheduler"):
+        return engine.scheduler
+    # Scrapy 2.12 keeps the scheduler on the engine's slot, which is only there while the spider is open
+    slot = getattr(engine, "slot", None)
+    return slot.scheduler if slot is not None else None
+
+
+class SchedulingTelemetry:
+    """
+    Samples the size of the scheduler's queue and the number of requests being downloaded every
+    SCHEDULING_TELEMETRY_INTERVAL seconds, and counts the requests scheduled at each stage, under `scheduling/` in the
+    run's stats.
+    """
+
+    def __init__(self, crawler: Crawler, interval: float):
+        self.crawler = crawler
+        self.interval = interval
+        self.task = None
+        self.samples = 0
+        self.queue_size_total = 0
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        interval = crawler.settings.getfloat("SCHEDULING_TELEMETRY_INTERVAL")
+        if not interval:
+            raise NotConfigured
+
+        o = cls(crawler, interval)
+        crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(o.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(o.request_scheduled, signal=signals.request_scheduled)
+        return o
+
+    @property
+    def stats(self):
+        return self.crawler.stats
+
+    def spider_opened(self, spider: Spider):
+        self.stats.set_value(f"{SCHEDULING_STAT}/profile", self.crawler.settings.get("SCHEDULING_PROFILE"))
+        self.task = LoopingCall(self.sample)
+        self.task.start(self.interval)
+
+    def request_scheduled(self, request: Request, spider: Spider):
+        self.stats.inc_value(f"{SCHEDULING_STAT}/scheduled/{request.meta.get('stage', 'other')}")
+
+    def sample(self):
+        engine = self.crawler.engine
+        scheduler = engine_scheduler(engine)
+        if scheduler is None:
+            return
+
+        queue_size = len(scheduler)
+        self.samples += 1
+        self.queue_size_total += queue_size
+        self.stats.max_value(f"{SCHEDULING_STAT}/queue_size_max", queue_size)
+        self.stats.max_value(f"{SCHEDULING_STAT}/downloader_active_max", len(engine.downloader.active))
+
+    def spider_closed(self, spider: Spider, reason: str):
+        if self.task and self.task.running:
+            self.task.stop()
+
+        if self.samples:
+            self.stats.set_value(f"{SCHEDULING_STAT}/queue_size_mean", round(self.queue_size_total / self.samples, 1))
@@ -7,23 +7,27 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-import scrapy_colorlog
+import os
 
-from planning_applications.utils import getenv, hasenv
+# Loads .env into the environment
+import planning_applications.utils  # noqa: F401
 
-SCRAPEOPS_API_KEY = getenv("SCRAPEOPS_API_KEY")
-ZYTE_API_KEY = getenv("ZYTE_API_KEY")
-
-scrapy_colorlog.install()
+# Only checked when a crawl starts (see RequiredSettings), so tools and tests can import the settings without them
+SCRAPEOPS_API_KEY = os.getenv("SCRAPEOPS_API_KEY")
+ZYTE_API_KEY = os.getenv("ZYTE_API_KEY")
+REQUIRED_SETTINGS = ["SCRAPEOPS_API_KEY", "ZYTE_API_KEY"]
 
 BOT_NAME = "planning_applications"
 
-SPIDER_MODULES = ["planning_applications.spiders"]
+# Council spiders come from the LPA registry (planning_applications/spiders/registry.py) rather than SPIDER_MODULES,
+# so that listing or starting one doesn't import them all
+SPIDER_LOADER_CLASS = "planning_applications.spiderloader.LpaSpiderLoader"
+SPIDER_MODULES = ["planning_applications.spiders.appeals"]
 NEWSPIDER_MODULE = "planning_applications.spiders"
 
 
 # Crawl responsibly by identifying yourself (and your website) on the user-agent
-USER_AGENT = getenv("USER_AGENT") if hasenv("USER_AGENT") else "planning_applications"
+USER_AGENT = os.getenv("USER_AGENT") or "planning_applications"
 
 # Obey robots.txt rules
 ROBOTSTXT_OBEY = False
@@ -41,7 +45,7 @@ ROBOTSTXT_OBEY = False
 
 # Disable cookies (enabled by default)
 COOKIES_ENABLED = True
-COOKIES_DEBUG = True
+# COOKIES_DEBUG is set by LOG_PROFILE
 
 # Disable Telnet Console (enabled by default)
 # TELNETCONSOLE_ENABLED = False
@@ -55,13 +59,21 @@ COOKIES_DEBUG = True
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 SPIDER_MIDDLEWARES = {
+    "planning_applications.scheduling.FreshnessPriorityMiddleware": 450,
+    "planning_applications.scheduling.StagePriorityMiddleware": 500,
     "shared.middlewares.LogScraperRunMiddleware": 543,
+    "planning_applications.middlewares.CallbackTimingMiddleware": 950,
+    "planning_applications.profiling.CallbackProfilingMiddleware": 960,
 }
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 DOWNLOADER_MIDDLEWARES = {
+    "planning_applications.scheduling.RequestBudgetMiddleware": 50,
     "scrapeops_scrapy.middleware.retry.RetryMiddleware": 550,
+    "planning_applications.middlewares.CircuitBreakerMiddleware": 560,
+    "planning_applications.middlewares.AdaptiveTimeoutMiddleware": 570,
+    "scrapy.downloadermiddlewares.downloadtimeout.DownloadTimeoutMiddleware": None,
     "scrapy.downloadermiddlewares.retry.RetryMiddleware": None,
     "scrapy.downloadermiddlewares.cookies.CookiesMiddleware": 700,
 }
@@ -70,6 +82,12 @@ DOWNLOADER_MIDDLEWARES = {
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
 EXTENSIONS = {
     #    "scrapy.extensions.telnet.TelnetConsole": None,
+    "planning_applications.extensions.RequiredSettings": 0,
+    "planning_applications.extensions.LogSampling": 50,
+    "planning_applications.scheduling.SchedulingTelemetry": 100,
+    "planning_applications.extensions.StageTiming": 110,
+    "planning_applications.metrics.MetricsExporter": 120,
+    "planning_applications.profiling.CrawlProfiler": 130,
     "scrapeops_scrapy.extension.ScrapeOpsMonitor": 500,
 }
 
@@ -79,6 +97,7 @@ ITEM_PIPELINES = {
     "planning_applications.pipelines.IdoxPlanningApplicationPipeline": 200,
     "planning_applications.pipelines.S3FileDownloadPipeline": 300,
     "planning_applications.pipelines.PostgresPipeline": 400,
+    "planning_applications.spool.SpoolPipeline": 410,
 }
 
 # Enable and configure the AutoThrottle extension (disabled by default)
@@ -108,14 +127,30 @@ FEED_EXPORT_ENCODING = "utf-8"
 
 DEFAULT_DATE_FORMAT = "%Y-%m-%d"
 
+# The appeals spider's defaults, here so run_spiders.py can show them without importing the spider
+# How many search sessions to split a date range across. Each session searches its days one after another
+DEFAULT_SESSIONS = 4
+# In frontier mode, how many case IDs in a row past the highest case found must be missing before we stop
+DEFAULT_FRONTIER_MAX_MISSES = 200
+
 ADDONS = {
+    "planning_applications.extensions.LogProfile": 0,
+    "planning_applications.scheduling.SchedulingProfile": 0,
     "scrapy_zyte_api.Addon": 500,
 }
 
 # ZYTE_API_EXPERIMENTAL_COOKIES_ENABLED = True
 
 # LOG_FILE = "log.txt"
-LOG_LEVEL = "DEBUG"
+
+# debug or production, which sets LOG_LEVEL, COOKIES_DEBUG and LOG_SAMPLING_ENABLED
+# See planning_applications/extensions.py
+LOG_PROFILE = "debug"
+# With sampling, each callback's INFO lines are let through LOG_SAMPLING_BURST at a time every LOG_SAMPLING_INTERVAL
+# seconds, then one in LOG_SAMPLING_RATE
+LOG_SAMPLING_BURST = 10
+LOG_SAMPLING_INTERVAL = 60.0
+LOG_SAMPLING_RATE = 100
 
 # FEEDS = {
 #     "output/output.json": {
@@ -125,13 +160,58 @@ LOG_LEVEL = "DEBUG"
 #     },
 # }
 
-# These settings make the search breadth-first instead of depth-first
-DEPTH_PRIORITY = 1
-SCHEDULER_DISK_QUEUE = "scrapy.squeues.PickleFifoDiskQueue"
-SCHEDULER_MEMORY_QUEUE = "scrapy.squeues.FifoMemoryQueue"
+# breadth_first or depth_first, which sets DEPTH_PRIORITY, the scheduler queues and the stage priorities
+# See planning_applications/scheduling.py
+SCHEDULING_PROFILE = "breadth_first"
+SCHEDULING_TELEMETRY_INTERVAL = 5.0
+
+# Requests for windows of validated dates that ended within this many days are raised above older ones
+FRESHNESS_HORIZON_DAYS = 28
+# Requests shared by every spider in a run (0 for no limit), and the share of it only recent windows can use
+REQUEST_BUDGET = 0
+REQUEST_BUDGET_FRESH_RESERVE = 0.2
 
 DOWNLOAD_FILES = False
 
+# Time each download by stage, each callback and each pipeline, under timing/ in the run's stats
+TIMING_ENABLED = True
+
+# Serve live metrics for Prometheus at http://METRICS_HOST:METRICS_PORT/metrics while crawling (0 to not serve them)
+# See planning_applications/metrics.py
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 0
+
+# cpu or mem to profile each spider's callbacks and pipelines, written to PROFILE_DIR when it closes (None to not)
+# See planning_applications/profiling.py
+PROFILE = None
+PROFILE_DIR = "output/profiles"
+PROFILE_TOP_N = 30
+PROFILE_SNAPSHOT_INTERVAL = 30.0
+
+# PostgresPipeline writes documents and geometries yielded on their own POSTGRES_BATCH_SIZE at a time, and keeps the
+# uuids of the last POSTGRES_UUID_CACHE_SIZE applications it wrote or looked up, to save a SELECT for each of them
+POSTGRES_BATCH_SIZE = 100
+POSTGRES_UUID_CACHE_SIZE = 10_000
+
+# Write items to gzipped segments in SPOOL_DIR/<spider>/ instead of Postgres, for `run_spiders.py load` to load later
+# See planning_applications/spool.py
+SPOOL_ENABLED = False
+SPOOL_DIR = "output/spool"
+SPOOL_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Stop requesting a domain after this many failed attempts in a row, closing the spider if it's the council's own site
+CIRCUIT_BREAKER_ENABLED = True
+CIRCUIT_BREAKER_THRESHOLD = 10
+CIRCUIT_BREAKER_HTTP_CODES = [500, 502, 503, 504, 520, 521, 522, 523, 524]
+
+# Time out each stage of a spider's requests at its p99 download latency last run times the multiplier, between the
+# minimum and DOWNLOAD_TIMEOUT, once the stage has enough downloads to go on
+DOWNLOAD_TIMEOUT = 180
+ADAPTIVE_TIMEOUT_ENABLED = True
+ADAPTIVE_TIMEOUT_MULTIPLIER = 4.0
+ADAPTIVE_TIMEOUT_MIN = 15.0
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 20
+
 RETRY_ENABLED = True
 RETRY_DELAY = 5
 RETRY_HTTP_CODES = [400, 408, 421, 429, 500, 502, 503, 504, 520, 521, 522, 524]
@@ -0,0 +1,48 @@
+from typing import List
+from urllib.parse import urlparse
+
+import scrapy_colorlog
+from scrapy import Spider
+from scrapy.http.request import Request
+from scrapy.settings import BaseSettings
+from scrapy.spiderloader import SpiderLoader
+
+from planning_applications.spiders.registry import LPAS_BY_NAME, build_spider_class
+
+
+class LpaSpiderLoader(SpiderLoader):
+    """
+    Loads the spiders in SPIDER_MODULES as Scrapy does, plus one per council in the LPA registry.
+
+    Council spiders are only built (or, for hand-written ones, imported) when they're loaded, so listing them or
+    starting one doesn't import the rest.
+    """
+
+    def __init__(self, settings: BaseSettings):
+        # Scrapy creates the spider loader just before it configures logging, so this colours the logs of every crawl
+        # without the settings module having to do it when it's imported
+        scrapy_colorlog.install()
+
+        super().__init__(settings)
+
+        for name in LPAS_BY_NAME:
+            if name in self._spiders:
+                raise ValueError(f"Spider {name} is in both SPIDER_MODULES and the LPA registry")
+
+    def load(self, spider_name: str) -> type[Spider]:
+        if spider_name not in self._spiders and spider_name in LPAS_BY_NAME:
+            self._spiders[spider_name] = build_spider_class(LPAS_BY_NAME[spider_name])
+
+        return super().load(spider_name)
+
+    def find_by_request(self, request: Request) -> List[str]:
+        host = urlparse(request.url).hostname or ""
+        lpas = [
+            name
+            for name, spec in LPAS_BY_NAME.items()
+            if name not in self._spiders and (host == spec.domain or host.endswith(f".{spec.domain}"))
+        ]
+        return super().find_by_request(request) + lpas
+
+    def list(self) -> List[str]:
+        return sorted({*self._spiders, *LPAS_BY_NAME})
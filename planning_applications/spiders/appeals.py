@@ -8,9 +8,18 @@ import parsel.selector
 import scrapy
 from scrapy.http.response import Response
 from scrapy.http.response.text import TextResponse
-
+from twisted.python.failure import Failure
+
+from planning_applications.db import (
+    get_finalised_appeal_case_ids,
+    get_known_appeal_case_ids,
+    get_max_appeal_case_id,
+    get_open_appeals,
+)
 from planning_applications.items import PlanningApplicationAppeal, PlanningApplicationAppealDocument
-from planning_applications.settings import DEFAULT_DATE_FORMAT
+from planning_applications.settings import DEFAULT_DATE_FORMAT, DEFAULT_FRONTIER_MAX_MISSES, DEFAULT_SESSIONS
+from planning_applications.spiders.aspnet import AspNetPostbackSession, has_aspnet_state
+from planning_applications.spiders.base import inc_stat, set_stat
 from planning_applications.utils import multiline_css, open_in_browser
 
 DEFAULT_START_DATE = datetime(datetime.now().year, datetime.now().month, 1).date()
@@ -18,6 +27,40 @@ DEFAULT_END_DATE = datetime.now().date()
 
 EARLIEST_KNOWN_CASE_ID = 2005083
 
+FRONTIER_STAT = "appeals/frontier"
+
+# How many days ahead (or, for hearings and site visits, behind) an appeal's dates make it worth revisiting sooner
+REVISIT_HORIZON_DAYS = 60
+
+
+def revisit_priority(appeal: PlanningApplicationAppeal, today: date) -> int:
+    """
+    How urgently an open appeal should be revisited: the closer its next deadline or event, the higher. Events
+    (hearings, site visits) count double, and still count for a while after they've happened, as the decision usually
+    follows them. Appeals with nothing coming up get 0.
+    """
+    due_dates = [
+        appeal.questionnaire_due_date,
+        appeal.statement_due_date,
+        appeal.interested_party_comments_due_date,
+        appeal.final_comments_due_date,
+        appeal.inquiry_evidence_due_date,
+    ]
+
+    priority = 0
+    for due_date in due_dates:
+        if due_date:
+            days_until = (due_date.date() - today).days
+            if 0 <= days_until <= REVISIT_HORIZON_DAYS:
+                priority = max(priority, REVISIT_HORIZON_DAYS - days_until)
+
+    if appeal.event_date:
+        days_away = abs((appeal.event_date.date() - today).days)
+        if days_away <= REVISIT_HORIZON_DAYS:
+            priority = max(priority, 2 * (REVISIT_HORIZON_DAYS - days_away))
+
+    return priority
+
 
 class AppealsSpider(scrapy.Spider):
     name = "appeals"
@@ -29,6 +72,22 @@ class AppealsSpider(scrapy.Spider):
     end_date: date | None = None
     from_case_id: int | None = None
     to_case_id: int | None = None
+    sessions: int = DEFAULT_SESSIONS
+
+    # Probe forward from the highest case ID in the database until new case IDs stop turning up
+    frontier: bool = False
+    frontier_max_misses: int = DEFAULT_FRONTIER_MAX_MISSES
+
+    # Don't request appeals we've already seen decided, as they won't change again
+    skip_finalised: bool = True
+    _finalised_case_ids: set[int] = set()
+
+    # Re-request every open appeal in the database, soonest deadlines first
+    revisit: bool = False
+
+    # Also request the appeals linked from each case page, unless they're already in the database
+    follow_linked_cases: bool = False
+    _known_case_ids: set[int] = set()
 
     def __init__(
         self,
@@ -43,6 +102,48 @@ class AppealsSpider(scrapy.Spider):
         if isinstance(self.to_case_id, str):
             self.to_case_id = int(self.to_case_id)
 
+        if isinstance(self.sessions, str):
+            self.sessions = int(self.sessions)
+
+        if self.sessions < 1:
+            raise ValueError(f"sessions {self.sessions} must be at least 1")
+
+        if isinstance(self.frontier, str):
+            self.frontier = self.frontier.lower() in ("1", "true", "yes")
+
+        if isinstance(self.frontier_max_misses, str):
+            self.frontier_max_misses = int(self.frontier_max_misses)
+
+        if isinstance(self.skip_finalised, str):
+            self.skip_finalised = self.skip_finalised.lower() in ("1", "true", "yes")
+
+        if isinstance(self.revisit, str):
+            self.revisit = self.revisit.lower() in ("1", "true", "yes")
+
+        if isinstance(self.follow_linked_cases, str):
+            self.follow_linked_cases = self.follow_linked_cases.lower() in ("1", "true", "yes")
+
+        # Case IDs requested so far this run, as date scans find the same case through several days' results
+        self._seen_case_ids: set[int] = set()
+
+        if self.revisit:
+            if self.frontier:
+                raise ValueError("frontier and revisit must not be used together")
+
+            if self.from_case_id or self.to_case_id or self.start_date or self.end_date:
+                raise ValueError("case IDs and dates must not be provided in revisit mode")
+
+            return
+
+        if self.frontier:
+            if self.from_case_id or self.to_case_id or self.start_date or self.end_date:
+                raise ValueError("case IDs and dates must not be provided in frontier mode")
+
+            if self.frontier_max_misses < 1:
+                raise ValueError(f"frontier_max_misses {self.frontier_max_misses} must be at least 1")
+
+            return
+
         if self.from_case_id and not self.to_case_id or self.to_case_id and not self.from_case_id:
             raise ValueError("to_case_id and from_case_id must be provided together")
 
@@ -75,6 +176,21 @@ class AppealsSpider(scrapy.Spider):
         First entry point: load the advanced search page so we can get the form/CSRF token.
         """
 
+        if self.follow_linked_cases:
+            self._known_case_ids = get_known_appeal_case_ids()
+
+        if self.frontier:
+            yield from self.issue_requests_for_frontier()
+            return
+
+        if self.revisit:
+            yield from self.issue_requests_for_revisits()
+            return
+
+        if self.skip_finalised:
+            self._finalised_case_ids = get_finalised_appeal_case_ids()
+            self.logger.info(f"Skipping {len(self._finalised_case_ids)} finalised appeals")
+
         if self.from_case_id and self.to_case_id:
             self.logger.info(
                 f"Searching for appeals received between case IDs {self.from_case_id} and {self.to_case_id} inclusively"
@@ -89,14 +205,32 @@ class AppealsSpider(scrapy.Spider):
 
         date_range = [self.start_date + timedelta(days=i) for i in range((self.end_date - self.start_date).days + 1)]
 
-        for d in date_range:
-            self.logger.debug(f"Yielding request for {d}")
+        for session_id, dates in enumerate(self._split_dates_across_sessions(date_range)):
+            self.logger.debug(f"Starting search session {session_id} for {dates[0]} to {dates[-1]}")
 
-            yield scrapy.Request(
-                self.start_url, callback=self.search_date, dont_filter=True, meta={"dont_redirect": True, "date": d}
-            )
+            session = AspNetPostbackSession(self, self.start_url, session_id=session_id)
+            yield self._request_search_form(session, dates)
+
+    def _split_dates_across_sessions(self, date_range: list[date]) -> list[list[date]]:
+        """
+        Split the days into contiguous runs, one per session
+        """
+        sessions = min(self.sessions, len(date_range))
+        run_length, longer_runs = divmod(len(date_range), sessions)
+
+        runs = []
+        start = 0
+        for i in range(sessions):
+            end = start + run_length + (1 if i < longer_runs else 0)
+            runs.append(date_range[start:end])
+            start = end
+        return runs
 
     def search_date(self, response: Response):
+        """
+        Search for the appeals received on `response.meta["date"]`, posting back from either the blank search form or
+        the previous day's results page.
+        """
         self.logger.info(f"Searching for appeals received on {response.meta['date']}")
 
         if not response.meta["date"] or not isinstance(response.meta["date"], date):
@@ -105,35 +239,65 @@ class AppealsSpider(scrapy.Spider):
         if not isinstance(response, TextResponse):
             raise Exception("response must be a TextResponse")
 
-        yield scrapy.FormRequest.from_response(
+        yield self._post_search(response, response.meta["date"], response.meta.get("dates", []))
+
+    def _post_search(self, response: Response, received_date: date, remaining_dates: list[date]) -> scrapy.Request:
+        session: AspNetPostbackSession = response.meta["aspnet_session"]
+        return session.postback(
             response,
-            formdata={
-                "ctl00$hidIsListed": "No",
-                "ctl00$cphMainContent$txtCaseReference": "",
-                "ctl00$cphMainContent$txtStreet": "",
-                "ctl00$cphMainContent$txtTownCity": "",
-                "ctl00$cphMainContent$txtCounty": "",
-                "ctl00$cphMainContent$txtPostCode": "",
-                "ctl00$cphMainContent$txtSearchLPA": "",
-                "ctl00$cphMainContent$txt_lparefnumber": "",
-                "ctl00$cphMainContent$cboAppealType": "-1",
-                "ctl00$cphMainContent$ppsAppellant$txtPerson": "",
-                "ctl00$cphMainContent$ppsOtherParty$txtPerson": "",
-                "ctl00$cphMainContent$pdsHearing$txtDateSearch": "",
-                "ctl00$cphMainContent$pdsSiteVisit$txtDateSearch": "",
-                "ctl00$cphMainContent$pdsCallIn$txtDateSearch": "",
-                "ctl00$cphMainContent$pdsReceived$txtDateSearch": response.meta["date"].strftime("%d/%m/%Y"),
-                "ctl00$cphMainContent$pdsDecision$txtDateSearch": "",
-                "ctl00$cphMainContent$cboProcedureType": "-1",
-                "ctl00$cphMainContent$cboStatus": "-1",
-                "ctl00$cphMainContent$cmdSearch": "Search",
-                "ctl00$cphMainContent$cboSearchLPA": "-1",
-            },
+            formdata=self._search_formdata(received_date),
             callback=self.parse_search_results,
-            dont_filter=True,
-            meta={"dont_redirect": True, "date": response.meta["date"]},
+            errback=self._search_failed,
+            meta={"dont_redirect": True, "date": received_date, "dates": remaining_dates},
+        )
+
+    def _request_search_form(self, session: AspNetPostbackSession, dates: list[date]) -> scrapy.Request:
+        return session.request_form(
+            self.search_date,
+            errback=self._search_failed,
+            meta={"dont_redirect": True, "date": dates[0], "dates": dates[1:]},
         )
 
+    def _search_failed(self, failure: Failure):
+        """
+        A day's search failed after its retries. Each session searches its days one after another, so carry on from the
+        next day with a fresh search form rather than lose the rest of the session's days.
+        """
+        meta = failure.request.meta
+        self.logger.error(f"Search for appeals received on {meta['date']} failed: {failure.value!r}")
+        inc_stat(self, "appeals/search_failed")
+
+        dates = meta.get("dates")
+        if not dates:
+            return
+
+        self.logger.info(f"Searching for appeals received on {dates[0]} from a fresh search form")
+        yield self._request_search_form(meta["aspnet_session"], dates)
+
+    def _search_formdata(self, received_date: date) -> dict[str, str]:
+        return {
+            "ctl00$hidIsListed": "No",
+            "ctl00$cphMainContent$txtCaseReference": "",
+            "ctl00$cphMainContent$txtStreet": "",
+            "ctl00$cphMainContent$txtTownCity": "",
+            "ctl00$cphMainContent$txtCounty": "",
+            "ctl00$cphMainContent$txtPostCode": "",
+            "ctl00$cphMainContent$txtSearchLPA": "",
+            "ctl00$cphMainContent$txt_lparefnumber": "",
+            "ctl00$cphMainContent$cboAppealType": "-1",
+            "ctl00$cphMainContent$ppsAppellant$txtPerson": "",
+            "ctl00$cphMainContent$ppsOtherParty$txtPerson": "",
+            "ctl00$cphMainContent$pdsHearing$txtDateSearch": "",
+            "ctl00$cphMainContent$pdsSiteVisit$txtDateSearch": "",
+            "ctl00$cphMainContent$pdsCallIn$txtDateSearch": "",
+            "ctl00$cphMainContent$pdsReceived$txtDateSearch": received_date.strftime("%d/%m/%Y"),
+            "ctl00$cphMainContent$pdsDecision$txtDateSearch": "",
+            "ctl00$cphMainContent$cboProcedureType": "-1",
+            "ctl00$cphMainContent$cboStatus": "-1",
+            "ctl00$cphMainContent$cmdSearch": "Search",
+            "ctl00$cphMainContent$cboSearchLPA": "-1",
+        }
+
     def parse_search_results(self, response: Response):
         self.logger.info(f"Parsing search results for {response.meta['date']}")
 
@@ -143,21 +307,134 @@ class AppealsSpider(scrapy.Spider):
         for case_anchor in response.css("#cphMainContent_grdCaseResults tr td a"):
             case_id = self._parse_case_id_from_anchor(case_anchor)
             if case_id:
-                yield scrapy.Request(
-                    url=f"{self.base_url}/ViewCase.aspx?CaseID={case_id}&CoID=0",
-                    callback=self.parse_case,
-                    meta={"dont_redirect": True},
-                )
+                yield from self._case_request(case_id)
+
+        yield from self._search_next_date(response)
+
+    def _search_next_date(self, response: Response):
+        dates = response.meta.get("dates")
+        if not dates:
+            return
+
+        # The results page carries the search form with fresh state, so the next day can be searched straight from it
+        if has_aspnet_state(response):
+            self.logger.info(f"Searching for appeals received on {dates[0]}")
+            yield self._post_search(response, dates[0], dates[1:])
+            return
+
+        self.logger.warning(f"No form state on the results for {response.meta['date']}, loading the search form again")
+        yield self._request_search_form(response.meta["aspnet_session"], dates)
 
     def issue_requests_for_case_ids(self):
         self.logger.info(f"Issuing requests for case IDs between {self.from_case_id} and {self.to_case_id}")
 
         for case_id in range(self.from_case_id or EARLIEST_KNOWN_CASE_ID, (self.to_case_id or 0) + 1):
-            yield scrapy.Request(
-                url=f"{self.base_url}/ViewCase.aspx?CaseID={case_id}&CoID=0",
-                callback=self.parse_case,
-                meta={"dont_redirect": True},
-            )
+            yield from self._case_request(case_id)
+
+    def _case_request(self, case_id: int, priority: int = 0):
+        if case_id in self._seen_case_ids:
+            inc_stat(self, "appeals/skipped_seen")
+            return
+
+        if case_id in self._finalised_case_ids:
+            inc_stat(self, "appeals/skipped_finalised")
+            return
+
+        self._seen_case_ids.add(case_id)
+
+        yield scrapy.Request(
+            url=f"{self.base_url}/ViewCase.aspx?CaseID={case_id}&CoID=0",
+            callback=self.parse_case,
+            meta={"dont_redirect": True},
+            priority=priority,
+        )
+
+    # Revisits
+    # -------------------------------------------------------------------------
+
+    def issue_requests_for_revisits(self):
+        today = datetime.now().date()
+        open_appeals = get_open_appeals()
+
+        self.logger.info(f"Revisiting {len(open_appeals)} open appeals")
+
+        # Start requests are scheduled as they're consumed, so the most urgent appeals have to come out first for their
+        # priority to count before the rest of the revisits are queued
+        prioritised = sorted(
+            ((revisit_priority(appeal, today), appeal) for appeal in open_appeals),
+            key=lambda pair: pair[0],
+            reverse=True,
+        )
+        for priority, appeal in prioritised:
+            inc_stat(self, "appeals/revisited")
+            if priority > 0:
+                inc_stat(self, "appeals/revisited_with_upcoming_dates")
+
+            yield from self._case_request(appeal.case_id, priority=priority)
+
+    # Frontier
+    # -------------------------------------------------------------------------
+
+    def issue_requests_for_frontier(self):
+        """
+        Case IDs are issued in sequence, but not every ID becomes a public case. Starting from the highest case ID we
+        already have, scan every ID up to `frontier_max_misses` past the highest case found so far, so gaps are
+        tolerated, and gallop ahead at doubling distances to jump gaps that are longer than that.
+        """
+        self._frontier_base = get_max_appeal_case_id() or EARLIEST_KNOWN_CASE_ID - 1
+        self._frontier_highest_hit = self._frontier_base
+        self._frontier_scanned_to = self._frontier_base
+        self._frontier_requested: set[int] = set()
+
+        self.logger.info(f"Probing for new appeals after case ID {self._frontier_base}")
+        set_stat(self, f"{FRONTIER_STAT}/base_case_id", self._frontier_base)
+
+        yield from self._extend_frontier()
+        yield from self._gallop(self._frontier_base + 2 * self.frontier_max_misses)
+
+    def _extend_frontier(self):
+        """
+        Request every case ID up to `frontier_max_misses` past the highest case found
+        """
+        scan_to = self._frontier_highest_hit + self.frontier_max_misses
+        for case_id in range(self._frontier_scanned_to + 1, scan_to + 1):
+            yield from self._frontier_request(case_id)
+        self._frontier_scanned_to = max(self._frontier_scanned_to, scan_to)
+
+    def _gallop(self, case_id: int):
+        inc_stat(self, f"{FRONTIER_STAT}/probes")
+        yield from self._frontier_request(case_id, probe=True)
+
+    def _frontier_request(self, case_id: int, probe: bool = False):
+        if case_id in self._frontier_requested:
+            return
+        self._frontier_requested.add(case_id)
+        self._seen_case_ids.add(case_id)
+
+        yield scrapy.Request(
+            url=f"{self.base_url}/ViewCase.aspx?CaseID={case_id}&CoID=0",
+            callback=self.parse_frontier_case,
+            meta={"dont_redirect": True, "frontier_probe": probe},
+        )
+
+    def parse_frontier_case(self, response: Response):
+        case_id = int(response.url.split("CaseID=")[1].split("&")[0])
+
+        if "No case found with Case ID" in response.text:
+            # Expected for most IDs near the frontier, so don't go through parse_case's warning
+            inc_stat(self, f"{FRONTIER_STAT}/misses")
+            return
+
+        inc_stat(self, f"{FRONTIER_STAT}/hits")
+        yield from self.parse_case(response)
+
+        if case_id > self._frontier_highest_hit:
+            self._frontier_highest_hit = case_id
+            set_stat(self, f"{FRONTIER_STAT}/highest_case_id", case_id)
+            yield from self._extend_frontier()
+
+        if response.meta.get("frontier_probe"):
+            yield from self._gallop(self._frontier_base + 2 * (case_id - self._frontier_base))
 
     def parse_case(self, response: Response):
         case_id = int(response.url.split("CaseID=")[1].split("&")[0])
@@ -236,6 +513,9 @@ class AppealsSpider(scrapy.Spider):
             **{k: v for k, v in item_data.items() if k not in {"lpa", "url", "reference", "case_id"}},
         )
 
+        if self.follow_linked_cases:
+            yield from self._follow_linked_cases(linked_case_ids)
+
         # Does this case have any documents?
         documents_container = response.css("#cphMainContent_labDecisionLink")
         if not documents_container:
@@ -267,6 +547,15 @@ class AppealsSpider(scrapy.Spider):
                 url=document_url,
             )
 
+    def _follow_linked_cases(self, linked_case_ids: list[int]):
+        for linked_case_id in linked_case_ids:
+            if linked_case_id in self._known_case_ids:
+                continue
+
+            for request in self._case_request(linked_case_id):
+                inc_stat(self, "appeals/linked_cases_followed")
+                yield request
+
     def _parse_case_id_from_anchor(self, case_anchor: parsel.selector.Selector):
         case_url = case_anchor.css("::attr(href)").get()
         if not case_url:
@@ -0,0 +1,95 @@
+from typing import Any, Dict, Optional
+
+import scrapy
+from scrapy import Spider
+from scrapy.http.request import Request
+from scrapy.http.response import Response
+from scrapy.http.response.text import TextResponse
+
+from planning_applications.spiders.base import inc_stat
+
+ASPNET_STATE_FIELDS = ("__VIEWSTATE", "__VIEWSTATEGENERATOR", "__EVENTVALIDATION")
+
+ASPNET_STAT = "aspnet"
+
+
+def extract_aspnet_state(response: Response) -> Dict[str, str]:
+    """
+    Get the hidden ASP.NET WebForms state fields from a page, e.g. `__VIEWSTATE`, `__EVENTVALIDATION`
+    """
+    if not isinstance(response, TextResponse):
+        return {}
+
+    state = {}
+    for field in ASPNET_STATE_FIELDS:
+        value = response.css(f"input[name='{field}']::attr(value)").get()
+        if value is not None:
+            state[field] = value
+    return state
+
+
+def has_aspnet_state(response: Response) -> bool:
+    return "__VIEWSTATE" in extract_aspnet_state(response)
+
+
+class AspNetPostbackSession:
+    """
+    A single ASP.NET WebForms session, with its own cookie jar.
+
+    ASP.NET pages that show search results usually render the search form again with fresh `__VIEWSTATE` and
+    `__EVENTVALIDATION` values, so the next search can be posted back from the results page we already have. The blank
+    form is only loaded to start the session, or when a page comes back without any form state.
+
+    Sessions are independent of each other, so a spider can run several of them side by side.
+    """
+
+    def __init__(self, spider: Spider, form_url: str, session_id: Any = None):
+        self.spider = spider
+        self.form_url = form_url
+        self.session_id = session_id
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        meta: Dict[str, Any] = {"aspnet_session": self}
+        if self.session_id is not None:
+            meta["cookiejar"] = self.session_id
+        return meta
+
+    def request_form(self, callback, meta: Optional[Dict[str, Any]] = None, **kwargs) -> Request:
+        """
+        Load the blank form to start (or restart) the session.
+        """
+        inc_stat(self.spider, f"{ASPNET_STAT}/forms_fetched")
+        return Request(
+            self.form_url,
+            callback=callback,
+            meta={**(meta or {}), **self.meta, "aspnet_blank_form": True},
+            dont_filter=True,
+            **kwargs,
+        )
+
+    def postback(
+        self, response: Response, formdata: Dict[str, str], callback, meta: Optional[Dict[str, Any]] = None, **kwargs
+    ) -> Request:
+        """
+        Post the form on `response` with `formdata`, carrying its form state forward. The button being pressed belongs
+        in `formdata`, as ASP.NET pages often have several submit buttons.
+        """
+        if not isinstance(response, TextResponse):
+            raise ValueError("Response must be a TextResponse")
+
+        if not has_aspnet_state(response):
+            raise ValueError(f"No ASP.NET form state found on {response.url}")
+
+        if not response.meta.get("aspnet_blank_form"):
+            inc_stat(self.spider, f"{ASPNET_STAT}/postbacks_chained")
+
+        return scrapy.FormRequest.from_response(
+            response,
+            formdata=formdata,
+            callback=callback,
+            meta={**(meta or {}), **self.meta},
+            dont_click=True,
+            dont_filter=True,
+            **kwargs,
+        )
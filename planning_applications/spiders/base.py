@@ -1,10 +1,28 @@
 import enum
-from typing import List, cast
+from typing import Any, List, Optional, cast
 
 import scrapy
 from scrapy import signals
 from twisted.python.failure import Failure
 
+from planning_applications.middlewares import CircuitBreakerOpen
+from planning_applications.scheduling import RequestBudgetSpent
+from shared.db import get_connection, get_cursor, select_scraper_run_stats
+
+
+def inc_stat(spider: scrapy.Spider, key: str, count: int = 1):
+    """Add `count` to `key` in the stats of the spider's crawl, if it's running in one (it isn't in most tests)."""
+    crawler = getattr(spider, "crawler", None)
+    if crawler and crawler.stats:
+        crawler.stats.inc_value(key, count)
+
+
+def set_stat(spider: scrapy.Spider, key: str, value: Any):
+    """Set `key` in the stats of the spider's crawl, if it's running in one."""
+    crawler = getattr(spider, "crawler", None)
+    if crawler and crawler.stats:
+        crawler.stats.set_value(key, value)
+
 
 class objectType(enum.Enum):
     APPLICATION = "application"
@@ -31,6 +49,8 @@ class BaseSpider(scrapy.Spider):
     # Whether the spider is not yet working (will be skipped when running all in production)
     not_yet_working: bool = False
 
+    _last_run_stats: Optional[dict] = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.limit = int(self.limit)
@@ -54,6 +74,61 @@ class BaseSpider(scrapy.Spider):
     def should_scrape_comment(self) -> bool:
         return objectType.COMMENT in self.object_types
 
+    @property
+    def scraper_run_name(self) -> str:
+        """The key this spider's runs are recorded under in scraper_runs."""
+        return f"{self.__class__.__module__}.{self.__class__.__name__}"
+
+    def get_last_run_stats(self) -> dict:
+        """Stats recorded in scraper_runs by the previous run of this spider (empty if it has never run)."""
+        if self._last_run_stats is None:
+            connection = get_connection()
+            cursor = get_cursor(connection)
+            self._last_run_stats = select_scraper_run_stats(cursor, self.scraper_run_name) or {}
+            cursor.close()
+            connection.close()
+        return self._last_run_stats
+
+    def inc_stat(self, key: str, count: int = 1):
+        inc_stat(self, key, count)
+
+    def set_stat(self, key: str, value: Any):
+        set_stat(self, key, value)
+
+    def get_stat(self, key: str, default: Any = None) -> Any:
+        crawler = getattr(self, "crawler", None)
+        if crawler and crawler.stats:
+            return crawler.stats.get_value(key, default)
+        return default
+
+    # Request stages
+    # -------------------------------------------------------------------------
+
+    def record_stage_response(self, stage: str, response: scrapy.http.Response):
+        self.inc_stat(f"stages/{stage}/response_count")
+        self.inc_stat(f"stages/{stage}/response_bytes", len(response.body))
+
+    def record_skipped_stage(self, stage: str):
+        """Record a request that wasn't made because its objects weren't selected in object_types."""
+        self.inc_stat(f"stages/{stage}/skipped")
+
+    def _record_skipped_stage_savings(self):
+        """Estimate the bytes saved by skipped stages, from the average response size of each stage last run."""
+        stats = self.crawler.stats.get_stats()
+        skipped_stages = [key.split("/")[1] for key in stats if key.startswith("stages/") and key.endswith("/skipped")]
+        if not skipped_stages:
+            return
+
+        last_run_stats = self.get_last_run_stats()
+        for stage in skipped_stages:
+            previous_count = last_run_stats.get(f"stages/{stage}/response_count")
+            previous_bytes = last_run_stats.get(f"stages/{stage}/response_bytes")
+            if not previous_count or previous_bytes is None:
+                continue
+
+            saved = int(stats[f"stages/{stage}/skipped"] * previous_bytes / previous_count)
+            self.set_stat(f"stages/{stage}/response_bytes_saved_estimate", saved)
+
     @classmethod
     def from_crawler(cls, crawler, *args, **kwargs):
         spider = super().from_crawler(crawler, *args, **kwargs)
@@ -63,6 +138,9 @@ class BaseSpider(scrapy.Spider):
     def spider_closed(self, spider, reason):
         self.logger.info(f"Spider closed: {reason}")
 
+        self.set_stat("object_types", ",".join(o.value for o in self.object_types))
+        self._record_skipped_stage_savings()
+
         if reason == "finished":
             self.logger.info(f"Spider {self.name} finished successfully")
             self.logger.info(f"Total applications scraped: {self.applications_scraped}")
@@ -74,6 +152,10 @@ class BaseSpider(scrapy.Spider):
             self.logger.error(f"Spider {self.name} closed due to: {reason}")
 
     def handle_error(self, failure: Failure):
+        if failure.check(RequestBudgetSpent, CircuitBreakerOpen):
+            self.logger.info(f"Dropped {failure.request.url}: {failure.value}")
+            return
+
         self.logger.error(f"Error occurred in spider {self.name}:")
         self.logger.error(f"Error type: {failure.type}")
         self.logger.error(f"Error value: {failure.value}")
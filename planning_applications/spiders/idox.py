@@ -8,6 +8,8 @@ from parsel.selector import Selector
 from scrapy.http.request import Request
 from scrapy.http.response import Response
 from scrapy.http.response.text import TextResponse
+from twisted.python.failure import Failure
+from w3lib.url import add_or_replace_parameters
 
 from planning_applications.db import select_planning_application_by_url
 from planning_applications.items import (
@@ -15,11 +17,24 @@ from planning_applications.items import (
     IdoxPlanningApplicationDetailsSummary,
     IdoxPlanningApplicationGeometry,
     IdoxPlanningApplicationItem,
+    PlanningApplication,
     PlanningApplicationDocument,
+    PlanningApplicationGeometry,
+    PlanningApplicationSearchResult,
 )
 from planning_applications.settings import DEFAULT_DATE_FORMAT
 from planning_applications.spiders.base import BaseSpider
 
+# Idox Public Access shows 10 results per page unless told otherwise
+DEFAULT_RESULTS_PER_PAGE = 10
+
+RESULTS_PER_PAGE_STAT = "idox/results_per_page"
+
+SEARCH_SESSION_STAT = "idox/session"
+
+# Meta that only applies to the first results page of a search window, and mustn't follow it on to later pages
+WINDOW_ONLY_META_KEYS = ("unsized_response", "reused_search_form", "handle_httpstatus_list", "dont_retry")
+
 
 class IdoxSpider(BaseSpider):
     start_url: str
@@ -29,6 +44,22 @@ class IdoxSpider(BaseSpider):
     start_date: date
     end_date: date
 
+    # Once the requested window is searched, earlier windows are searched a week at a time back to this date
+    earliest_date: date = date(2000, 1, 1)
+
+    # How many search results to request per page. If None, the largest size offered by the council's results page
+    # is used, and the size the previous run settled on (recorded in scraper_runs) is reused from then on
+    results_per_page: Optional[int] = None
+
+    # Build applications straight from the search result rows, and only visit the tabs of references that aren't in
+    # the database yet
+    light: bool = False
+
+    # Search each new date window with the tokens from the last advanced search page we loaded, only loading it again
+    # when the council rejects them. Councils with single-use tokens (e.g. reCAPTCHA) should turn this off
+    reuse_search_form: bool = True
+    _search_form: Optional[Response] = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -38,13 +69,31 @@ class IdoxSpider(BaseSpider):
         if isinstance(self.end_date, str):
             self.end_date = datetime.strptime(self.end_date, DEFAULT_DATE_FORMAT).date()
 
+        if isinstance(self.earliest_date, str):
+            self.earliest_date = datetime.strptime(self.earliest_date, DEFAULT_DATE_FORMAT).date()
+
         if self.start_date > self.end_date:
             raise ValueError(f"start_date {self.start_date} must be earlier than end_date {self.end_date}")
 
+        if isinstance(self.results_per_page, str):
+            self.results_per_page = int(self.results_per_page)
+
+        if isinstance(self.light, str):
+            self.light = self.light.lower() in ("1", "true", "yes")
+
     def start_requests(self) -> Generator[Request, None, None]:
         """
         First entry point: load the advanced search page so we can get the form/CSRF token.
         """
+        if self.results_per_page is None:
+            previous_results_per_page = self.get_last_run_stats().get(RESULTS_PER_PAGE_STAT)
+            if previous_results_per_page:
+                self.logger.info(f"Using {previous_results_per_page} results per page from the previous run")
+                self.results_per_page = int(previous_results_per_page)
+
+        if self.results_per_page is not None:
+            self.set_stat(RESULTS_PER_PAGE_STAT, self.results_per_page)
+
         yield Request(
             self.start_url,
             callback=self._start_new_period,
@@ -57,12 +106,19 @@ class IdoxSpider(BaseSpider):
         We are on the advanced search page.
         Now we can 'submit_form' using the date range in response.meta (start_date, end_date).
         """
+        self.inc_stat(f"{SEARCH_SESSION_STAT}/form_fetched")
+        if self.reuse_search_form:
+            self._search_form = response
+
         yield from self.submit_form(response)
 
     def submit_form(self, response: Response) -> Generator[Request, None, None]:
         self.logger.info(f"Submitting search form on {response.url}")
         formdata = self._build_formdata(response)
-        yield from self._build_formrequest(response, formdata)
+        for request in self._build_formrequest(response, formdata):
+            # Carried through the window's results pages and applications, to prioritise recent windows
+            request.meta["validated_end"] = self.end_date
+            yield request
 
     def _build_formdata(self, response: Response) -> Dict[str, str]:
         csrf = response.css("input[name='_csrf']::attr(value)").get()
@@ -90,6 +146,10 @@ class IdoxSpider(BaseSpider):
             f"Parsing results from {response.url} (applications scraped so far: {self.applications_scraped})"
         )
 
+        if response.meta.get("reused_search_form") and self._search_form_rejected(response):
+            yield from self._refetch_search_form(response)
+            return
+
         message_box = response.css(".messagebox")
         if message_box:
             msg_text = message_box[0].extract()
@@ -101,6 +161,11 @@ class IdoxSpider(BaseSpider):
                 # If you still want to proceed, remove this return OR schedule previous month here, too.
                 return
 
+        unsized_response = response.meta.get("unsized_response")
+        if unsized_response is not None and not response.css("#searchresults .searchresult"):
+            yield from self._fall_back_to_default_results_per_page(response.meta["results_per_page"], unsized_response)
+            return
+
         application_tools = response.css("#applicationTools")
         if application_tools:
             self.logger.info(f"Only one application found on {response.url}")
@@ -122,10 +187,22 @@ class IdoxSpider(BaseSpider):
             yield from self._maybe_schedule_previous_week(response)
             return
 
+        next_page = response.css(".next::attr(href)").get()
+
+        if next_page and not response.meta.get("results_per_page"):
+            results_per_page_request = self._build_results_per_page_request(response, len(search_results))
+            if results_per_page_request:
+                yield results_per_page_request
+                return
+
+        if response.meta.get("results_per_page"):
+            self._record_results_per_page(response, len(search_results), bool(next_page))
+
         self.logger.info(f"Found {len(search_results)} applications on {response.url}")
+        self.inc_stat("idox/search_results", len(search_results))
         for result in search_results:
-            description = result.css(".summaryLinkTextClamp::text").get()
-            self.logger.info(f"Found application: {description}")
+            # Per-row lines are logged lazily at DEBUG, so they cost nothing under the production log profile
+            self.logger.debug("Found application: %s", result.css(".summaryLinkTextClamp::text").get())
 
             if self.applications_scraped >= self.limit:
                 self.logger.info(f"Reached configured limit of {self.limit} applications, closing spider")
@@ -139,28 +216,36 @@ class IdoxSpider(BaseSpider):
             url = response.urljoin(url)
 
             existing_application = select_planning_application_by_url(url)
+
+            if self.light:
+                yield from self._parse_light_result(result, response, url, existing_application)
+                continue
+
             if existing_application and not existing_application.is_active:
-                self.logger.info(f"Application already exists: {existing_application.url}")
+                self.logger.debug("Application already exists: %s", existing_application.url)
+                self.inc_stat("idox/existing_skipped")
                 continue
 
-            yield from self._parse_single_result(result, response)
+            yield from self._parse_single_result(result, response, new_reference=existing_application is None)
 
         # If no next page (or if no results, etc.), schedule previous month:
-        next_page = response.css(".next::attr(href)").get()
         if next_page:
             next_page_url = response.urljoin(next_page)
             self.logger.info(f"Found next page at {next_page_url}")
             yield Request(
                 url=next_page_url,
                 callback=self.parse_results,
-                meta=response.meta,
+                meta=self._results_page_meta(response),
                 dont_filter=True,
             )
         else:
             self.logger.info("No next page found, checking if we should schedule previous week")
             yield from self._maybe_schedule_previous_week(response)
 
-    def _parse_single_result(self, result: Selector, response: Response):
+    def _results_page_meta(self, response: Response) -> dict:
+        return {k: v for k, v in response.meta.items() if k not in WINDOW_ONLY_META_KEYS}
+
+    def _parse_single_result(self, result: Selector, response: Response, new_reference: bool = False):
         details_summary_url = result.css("a::attr(href)").get()
         if not details_summary_url:
             self.logger.error(f"Failed to parse details summary url from {result}, can't continue")
@@ -173,25 +258,249 @@ class IdoxSpider(BaseSpider):
             self.logger.error(f"Failed to parse keyval from {details_summary_url}, can't continue")
             return
 
+        self.applications_scraped += 1
+
+        meta = {
+            "keyval": keyval,
+            "url": details_summary_url,
+            "original_response": response,
+            "limit": self.limit,
+            "applications_scraped": self.applications_scraped,
+            "validated_end": response.meta.get("validated_end"),
+            "new_reference": new_reference,
+        }
+
         if self.should_scrape_application:
+            yield self._stage_request("summary", details_summary_url, self.parse_details_summary_tab, meta)
+            return
+
+        # Without applications there's nothing to read from the details tabs, but documents and geometries still
+        # need the application reference to be linked up, so take it from the search result instead
+        meta["reference"] = self._parse_result_meta_info(result).get("Ref. No")
+        if not meta["reference"]:
+            self.logger.error(f"Failed to parse reference from {result}, can't continue")
+            return
+
+        self.record_skipped_stage("summary")
+        self.record_skipped_stage("details")
+        yield from self._continue_after_details(meta)
+
+    def _parse_light_result(
+        self, result: Selector, response: Response, url: str, existing_application: Optional[PlanningApplication]
+    ):
+        search_result = self._create_search_result(result, url)
+
+        if search_result is None:
+            # Not enough in the row to save it on its own, so fall back to the application's tabs
+            self.inc_stat("idox/light/incomplete_rows")
+            yield from self._parse_single_result(result, response, new_reference=existing_application is None)
+            return
+
+        self.inc_stat("idox/light/applications")
+        yield search_result
+
+        # The row is saved before the application's tabs are scraped, so one whose full scrape failed or never ran
+        # (it's the details tab that fills in application_type) still needs it
+        if existing_application is not None and existing_application.application_type is not None:
             self.applications_scraped += 1
+            return
 
-            meta = {
-                "keyval": keyval,
-                "original_response": response,
-                "limit": self.limit,
-                "applications_scraped": self.applications_scraped,
-            }
+        self.logger.debug("Application %s hasn't been fully scraped, queueing full scrape", search_result.reference)
+        self.inc_stat("idox/light/enrichment_queued")
+        yield from self._parse_single_result(result, response, new_reference=True)
 
-            yield Request(
-                details_summary_url, callback=self.parse_details_summary_tab, meta=meta, errback=self.handle_error
+    def _create_search_result(self, result: Selector, url: str) -> Optional[PlanningApplicationSearchResult]:
+        meta_info = self._parse_result_meta_info(result)
+
+        received = self._parse_result_date(meta_info.get("Received"))
+        validated = self._parse_result_date(meta_info.get("Validated"))
+        address = " ".join(" ".join(result.css(".address ::text").getall()).split())
+        description = " ".join(" ".join(result.css(".summaryLinkTextClamp ::text").getall()).split())
+
+        # Applications are saved with a validated date, so a row without one can't stand on its own
+        if "keyVal=" not in url or not meta_info.get("Ref. No") or not validated:
+            return None
+
+        if not address or not meta_info.get("Status"):
+            return None
+
+        return PlanningApplicationSearchResult(
+            lpa=self.name,
+            reference=meta_info["Ref. No"],
+            website_reference=url.split("keyVal=")[1].split("&")[0],
+            url=url,
+            submitted_date=received or validated,
+            validated_date=validated,
+            address=address,
+            description=description or None,
+            application_status=meta_info["Status"],
+        )
+
+    def _parse_result_date(self, value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%a %d %b %Y")
+        except ValueError:
+            self.logger.warning(f"Failed to parse search result date {value}")
+            return None
+
+    def _parse_result_meta_info(self, result: Selector) -> Dict[str, str]:
+        """
+        Parse the `.metaInfo` line of a search result, e.g.
+        "Ref. No: 24/00001/FUL | Received: Mon 01 Jan 2024 | Validated: Tue 02 Jan 2024 | Status: Pending"
+        """
+        text = " ".join(t.strip() for t in result.css(".metaInfo ::text").getall() if t.strip())
+
+        meta_info = {}
+        for part in text.split("|"):
+            key, _, value = part.partition(":")
+            if value.strip():
+                meta_info[key.strip()] = " ".join(value.split())
+        return meta_info
+
+    # Request graph
+    # -------------------------------------------------------------------------
+
+    def _stage_request(self, stage: str, url: str, callback, meta: dict) -> Request:
+        meta["stage"] = stage
+        return Request(url, callback=callback, meta=meta, errback=self.handle_error)
+
+    def _continue_after_details(self, meta: dict) -> Generator[Request | IdoxPlanningApplicationItem, None, None]:
+        if self.should_scrape_document:
+            documents_url = meta["url"].replace("activeTab=summary", "activeTab=documents")
+            yield self._stage_request("documents", documents_url, self.parse_documents_tab, meta)
+            return
+
+        self.record_skipped_stage("documents")
+        yield from self._continue_after_documents(meta)
+
+    def _continue_after_documents(self, meta: dict) -> Generator[Request | IdoxPlanningApplicationItem, None, None]:
+        if self.arcgis_url and self.should_scrape_geometry:
+            arcgis_url = (
+                self.arcgis_url
+                + "?f=geojson&returnGeometry=true&outFields=*&outSR=4326&where=KEYVAL%3D%27"
+                + meta["keyval"]
+                + "%27"
+            )
+            yield self._stage_request("arcgis", arcgis_url, self.parse_idox_arcgis, meta)
+            return
+
+        if self.arcgis_url:
+            self.record_skipped_stage("arcgis")
+        yield from self._finish_application(meta)
+
+    def _finish_application(self, meta: dict):
+        if self.should_scrape_application:
+            yield from self.create_planning_application_item(meta)
+            return
+
+        # Documents and geometries are saved against the existing application
+        for document in meta.get("documents") or []:
+            yield document
+
+        geometry: Optional[IdoxPlanningApplicationGeometry] = meta.get("geometry")
+        if geometry and geometry.geometry:
+            yield PlanningApplicationGeometry(
+                lpa=self.name,
+                application_reference=meta["reference"],
+                reference=geometry.reference,
+                geometry=geometry.geometry,
+            )
+
+    def _application_reference(self, meta: dict) -> str:
+        if meta.get("details_summary"):
+            return meta["details_summary"].reference
+        return meta["reference"]
+
+    # Results per page
+    # -------------------------------------------------------------------------
+
+    def _build_results_per_page_request(self, response: Response, results_on_page: int) -> Optional[Request]:
+        """
+        Re-request the first page of results with the largest page size the council accepts, so a window needs as
+        few page loads as possible. Returns None if there is nothing to gain.
+        """
+        if not isinstance(response, TextResponse):
+            return None
+
+        offered_sizes = [
+            int(value)
+            for value in response.css("select[name='searchCriteria.resultsPerPage'] option::attr(value)").getall()
+            if value.strip().isdigit()
+        ]
+
+        results_per_page = self.results_per_page or max(offered_sizes, default=0)
+        if results_per_page <= results_on_page:
+            return None
+
+        meta = {
+            **self._results_page_meta(response),
+            "results_per_page": results_per_page,
+            "unsized_response": response,
+        }
+        formdata = {
+            "searchCriteria.page": "1",
+            "action": "page",
+            "searchCriteria.resultsPerPage": str(results_per_page),
+        }
+
+        self.logger.info(f"Requesting {results_per_page} results per page on {response.url}")
+
+        if offered_sizes:
+            return scrapy.FormRequest.from_response(
+                response,
+                formxpath="//form[.//select[@name='searchCriteria.resultsPerPage']]",
+                formdata=formdata,
+                callback=self.parse_results,
+                errback=self._handle_results_per_page_error,
+                meta=meta,
+                dont_filter=True,
             )
 
+        # The council doesn't show a page size selector, so try the parameter on the paging URL instead
+        next_page_url = response.urljoin(response.css(".next::attr(href)").get() or "")
+        return Request(
+            add_or_replace_parameters(next_page_url, formdata),
+            callback=self.parse_results,
+            errback=self._handle_results_per_page_error,
+            meta=meta,
+            dont_filter=True,
+        )
+
+    def _record_results_per_page(self, response: Response, results_on_page: int, has_next_page: bool):
+        requested = response.meta["results_per_page"]
+
+        # A full page followed by another page tells us the size the council actually applied
+        accepted = results_on_page if has_next_page else requested
+        if accepted < requested:
+            self.logger.warning(f"Requested {requested} results per page but the council capped it at {accepted}")
+
+        self.results_per_page = accepted
+        self.set_stat(RESULTS_PER_PAGE_STAT, accepted)
+
+    def _fall_back_to_default_results_per_page(self, requested: int, unsized_response: Response):
+        self.logger.warning(
+            f"Council rejected {requested} results per page, falling back to {DEFAULT_RESULTS_PER_PAGE}"
+        )
+        self.inc_stat(f"{RESULTS_PER_PAGE_STAT}/rejected")
+        # Only for this run. The fallback isn't recorded, so the next run tries the largest size again in case this was
+        # a one-off error
+        self.results_per_page = DEFAULT_RESULTS_PER_PAGE
+
+        yield from self.parse_results(unsized_response)
+
+    def _handle_results_per_page_error(self, failure: Failure):
+        self.handle_error(failure)
+        meta = failure.request.meta
+        yield from self._fall_back_to_default_results_per_page(meta["results_per_page"], meta["unsized_response"])
+
     # Details
     # -------------------------------------------------------------------------
 
     def parse_details_summary_tab(self, response: Response) -> Generator[Request, None, None]:
-        self.logger.info(f"Parsing results on {response.url} (parse_details_summary_tab)")
+        self.logger.debug("Parsing results on %s (parse_details_summary_tab)", response.url)
+        self.record_stage_response("summary", response)
 
         item = IdoxPlanningApplicationDetailsSummary()
 
@@ -223,15 +532,16 @@ class IdoxSpider(BaseSpider):
         meta["url"] = response.url
         meta["details_summary"] = item
 
-        yield Request(
+        yield self._stage_request(
+            "details",
             response.url.replace("activeTab=summary", "activeTab=details"),
-            callback=self.parse_details_further_information_tab,
-            meta=meta,
-            errback=self.handle_error,
+            self.parse_details_further_information_tab,
+            meta,
         )
 
     def parse_details_further_information_tab(self, response: Response) -> Generator[Request, None, None]:
-        self.logger.info(f"Parsing results on {response.url} (parse_details_further_information_tab)")
+        self.logger.debug("Parsing results on %s (parse_details_further_information_tab)", response.url)
+        self.record_stage_response("details", response)
 
         item = IdoxPlanningApplicationDetailsFurtherInformation()
 
@@ -255,23 +565,20 @@ class IdoxSpider(BaseSpider):
         meta = response.meta
         meta["details_further_information"] = item
 
-        yield Request(
-            response.url.replace("activeTab=details", "activeTab=documents"),
-            callback=self.parse_documents_tab,
-            meta=meta,
-            errback=self.handle_error,
-        )
+        yield from self._continue_after_details(meta)
 
     # Documents
     # -------------------------------------------------------------------------
 
     def parse_documents_tab(self, response: Response):
-        self.logger.info(f"Parsing documents on {response.url}")
+        self.logger.debug("Parsing documents on %s", response.url)
+        self.record_stage_response("documents", response)
 
         table = response.css("#Documents")[0]
         rows = table.xpath(".//tr")[1:]
 
-        self.logger.info(f"Found {len(rows)} documents on {response.url}")
+        self.logger.debug("Found %d documents on %s", len(rows), response.url)
+        self.inc_stat("idox/documents_found", len(rows))
 
         documents = []
         for row in rows:
@@ -280,20 +587,9 @@ class IdoxSpider(BaseSpider):
         meta = response.meta
         meta["documents"] = documents
 
-        if self.arcgis_url:
-            arcgis_url = (
-                self.arcgis_url
-                + "?f=geojson&returnGeometry=true&outFields=*&outSR=4326&where=KEYVAL%3D%27"
-                + meta["keyval"]
-                + "%27"
-            )
-            yield Request(arcgis_url, callback=self.parse_idox_arcgis, meta=meta, errback=self.handle_error)
-        else:
-            yield from self.create_planning_application_item(meta)
+        yield from self._continue_after_documents(meta)
 
     def _parse_document_row(self, table: Selector, row: Selector, response: Response):
-        self.logger.info(f"Parsing document row on {response.url}")
-
         url_cell = self.get_cell_for_column_name(table, row, "View")
         url = url_cell.xpath("./a/@href").get() if url_cell else None
         if not url:
@@ -315,7 +611,7 @@ class IdoxSpider(BaseSpider):
 
         return PlanningApplicationDocument(
             lpa=self.name,
-            application_reference=response.meta["details_summary"].reference,
+            application_reference=self._application_reference(response.meta),
             date_published=date_published,
             document_type=document_type,
             drawing_number=drawing_number,
@@ -327,16 +623,17 @@ class IdoxSpider(BaseSpider):
     # -------------------------------------------------------------------------
 
     def parse_idox_arcgis(self, response: Response) -> Generator[IdoxPlanningApplicationItem, None, None]:
-        self.logger.info(f"Parsing ArcGIS for application at {response.meta['url']}")
+        self.logger.debug("Parsing ArcGIS for application at %s", response.meta["url"])
+        self.record_stage_response("arcgis", response)
 
         parsed_response = json.loads(response.text)
-        item = IdoxPlanningApplicationGeometry(reference=response.meta["details_summary"].reference, geometry=None)
+        item = IdoxPlanningApplicationGeometry(reference=self._application_reference(response.meta), geometry=None)
 
         if not parsed_response.get("features"):
             self.logger.error(f"No features found in response from {response.url}")
             meta = response.meta
             meta["geometry"] = item
-            yield from self.create_planning_application_item(meta)
+            yield from self._finish_application(meta)
             return
 
         feature = parsed_response["features"][0]
@@ -353,27 +650,79 @@ class IdoxSpider(BaseSpider):
 
         meta = response.meta
         meta["geometry"] = item
-        yield from self.create_planning_application_item(meta)
+        yield from self._finish_application(meta)
 
     # Helpers
     # -------------------------------------------------------------------------
 
     def _maybe_schedule_previous_week(self, response: Response):
         """
-        Revisit the advanced search page, passing the *previous week* date range via meta.
-        Because some sites require a fresh form load and new tokens for each search.
+        Search the *previous week*, reusing the advanced search page we already have if we can.
         """
 
-        if self.start_date >= date(2000, 1, 1):
+        if self.start_date >= self.earliest_date:
             previous_week_end = self.start_date - timedelta(days=1)
             previous_week_start = previous_week_end - timedelta(days=7)
-            if previous_week_end >= date(2000, 1, 1):
+            if previous_week_end >= self.earliest_date:
                 self.start_date = previous_week_start
                 self.end_date = previous_week_end
                 self.logger.info(f"Scheduling previous week {self.start_date} to {self.end_date}")
-                yield Request(
-                    self.start_url, callback=self._start_new_period, errback=self.handle_error, dont_filter=True
-                )
+                yield from self._search_window()
+
+    # Search sessions
+    # -------------------------------------------------------------------------
+
+    def _search_window(self) -> Generator[Request, None, None]:
+        """
+        Search the current date window. The council's session cookie lives in the spider's cookie jar, so the
+        `_csrf` (and Struts) tokens from the last advanced search page stay valid for as long as the session does.
+        """
+        if self._search_form is None:
+            yield Request(self.start_url, callback=self._start_new_period, errback=self.handle_error, dont_filter=True)
+            return
+
+        self.inc_stat(f"{SEARCH_SESSION_STAT}/token_reused")
+        for request in self.submit_form(self._search_form):
+            request.meta["reused_search_form"] = True
+            # Expired tokens are usually refused with a 400 or 403, which we want to see rather than have dropped, or
+            # retried with the same tokens first. Any other failure reloads the search form, which is retried as normal
+            request.meta["handle_httpstatus_list"] = [400, 403]
+            request.meta["dont_retry"] = True
+            request.errback = self._handle_reused_search_form_error
+            yield request
+
+    def _search_form_rejected(self, response: Response) -> bool:
+        if response.status in (400, 403):
+            return True
+
+        # Otherwise the council sends us back to the search form instead of showing results
+        is_search_form = bool(response.css("input[name='date(applicationValidatedStart)']"))
+        has_results = bool(response.css("#searchresults, #applicationTools, .messagebox"))
+        return is_search_form and not has_results
+
+    def _refetch_search_form(self, response: Response) -> Generator[Request, None, None]:
+        self.logger.warning(
+            f"Search tokens rejected on {response.url} (status {response.status}), reloading the search form"
+        )
+        self.inc_stat(f"{SEARCH_SESSION_STAT}/token_rejected")
+        self._search_form = None
+        yield from self._search_window()
+
+    def _handle_reused_search_form_error(self, failure: Failure) -> Generator[Request, None, None]:
+        self.handle_error(failure)
+        self.inc_stat(f"{SEARCH_SESSION_STAT}/token_rejected")
+        self._search_form = None
+        yield from self._search_window()
+
+    def _record_search_session_stats(self):
+        reused = self.get_stat(f"{SEARCH_SESSION_STAT}/token_reused", 0)
+        rejected = self.get_stat(f"{SEARCH_SESSION_STAT}/token_rejected", 0)
+        if reused:
+            self.set_stat(f"{SEARCH_SESSION_STAT}/token_reuse_rate", round((reused - rejected) / reused, 3))
+
+    def spider_closed(self, spider, reason):
+        self._record_search_session_stats()
+        super().spider_closed(spider, reason)
 
     def get_cell_for_column_name(self, table: Selector, row: Selector, column_name: str) -> Optional[Selector]:
         value = table.css(f"th:contains('{column_name}')").xpath("count(preceding-sibling::th)").get()
@@ -406,8 +755,8 @@ class IdoxSpider(BaseSpider):
             "details_further_information"
         ]
         is_active = self._is_active(details_summary.decision, details_summary.decision_issued_date)
-        documents: List[PlanningApplicationDocument] = meta["documents"]
-        geometry: IdoxPlanningApplicationGeometry = meta["geometry"]
+        documents: Optional[List[PlanningApplicationDocument]] = meta.get("documents")
+        geometry: Optional[IdoxPlanningApplicationGeometry] = meta.get("geometry")
 
         item = IdoxPlanningApplicationItem(
             lpa=self.name,
@@ -440,7 +789,7 @@ class IdoxSpider(BaseSpider):
         )
 
         yield item
-        self.logger.info(f"Scraped item: {item}")
+        self.logger.debug("Scraped item: %s", item)
 
     # Comments
     # -------------------------------------------------------------------------
@@ -13,6 +13,8 @@ class CarlisleSpider(IdoxSpider):
     arcgis_url: str = f"https://{domain}/server/rest/services/PALIVE/LIVEUniformPA_Planning/FeatureServer/2/query"
 
     not_yet_working: bool = True
+    # The reCAPTCHA token can only be used for one search
+    reuse_search_form: bool = False
 
     def _build_formdata(self, response: Response) -> Dict[str, str | None]:
         csrf = response.css("input[name='_csrf']::attr(value)").get()
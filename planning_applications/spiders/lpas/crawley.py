@@ -105,6 +105,7 @@ class CrawleySpider(BaseSpider):
                     callback=self.check_disclaimer(self.parse_application_details),
                     errback=self.handle_error,
                     dont_filter=True,
+                    meta={"stage": "details"},
                 )
 
             if self.applications_scraped >= self.limit:
@@ -123,6 +124,7 @@ class CrawleySpider(BaseSpider):
 
     def parse_application_details(self, response: TextResponse):
         self.logger.info("Application details page loaded")
+        self.record_stage_response("details", response)
 
         # application
 
@@ -160,34 +162,62 @@ class CrawleySpider(BaseSpider):
             self.logger.warn(f"Missing required fields for application at {response.url}")
             return
 
-        yield PlanningApplication(
-            lpa=self.name,
-            reference=application_number,
-            website_reference=application_number,
-            url=response.url,
-            submitted_date=submitted_date,
-            validated_date=submitted_date,
-            address=address,
-            description=proposal,
-            application_status=status,
-            application_decision=decision,
-            application_decision_date=target_decision_date,
-            application_type=application_type,
-            expected_decision_level=decision_level,
-            actual_decision_level=decision_level,
-            case_officer=case_officer,
-            case_officer_phone=case_officer_phone,
-            comments_due_date=comments_due_date,
-            committee_date=committee_date,
-            applicant_name=applicant_name,
-            applicant_address=applicant_address,
-            agent_name=agent_name,
-            agent_address=agent_address,
-            is_active=True,
-        )
+        if self.should_scrape_application:
+            yield PlanningApplication(
+                lpa=self.name,
+                reference=application_number,
+                website_reference=application_number,
+                url=response.url,
+                submitted_date=submitted_date,
+                validated_date=submitted_date,
+                address=address,
+                description=proposal,
+                application_status=status,
+                application_decision=decision,
+                application_decision_date=target_decision_date,
+                application_type=application_type,
+                expected_decision_level=decision_level,
+                actual_decision_level=decision_level,
+                case_officer=case_officer,
+                case_officer_phone=case_officer_phone,
+                comments_due_date=comments_due_date,
+                committee_date=committee_date,
+                applicant_name=applicant_name,
+                applicant_address=applicant_address,
+                agent_name=agent_name,
+                agent_address=agent_address,
+                is_active=True,
+            )
 
         # documents
 
+        if self.should_scrape_document:
+            yield from self._parse_documents(response, application_number)
+
+        # geometry
+
+        if not self.should_scrape_geometry:
+            self.record_skipped_stage("arcgis")
+            return
+
+        arcgis_url = (
+            self.arcgis_url
+            + "?f=geojson&returnGeometry=true&outFields=*&outSR=4326&where=APP_NO%3D%27"
+            + urllib.parse.quote(application_number)
+            + "%27"
+        )
+
+        yield scrapy.Request(
+            url=arcgis_url,
+            callback=self.parse_arcgis,
+            errback=self.handle_error,
+            dont_filter=True,
+            meta={"application_reference": application_number, "stage": "arcgis"},
+        )
+
+    def _parse_documents(
+        self, response: TextResponse, application_number: str
+    ) -> Generator[PlanningApplicationDocument, None, None]:
         document_type = None
 
         for doc_row in response.css(".document-list table tr"):
@@ -221,25 +251,9 @@ class CrawleySpider(BaseSpider):
                 description=doc_description,
             )
 
-        # geometry
-
-        arcgis_url = (
-            self.arcgis_url
-            + "?f=geojson&returnGeometry=true&outFields=*&outSR=4326&where=APP_NO%3D%27"
-            + urllib.parse.quote(application_number)
-            + "%27"
-        )
-
-        yield scrapy.Request(
-            url=arcgis_url,
-            callback=self.parse_arcgis,
-            errback=self.handle_error,
-            dont_filter=True,
-            meta={"application_reference": application_number},
-        )
-
     def parse_arcgis(self, response: Response) -> Generator[PlanningApplicationGeometry, None, None]:
         self.logger.info(f"Parsing ArcGIS for application at {response.url}")
+        self.record_stage_response("arcgis", response)
 
         parsed_response = json.loads(response.text)
         if not parsed_response.get("features"):
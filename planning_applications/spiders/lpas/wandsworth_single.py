@@ -1,8 +1,8 @@
 import json
 from datetime import datetime
+from functools import cached_property
 
 import scrapy
-from pyproj import Transformer
 from rich import print
 from scrapy.http.request import Request
 
@@ -17,8 +17,14 @@ class WandsworthSingleSpider(scrapy.Spider):
     ]
     not_yet_working = True
 
-    # Create transformer for UK National Grid to WGS84
-    transformer = Transformer.from_crs("EPSG:27700", "EPSG:4326", always_xy=True)
+    @cached_property
+    def transformer(self):
+        """
+        Transformer from UK National Grid to WGS84, created on first use as pyproj is slow to import and set up
+        """
+        from pyproj import Transformer
+
+        return Transformer.from_crs("EPSG:27700", "EPSG:4326", always_xy=True)
 
     def __init__(self, url=None, *args, **kwargs):
         super(WandsworthSingleSpider, self).__init__(*args, **kwargs)
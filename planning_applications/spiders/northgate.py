@@ -2,12 +2,12 @@ from datetime import date, datetime, timedelta
 from typing import Dict, Generator, List, Optional
 from uuid import uuid4
 
-import scrapy
 from scrapy.http.request import Request
 from scrapy.http.response import Response
 from scrapy.http.response.text import TextResponse
 
 from planning_applications.settings import DEFAULT_DATE_FORMAT
+from planning_applications.spiders.aspnet import AspNetPostbackSession
 from planning_applications.spiders.base import BaseSpider
 
 
@@ -36,12 +36,11 @@ class NorthgateSpider(BaseSpider):
         First entry point: load the initial page to get required cookies
         """
         session_id = str(uuid4())
+        session = AspNetPostbackSession(self, self.start_url, session_id=session_id)
 
-        yield Request(
-            self.start_url,
-            callback=self._handle_cookies,
+        yield session.request_form(
+            self._handle_cookies,
             errback=self.handle_error,
-            dont_filter=True,
             cb_kwargs={"session_id": session_id},
             meta={"zyte_api_automap": {"session": {"id": session_id}}},  # Enable cookie handling
         )
@@ -50,21 +49,13 @@ class NorthgateSpider(BaseSpider):
         """
         Handle the initial response and prepare the search request
         """
-        # Extract ASP.NET form values
-        viewstate = response.css("#__VIEWSTATE::attr(value)").get()
-        viewstategenerator = response.css("#__VIEWSTATEGENERATOR::attr(value)").get()
-        eventvalidation = response.css("#__EVENTVALIDATION::attr(value)").get()
-
         start_date = self.start_date.strftime("%d %B %Y")
         end_date = self.end_date.strftime("%d %B %Y")
 
         print(f"Searching for applications between {start_date} and {end_date}")
 
-        # Form data that needs to be submitted
+        # Form data that needs to be submitted. The ASP.NET form state is carried over by the session
         formdata = {
-            "__VIEWSTATE": viewstate,
-            "__VIEWSTATEGENERATOR": viewstategenerator,
-            "__EVENTVALIDATION": eventvalidation,
             "cboSelectDateValue": "1",  # This is for "Date Received"
             "rbGroup": "rbRange",  # This selects the date range option
             "dateStart": start_date,
@@ -73,12 +64,12 @@ class NorthgateSpider(BaseSpider):
         }
 
         # First submit the search form
-        yield scrapy.FormRequest.from_response(
+        session: AspNetPostbackSession = response.meta["aspnet_session"]
+        yield session.postback(
             response,
             formdata=formdata,
             callback=self._parse_search_results,
             errback=self.handle_error,
-            dont_filter=True,
             meta={"zyte_api_automap": {"session": {"id": session_id}}},
         )
 
@@ -0,0 +1,351 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from scrapy import Spider
+
+IDOX = "idox"
+SMARTADMIN = "smartadmin"
+NORTHGATE = "northgate"
+CUSTOM = "custom"
+
+# The spider class each platform's councils are generated from
+PLATFORM_SPIDERS: Dict[str, str] = {
+    IDOX: "planning_applications.spiders.idox.IdoxSpider",
+}
+
+# Generated spiders report this as their module, so they keep the scraper_runs keys they had as one module per council
+LPA_SPIDER_MODULE = "planning_applications.spiders.lpas"
+
+
+@dataclass(frozen=True)
+class LpaSpec:
+    """
+    A local planning authority, and where its planning portal lives.
+
+    Councils on a platform we have a generic spider for only need a row here. Councils that need their own code set
+    `spider` to the import path of a hand-written spider class instead.
+    """
+
+    name: str
+    domain: str
+    platform: str = IDOX
+    start_path: str = "/online-applications/search.do?action=advanced"
+    not_yet_working: bool = False
+    spider: Optional[str] = None
+
+    @property
+    def start_url(self) -> str:
+        return f"https://{self.domain}{self.start_path}"
+
+    @property
+    def arcgis_url(self) -> str:
+        return f"https://{self.domain}/server/rest/services/PALIVE/LIVEUniformPA_Planning/FeatureServer/2/query"
+
+    @property
+    def class_name(self) -> str:
+        return "".join(part.title() for part in self.name.split("_")) + "Spider"
+
+
+def build_spider_class(spec: LpaSpec) -> "type[Spider]":
+    """
+    Get the spider class for a council, importing its hand-written spider or generating one from its platform's.
+    """
+    # The registry itself is read by the CLI before anything needs Scrapy, so it's only imported here
+    from scrapy.utils.misc import load_object
+
+    if spec.spider:
+        return load_object(spec.spider)
+
+    if spec.platform not in PLATFORM_SPIDERS:
+        raise ValueError(f"No spider for platform {spec.platform}, {spec.name} needs a hand-written one")
+
+    return type(
+        spec.class_name,
+        (load_object(PLATFORM_SPIDERS[spec.platform]),),
+        {
+            "__module__": f"{LPA_SPIDER_MODULE}.{spec.name}",
+            "__qualname__": spec.class_name,
+            "name": spec.name,
+            "domain": spec.domain,
+            "allowed_domains": [spec.domain],
+            "start_url": spec.start_url,
+            "arcgis_url": spec.arcgis_url,
+            "not_yet_working": spec.not_yet_working,
+        },
+    )
+
+
+# Councils with hand-written spiders
+CUSTOM_LPAS: List[LpaSpec] = [
+    LpaSpec(
+        "carlisle",
+        "publicaccess.carlisle.gov.uk",
+        not_yet_working=True,
+        spider="planning_applications.spiders.lpas.carlisle.CarlisleSpider",
+    ),
+    LpaSpec(
+        "crawley",
+        "planningregister.crawley.gov.uk",
+        platform=CUSTOM,
+        spider="planning_applications.spiders.lpas.crawley.CrawleySpider",
+    ),
+    LpaSpec(
+        "hackney",
+        "developmentandhousing.hackney.gov.uk",
+        platform=SMARTADMIN,
+        not_yet_working=True,
+        spider="planning_applications.spiders.lpas.hackney.HackneySpider",
+    ),
+    LpaSpec(
+        "wandsworth",
+        "planning.wandsworth.gov.uk",
+        platform=NORTHGATE,
+        not_yet_working=True,
+        spider="planning_applications.spiders.lpas.wandsworth.WandsworthSpider",
+    ),
+    LpaSpec(
+        "wandsworth_single",
+        "planning.wandsworth.gov.uk",
+        platform=CUSTOM,
+        not_yet_working=True,
+        spider="planning_applications.spiders.lpas.wandsworth_single.WandsworthSingleSpider",
+    ),
+    LpaSpec(
+        "westminster",
+        "idoxpa.westminster.gov.uk",
+        spider="planning_applications.spiders.lpas.westminster.WestminsterSpider",
+    ),
+]
+
+LPAS: List[LpaSpec] = sorted(
+    [
+        LpaSpec("aberdeen", "publicaccess.aberdeencity.gov.uk"),
+        LpaSpec("aberdeenshire", "upa.aberdeenshire.gov.uk"),
+        LpaSpec("adur_and_worthing", "planning.adur-worthing.gov.uk", not_yet_working=True),
+        LpaSpec("angus", "planning.angus.gov.uk"),
+        LpaSpec("argyll_and_bute", "publicaccess.argyll-bute.gov.uk", not_yet_working=True),
+        LpaSpec("aylesbury_vale", "publicaccess.aylesburyvaledc.gov.uk"),
+        LpaSpec("babergh", "planning.baberghmidsuffolk.gov.uk"),
+        LpaSpec("barnet", "publicaccess.barnet.gov.uk"),
+        LpaSpec("basildon", "planning.basildon.gov.uk"),
+        LpaSpec("basingstoke_and_deane", "planning.basingstoke.gov.uk"),
+        LpaSpec("bassetlaw", "publicaccess.bassetlaw.gov.uk"),
+        LpaSpec("bedford", "publicaccess.bedford.gov.uk"),
+        LpaSpec("bexley", "pa.bexley.gov.uk"),
+        LpaSpec("blaby", "pa.blaby.gov.uk"),
+        LpaSpec("blackpool", "idoxpa.blackpool.gov.uk"),
+        LpaSpec("bolsover", "publicaccess.bolsover.gov.uk"),
+        LpaSpec("bracknell_forest", "planapp.bracknell-forest.gov.uk"),
+        LpaSpec("bradford", "planning.bradford.gov.uk"),
+        LpaSpec("braintree", "publicaccess.braintree.gov.uk"),
+        LpaSpec("brecon_beacons", "planning.beacons-npa.gov.uk"),
+        LpaSpec("brent", "pa.brent.gov.uk"),
+        LpaSpec("brentwood", "publicaccess.brentwood.gov.uk"),
+        LpaSpec("bristol", "pa.bristol.gov.uk"),
+        LpaSpec("broads", "planning.broads-authority.gov.uk"),
+        LpaSpec("bromley", "searchapplications.bromley.gov.uk"),
+        LpaSpec("bromsgrove", "publicaccess.bromsgroveandredditch.gov.uk"),
+        LpaSpec("broxtowe", "publicaccess.broxtowe.gov.uk"),
+        LpaSpec("burnley", "publicaccess.burnley.gov.uk"),
+        LpaSpec("caerphilly", "publicaccess.caerphilly.gov.uk", start_path="/PublicAccess/search.do?action=advanced"),
+        LpaSpec("cairngorms", "eplanningcnpa.gov.uk"),
+        LpaSpec("calderdale", "portal.calderdale.gov.uk"),
+        LpaSpec("cambridge", "applications.greatercambridgeplanning.org"),
+        LpaSpec("cambridgeshire", "planning.cambridgeshire.org"),
+        LpaSpec("cardiff", "cardiffidoxcloud.wales", start_path="/publicaccess/search.do?action=advanced"),
+        LpaSpec("castle_point", "publicaccess.castlepoint.gov.uk"),
+        LpaSpec("chelmsford", "publicaccess.chelmsford.gov.uk"),
+        LpaSpec("cheltenham", "publicaccess.cheltenham.gov.uk"),
+        LpaSpec("cheshire_west_and_chester", "pa.cheshirewestandchester.gov.uk"),
+        LpaSpec("chesterfield", "publicaccess.chesterfield.gov.uk"),
+        LpaSpec("chichester", "publicaccess.chichester.gov.uk"),
+        LpaSpec("chiltern_and_south_bucks", "pa-csb.buckinghamshire.gov.uk"),
+        LpaSpec("city_of_london", "planning2.cityoflondon.gov.uk"),
+        LpaSpec("clackmannanshire", "publicaccess.clacks.gov.uk", start_path="/publicaccess"),
+        LpaSpec("corby", "publicaccess.corby.gov.uk", start_path="/publicaccess"),
+        LpaSpec("cornwall", "planning.cornwall.gov.uk"),
+        LpaSpec("cotswold", "publicaccess.cotswold.gov.uk"),
+        LpaSpec("craven", "publicaccess.cravendc.gov.uk"),
+        LpaSpec("croydon", "publicaccess3.croydon.gov.uk"),
+        LpaSpec("darlington", "publicaccess.darlington.gov.uk"),
+        LpaSpec("derby", "eplanning.derby.gov.uk"),
+        LpaSpec("derbyshire_dales", "planning.derbyshiredales.gov.uk"),
+        LpaSpec("doncaster", "planning.doncaster.gov.uk"),
+        LpaSpec("dover", "publicaccess.dover.gov.uk"),
+        LpaSpec("dumfries_and_galloway", "eaccess.dumgal.gov.uk"),
+        LpaSpec("dundee", "idoxwam.dundeecity.gov.uk", start_path="/idoxpa-web"),
+        LpaSpec("durham", "publicaccess.durham.gov.uk"),
+        LpaSpec("ealing", "pam.ealing.gov.uk"),
+        LpaSpec("east_ayrshire", "eplanning.east-ayrshire.gov.uk", start_path="/online"),
+        LpaSpec("east_cambridgeshire", "pa.eastcambs.gov.uk"),
+        LpaSpec("east_devon", "planning.eastdevon.gov.uk"),
+        LpaSpec("east_dunbartonshire", "planning.eastdunbarton.gov.uk"),
+        LpaSpec("east_hampshire", "planningpublicaccess.easthants.gov.uk"),
+        LpaSpec("east_hertfordshire", "publicaccess.eastherts.gov.uk"),
+        LpaSpec("east_lindsey", "publicaccess.e-lindsey.gov.uk"),
+        LpaSpec("east_lothian", "pa.eastlothian.gov.uk"),
+        LpaSpec("east_northamptonshire", "publicaccess.east-northamptonshire.gov.uk"),
+        LpaSpec("east_renfrewshire", "publicaccess.eastrenfrewshire.gov.uk"),
+        LpaSpec("east_riding", "newplanningaccess.eastriding.gov.uk", start_path="/newplanningaccess"),
+        LpaSpec("east_suffolk", "publicaccess.eastsuffolk.gov.uk"),
+        LpaSpec("edinburgh", "citydev-portal.edinburgh.gov.uk", start_path="/idoxpa-web"),
+        LpaSpec("enfield", "planningandbuildingcontrol.enfield.gov.uk"),
+        LpaSpec("exeter", "publicaccess.exeter.gov.uk"),
+        LpaSpec("falkirk", "edevelopment.falkirk.gov.uk", start_path="/online"),
+        LpaSpec("fenland", "publicaccess.fenland.gov.uk", start_path="/publicaccess"),
+        LpaSpec("fife", "planning.fife.gov.uk", start_path="/online"),
+        LpaSpec("forest_of_dean", "publicaccess.fdean.gov.uk"),
+        LpaSpec("gateshead", "public.gateshead.gov.uk"),
+        LpaSpec("gedling", "pawam.gedling.gov.uk"),
+        LpaSpec("glasgow", "publicaccess.glasgow.gov.uk"),
+        LpaSpec("gloucester", "publicaccess.gloucester.gov.uk"),
+        LpaSpec("gloucestershire", "planning.gloucestershire.gov.uk", start_path="/publicaccess"),
+        LpaSpec("gosport", "publicaccess.gosport.gov.uk"),
+        LpaSpec("gravesham", "plan.gravesham.gov.uk"),
+        LpaSpec("greenwich", "planning.royalgreenwich.gov.uk"),
+        LpaSpec("guildford", "publicaccess.guildford.gov.uk"),
+        LpaSpec("halton", "pa.halton.gov.uk"),
+        LpaSpec("hambleton", "planning.hambleton.gov.uk"),
+        LpaSpec("hammersmith_and_fulham", "public-access.lbhf.gov.uk"),
+        LpaSpec("harborough", "pa2.harborough.gov.uk"),
+        LpaSpec("harlow", "planningonline.harlow.gov.uk"),
+        LpaSpec("harrogate", "uniformonline.harrogate.gov.uk"),
+        LpaSpec("hart", "publicaccess.hart.gov.uk"),
+        LpaSpec("hastings", "publicaccess.hastings.gov.uk"),
+        LpaSpec("havant", "planningpublicaccess.havant.gov.uk"),
+        LpaSpec("hertsmere", "www6.hertsmere.gov.uk"),
+        LpaSpec("hinckley_and_bosworth", "pa.hinckley_and_bosworth.gov.uk"),
+        LpaSpec("horsham", "public-access.horsham.gov.uk", start_path="/public-access"),
+        LpaSpec("hull", "hullcc.gov.uk", start_path="/padcbc/publicaccess-live"),
+        LpaSpec("huntingdonshire", "publicaccess.huntingdonshire.gov.uk"),
+        LpaSpec("isle_of_man", "pbc.gov.im"),
+        LpaSpec("isle_of_wight", "publicaccess.iow.gov.uk"),
+        LpaSpec("kingston", "publicaccess.kingston.gov.uk"),
+        LpaSpec("lambeth", "planning.lambeth.gov.uk"),
+        LpaSpec("leeds", "publicaccess.leeds.gov.uk"),
+        LpaSpec("lewes_and_eastbourne", "planningpa.lewes-eastbourne.gov.uk"),
+        LpaSpec("lewisham", "planning.lewisham.gov.uk"),
+        LpaSpec("lichfield", "planning.lichfielddc.gov.uk"),
+        LpaSpec("lincoln", "planning.lincoln.gov.uk"),
+        LpaSpec("lisburn_and_castlereagh", "planningregister.planningsystemni.gov.uk"),
+        LpaSpec("loch_lomond", "eplanning.lochlomond-trossachs.org", start_path="/OnlinePlanning"),
+        LpaSpec("luton", "planning.luton.gov.uk"),
+        LpaSpec("maidstone", "pa.midkent.gov.uk"),
+        LpaSpec("maldon", "publicaccess.maldon.gov.uk"),
+        LpaSpec("manchester", "pa.manchester.gov.uk"),
+        LpaSpec("mansfield", "planning.mansfield.gov.uk"),
+        LpaSpec("medway", "publicaccess1.medway.gov.uk"),
+        LpaSpec("melton", "pa.melton.gov.uk"),
+        LpaSpec("mendip", "publicaccess.mendip.gov.uk"),
+        LpaSpec("merthyr_tydfil", "publicaccess.merthyr.gov.uk"),
+        LpaSpec("mid_devon", "planning.middevon.gov.uk"),
+        LpaSpec("mid_suffolk", "planning.baberghmidsuffolk.gov.uk"),
+        LpaSpec("mid_sussex", "pa.midsussex.gov.uk"),
+        LpaSpec("monmouthshire", "planningonline.monmouthshire.gov.uk"),
+        LpaSpec("neath_port_talbot", "planningonline.npt.gov.uk"),
+        LpaSpec("new_forest_district", "planning.newforest.gov.uk"),
+        LpaSpec("newark_and_sherwood", "publicaccess.newark-sherwooddc.gov.uk"),
+        LpaSpec("newcastle_under_lyme", "publicaccess.newcastle-staffs.gov.uk"),
+        LpaSpec("newham", "pa.newham.gov.uk"),
+        LpaSpec("newport", "publicaccess.newport.gov.uk"),
+        LpaSpec("north_east_derbyshire", "planapps-online.ne-derbyshire.gov.uk"),
+        LpaSpec("north_east_lincolnshire", "planninganddevelopment.nelincs.gov.uk"),
+        LpaSpec("north_hertfordshire", "pa2.north-herts.gov.uk"),
+        LpaSpec("north_kestevan", "planningonline.n-kesteven.gov.uk"),
+        LpaSpec("north_lanark", "eplanning.northlanarkshire.gov.uk"),
+        LpaSpec("north_norfolk", "idoxpa.north-norfolk.gov.uk"),
+        LpaSpec("north_somerset", "planning.n-somerset.gov.uk"),
+        LpaSpec("north_tyneside", "idoxpublicaccess.northtyneside.gov.uk"),
+        LpaSpec("north_west_leicestershire", "plans.nwleics.gov.uk", start_path="/public-access/search.do"),
+        LpaSpec("northumberland", "publicaccess.northumberland.gov.uk"),
+        LpaSpec("nottingham", "publicaccess.nottinghamcity.gov.uk"),
+        LpaSpec("oadby_and_wigston", "pa.oadby-wigston.gov.uk"),
+        LpaSpec("oldham", "planningpa.oldham.gov.uk"),
+        LpaSpec("oxford", "public.oxford.gov.uk"),
+        LpaSpec("peterborough", "planpa.peterborough.gov.uk"),
+        LpaSpec("plymouth", "planning.plymouth.gov.uk"),
+        LpaSpec("poole", "boppa.poole.gov.uk"),
+        LpaSpec("portsmouth", "publicaccess.portsmouth.gov.uk"),
+        LpaSpec("powys", "pa.powys.gov.uk"),
+        LpaSpec("redditch", "publicaccess.bromsgroveandredditch.gov.uk"),
+        LpaSpec("reigate_and_banstead", "planning.reigate-banstead.gov.uk"),
+        LpaSpec("renfrewshire", "pl-bs.renfrewshire.gov.uk"),
+        LpaSpec("rhondda", "plan.rctcbc.gov.uk"),
+        LpaSpec("richmondshire", "planning.richmondshire.gov.uk"),
+        LpaSpec("rochdale", "publicaccess.rochdale.gov.uk"),
+        LpaSpec("rossendale", "publicaccess.rossendale.gov.uk"),
+        LpaSpec("rushcliffe", "planningon-line.rushcliffe.gov.uk"),
+        LpaSpec("rushmoor", "publicaccess.rushmoor.gov.uk"),
+        LpaSpec("rutland", "publicaccess.rutland.gov.uk"),
+        LpaSpec("sandwell", "webcaps.sandwell.gov.uk", start_path="/publicaccess"),
+        LpaSpec("scarborough", "planning.scarborough.gov.uk"),
+        LpaSpec("sefton", "pa.sefton.gov.uk"),
+        LpaSpec("selby", "public.selby.gov.uk"),
+        LpaSpec("sevenoaks", "pa.sevenoaks.gov.uk"),
+        LpaSpec("sheffield", "planningapps.sheffield.gov.uk"),
+        LpaSpec("shropshire", "pa.shropshire.gov.uk"),
+        LpaSpec("solihull", "publicaccess.solihull.gov.uk"),
+        LpaSpec("south_cambridgeshire", "applications.greatercambridgeplanning.org"),
+        LpaSpec("south_downs", "planningpublicaccess.southdowns.gov.uk"),
+        LpaSpec("south_gloucestershire", "developments.southglos.gov.uk"),
+        LpaSpec("south_kesteven", "prod.publicaccess.southkesteven.gov.uk"),
+        LpaSpec("south_lanarkshire", "publicaccess.southlanarkshire.gov.uk"),
+        LpaSpec("south_norfolk_broadland", "info.southnorfolkandbroadland.gov.uk"),
+        LpaSpec("south_ribble", "publicaccess.southribble.gov.uk"),
+        LpaSpec("south_somerset", "publicaccess.southsomerset.gov.uk"),
+        LpaSpec("south_staffordshire", "planning.sstaffs.gov.uk"),
+        LpaSpec("southampton", "planningpublicaccess.southampton.gov.uk"),
+        LpaSpec("southend", "publicaccess.southend.gov.uk"),
+        LpaSpec("southwark", "planning.southwark.gov.uk"),
+        LpaSpec("spelthorne", "publicaccess.spelthorne.gov.uk"),
+        LpaSpec("stafford", "www12.staffordbc.gov.uk"),
+        LpaSpec("stevenage", "publicaccess.stevenage.gov.uk"),
+        LpaSpec("stirling", "pabs.stirling.gov.uk"),
+        LpaSpec("stockport", "planning.stockport.gov.uk", start_path="/PlanningData-live"),
+        LpaSpec("stockton_on_tees", "www.developmentmanagement.stockton.gov.uk"),
+        LpaSpec("stoke_on_trent", "planning.stoke.gov.uk"),
+        LpaSpec("stroud", "publicaccess.stroud.gov.uk"),
+        LpaSpec("suffolk", "publicaccess.eastsuffolk.gov.uk"),
+        LpaSpec("sunderland", "online-applications.sunderland.gov.uk", start_path="/"),
+        LpaSpec("surrey_heath", "publicaccess.surreyheath.gov.uk"),
+        LpaSpec("sutton", "planningregister.sutton.gov.uk"),
+        LpaSpec("swale", "pa.midkent.gov.uk"),
+        LpaSpec("swansea", "property.swansea.gov.uk"),
+        LpaSpec("swindon", "pa.swindon.gov.uk", start_path="/publicaccess"),
+        LpaSpec("tameside", "publicaccess.tameside.gov.uk"),
+        LpaSpec("teignbridge", "publicaccess.teignbridge.gov.uk"),
+        LpaSpec("tendring", "idox.tendringdc.gov.uk"),
+        LpaSpec("test_valley", "view-applications.testvalley.gov.uk"),
+        LpaSpec("tewkesbury", "publicaccess.tewkesbury.gov.uk"),
+        LpaSpec("thanet", "planning.thanet.gov.uk"),
+        LpaSpec("three_rivers", "www3.threerivers.gov.uk"),
+        LpaSpec("thurrock", "regs.thurrock.gov.uk"),
+        LpaSpec("torbay", "publicaccess.torbay.gov.uk", start_path="/view"),
+        LpaSpec("torfaen", "planningonline.torfaen.gov.uk"),
+        LpaSpec("torridge", "publicaccess.torridge.gov.uk"),
+        LpaSpec("tower_hamlets", "development.towerhamlets.gov.uk"),
+        LpaSpec("tunbridge_wells", "twbcpa.midkent.gov.uk"),
+        LpaSpec("uttlesford", "publicaccess.uttlesford.gov.uk"),
+        LpaSpec("wakefield", "planning.wakefield.gov.uk"),
+        LpaSpec("warwick", "planningdocuments.warwickdc.gov.uk"),
+        LpaSpec("watford", "pa.watford.gov.uk", start_path="/publicaccess"),
+        LpaSpec("wellingborough", "publicaccess.wellingborough.gov.uk"),
+        LpaSpec("west_berkshire", "publicaccess.westberks.gov.uk"),
+        LpaSpec("west_lancashire", "pa.westlancs.gov.uk"),
+        LpaSpec("west_lothian", "planning.westlothian.gov.uk", start_path="/publicaccess"),
+        LpaSpec("west_oxfordshire", "publicaccess.westoxon.gov.uk"),
+        LpaSpec("west_somerset", "www1.somersetwestandtaunton.gov.uk"),
+        LpaSpec("west_suffolk", "planning.westsuffolk.gov.uk"),
+        LpaSpec("winchester", "planningapps.winchester.gov.uk"),
+        LpaSpec("windsor_and_maidenhead", "publicaccess.rbwm.gov.uk"),
+        LpaSpec("wolverhampton", "planningonline.wolverhampton.gov.uk"),
+        LpaSpec("wycombe", "publicaccess.wycombe.gov.uk", start_path="/idoxpa-web/search.do?action=advanced"),
+        LpaSpec("wyre_forest", "planningpa.wyreforestdc.gov.uk"),
+        LpaSpec("york", "planningaccess.york.gov.uk"),
+        *CUSTOM_LPAS,
+    ],
+    key=lambda spec: spec.name,
+)
+
+LPAS_BY_NAME: Dict[str, LpaSpec] = {spec.name: spec for spec in LPAS}
@@ -0,0 +1,331 @@
+"""
+Spooling: writing a crawl's items to compressed, append-only segment files on local disk instead of straight to
+Postgres, and bulk-loading them later with `run_spiders.py load`, so writing items doesn't hold up crawling, and loading
+can be run (and scaled) on its own. Spiders still read from Postgres while they crawl, e.g. their last run's stats and,
+for Idox, whether each search result is already saved.
+
+With SPOOL_ENABLED, SpoolPipeline takes the place of PostgresPipeline. Each spider writes the items PostgresPipeline
+would save as JSON lines to gzipped segments in SPOOL_DIR/<spider>/, named so they sort in the order they were written.
+A segment is written as `.part` and renamed once it holds SPOOL_SEGMENT_BYTES of items or the spider closes, so only
+whole segments are ever loaded.
+
+`load_spool` loads each spider's segments in order, and different spiders' segments in parallel. Each segment is loaded
+in one transaction: its lines are copied into a staging table with COPY, merged into the tables with one upsert per
+table, and the segment is recorded in spool_segments. Loading can be stopped and rerun at any point without loading a
+segment twice. A segment with a row the database rejects is loaded an item at a time instead, skipping the items it
+rejects, as PostgresPipeline does.
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import psycopg
+from scrapy import Spider
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+
+from planning_applications.db import (
+    claim_spool_segment,
+    copy_spooled_lines,
+    finish_spool_segment,
+    get_connection,
+    get_planning_application_uuid_for_lpa_and_reference,
+    merge_spooled_items,
+    upsert_planning_application,
+    upsert_planning_application_appeal,
+    upsert_planning_application_appeal_document,
+    upsert_planning_application_document,
+    upsert_planning_application_geometry,
+    upsert_planning_application_search_result,
+)
+from planning_applications.items import (
+    PlanningApplication,
+    PlanningApplicationAppeal,
+    PlanningApplicationAppealDocument,
+    PlanningApplicationDocument,
+    PlanningApplicationGeometry,
+    PlanningApplicationSearchResult,
+)
+from planning_applications.profiling import profiled_process_item
+from shared.timing import timed_process_item
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".jsonl.gz"
+PARTIAL_SUFFIX = ".part"
+
+# Most of the compression of level 9 in a fraction of the CPU
+COMPRESS_LEVEL = 6
+
+SPOOL_STAT = "spool"
+
+# The items PostgresPipeline saves, by the name they're spooled under
+ITEM_TYPES = {
+    item_type.__name__: item_type
+    for item_type in (
+        PlanningApplication,
+        PlanningApplicationSearchResult,
+        PlanningApplicationDocument,
+        PlanningApplicationGeometry,
+        PlanningApplicationAppeal,
+        PlanningApplicationAppealDocument,
+    )
+}
+SPOOLED_TYPES = tuple(ITEM_TYPES.values())
+
+
+def spool_line(item: SPOOLED_TYPES) -> str:
+    return f'{{"type":"{type(item).__name__}","item":{item.model_dump_json()}}}\n'
+
+
+def parse_spool_line(line: str) -> SPOOLED_TYPES:
+    data = json.loads(line)
+    return ITEM_TYPES[data["type"]].model_validate(data["item"])
+
+
+class SegmentWriter:
+    """Writes lines to gzipped segments in `directory`, starting a new segment after every `segment_bytes` of lines."""
+
+    def __init__(self, directory: Path, segment_bytes: int):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.sequence = 0
+        self.path: Optional[Path] = None
+        self.raw = None
+        self.file: Optional[gzip.GzipFile] = None
+        self.bytes_written = 0
+
+    def write(self, line: str) -> Optional[Path]:
+        """Write `line`, returning the segment it filled, if it filled one."""
+        if self.file is None:
+            self._open()
+
+        data = line.encode()
+        self.file.write(data)
+        self.bytes_written += len(data)
+        if self.bytes_written >= self.segment_bytes:
+            return self.seal()
+        return None
+
+    def seal(self) -> Optional[Path]:
+        """Finish the segment being written, if there is one, and give it its final name."""
+        if self.file is None:
+            return None
+
+        self.file.close()
+        self.raw.flush()
+        os.fsync(self.raw.fileno())
+        self.raw.close()
+        os.replace(self._partial_path(), self.path)
+
+        path = self.path
+        self.path = self.raw = self.file = None
+        self.bytes_written = 0
+        return path
+
+    def _open(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.sequence += 1
+        self.path = (
+            self.directory / f"{datetime.now():%Y%m%dT%H%M%S.%f}-{os.getpid()}-{self.sequence:05d}{SEGMENT_SUFFIX}"
+        )
+        self.raw = open(self._partial_path(), "wb")
+        self.file = gzip.GzipFile(fileobj=self.raw, mode="wb", compresslevel=COMPRESS_LEVEL, filename="", mtime=0)
+
+    def _partial_path(self) -> Path:
+        return self.path.with_name(self.path.name + PARTIAL_SUFFIX)
+
+
+class SpoolPipeline:
+    """
+    Writes the items PostgresPipeline would save to segments in SPOOL_DIR/<spider>/, if SPOOL_ENABLED is set. The items,
+    segments and compressed bytes written are counted under `spool/` in the run's stats.
+    """
+
+    def __init__(self, crawler: Crawler, directory: Path, segment_bytes: int):
+        self.crawler = crawler
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.writer: Optional[SegmentWriter] = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        if not crawler.settings.getbool("SPOOL_ENABLED"):
+            raise NotConfigured
+        return cls(crawler, Path(crawler.settings.get("SPOOL_DIR")), crawler.settings.getint("SPOOL_SEGMENT_BYTES"))
+
+    def open_spider(self, spider: Spider):
+        self.writer = SegmentWriter(self.directory / spider.name, self.segment_bytes)
+
+    @timed_process_item
+    @profiled_process_item
+    def process_item(self, item, spider: Spider):
+        if isinstance(item, SPOOLED_TYPES):
+            self._sealed(self.writer.write(spool_line(item)))
+            self.crawler.stats.inc_value(f"{SPOOL_STAT}/items")
+        return item
+
+    def close_spider(self, spider: Spider):
+        self._sealed(self.writer.seal())
+
+    def _sealed(self, path: Optional[Path]):
+        if path is None:
+            return
+        logger.info(f"Spooled {path}")
+        self.crawler.stats.inc_value(f"{SPOOL_STAT}/segments")
+        self.crawler.stats.inc_value(f"{SPOOL_STAT}/bytes", path.stat().st_size)
+
+
+# Loading
+# -------------------------------------------------------------------------------------------------
+
+
+class SegmentLoad(NamedTuple):
+    name: str
+    items: int
+    # Rows inserted or updated, by table
+    rows: Dict[str, int]
+    # Items the database rejected, when the segment had to be loaded an item at a time
+    rejected: int
+    already_loaded: bool
+    seconds: float
+
+
+def sealed_segments(spool_dir: Path) -> Dict[str, List[Path]]:
+    """Each spider's whole segments in `spool_dir`, in the order they were written."""
+    segments = {}
+    if not spool_dir.is_dir():
+        return segments
+
+    for directory in sorted(path for path in spool_dir.iterdir() if path.is_dir()):
+        paths = sorted(directory.glob(f"*{SEGMENT_SUFFIX}"))
+        if paths:
+            segments[directory.name] = paths
+    return segments
+
+
+def read_segment(path: Path) -> List[str]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def write_item(cursor, item: SPOOLED_TYPES) -> List[str]:
+    """Save `item` as PostgresPipeline does, returning the tables of the rows written."""
+    if isinstance(item, PlanningApplication):
+        uuid, _ = upsert_planning_application(cursor, item)
+        for document in item.documents or []:
+            upsert_planning_application_document(cursor, uuid, document)
+        if item.geometry:
+            upsert_planning_application_geometry(cursor, uuid, item.geometry)
+        return (
+            ["planning_applications"]
+            + ["planning_application_documents"] * len(item.documents or [])
+            + ["planning_application_geometries"] * bool(item.geometry)
+        )
+
+    if isinstance(item, PlanningApplicationSearchResult):
+        upsert_planning_application_search_result(cursor, item)
+        return ["planning_applications (search results)"]
+
+    if isinstance(item, (PlanningApplicationDocument, PlanningApplicationGeometry)):
+        uuid = get_planning_application_uuid_for_lpa_and_reference(cursor, item.lpa, item.application_reference)
+        if not uuid:
+            return []
+        if isinstance(item, PlanningApplicationDocument):
+            upsert_planning_application_document(cursor, uuid, item)
+            return ["planning_application_documents"]
+        upsert_planning_application_geometry(cursor, uuid, item)
+        return ["planning_application_geometries"]
+
+    if isinstance(item, PlanningApplicationAppeal):
+        upsert_planning_application_appeal(cursor, item)
+        return ["planning_application_appeals"]
+
+    upsert_planning_application_appeal_document(cursor, item)
+    return ["planning_application_appeals_documents"]
+
+
+def load_segment(connection, name: str, lines: List[str]) -> SegmentLoad:
+    """
+    Load the `lines` of segment `name` in one transaction on `connection`, which is in autocommit mode, unless it's
+    already been loaded.
+    """
+    started = time.perf_counter()
+    try:
+        with connection.transaction(), connection.cursor() as cursor:
+            if not claim_spool_segment(cursor, name):
+                return SegmentLoad(name, len(lines), {}, 0, True, time.perf_counter() - started)
+
+            copy_spooled_lines(cursor, lines)
+            rows = merge_spooled_items(cursor)
+            finish_spool_segment(cursor, name, len(lines), sum(rows.values()))
+        return SegmentLoad(name, len(lines), rows, 0, False, time.perf_counter() - started)
+    except (psycopg.IntegrityError, psycopg.DataError) as e:
+        logger.warning(f"The database rejected a row of {name}, loading it an item at a time: {e}")
+
+    rows = Counter()
+    rejected = 0
+    with connection.transaction(), connection.cursor() as cursor:
+        if not claim_spool_segment(cursor, name):
+            return SegmentLoad(name, len(lines), {}, 0, True, time.perf_counter() - started)
+
+        for line in lines:
+            item = parse_spool_line(line)
+            try:
+                # A savepoint, so a rejected item doesn't roll back the rest
+                with connection.transaction():
+                    rows.update(write_item(cursor, item))
+            except (psycopg.IntegrityError, psycopg.DataError) as e:
+                rejected += 1
+                logger.error(f"Skipping {type(item).__name__} in {name}, which the database rejected: {e}")
+
+        finish_spool_segment(cursor, name, len(lines), sum(rows.values()))
+    return SegmentLoad(name, len(lines), dict(rows), rejected, False, time.perf_counter() - started)
+
+
+def load_spider_segments(spool_dir: str, paths: List[str], keep: bool) -> List[SegmentLoad]:
+    """Load one spider's segments in the order they were written, deleting each once it's loaded unless `keep`."""
+    connection = get_connection()
+    connection.autocommit = True
+    loads = []
+    try:
+        for path in map(Path, paths):
+            loads.append(load_segment(connection, path.relative_to(spool_dir).as_posix(), read_segment(path)))
+            if not keep:
+                path.unlink()
+    finally:
+        connection.close()
+    return loads
+
+
+def load_spool(spool_dir: Path, workers: int, keep: bool = False) -> Tuple[List[SegmentLoad], Dict[str, Exception]]:
+    """
+    Load every whole segment in `spool_dir` into Postgres, with up to `workers` spiders' segments loading at once.
+    Returns the segments loaded, and the error that stopped each spider whose segments couldn't all be loaded.
+    """
+    segments = sealed_segments(spool_dir)
+    loads: List[SegmentLoad] = []
+    errors: Dict[str, Exception] = {}
+    if not segments:
+        return loads, errors
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(segments))) as executor:
+        # The spiders with the most to load start first, so they aren't left loading on their own at the end
+        futures = {
+            executor.submit(load_spider_segments, str(spool_dir), [str(path) for path in paths], keep): spider
+            for spider, paths in sorted(segments.items(), key=lambda item: -len(item[1]))
+        }
+        for future in as_completed(futures):
+            try:
+                loads.extend(future.result())
+            except Exception as e:
+                errors[futures[future]] = e
+    return loads, errors
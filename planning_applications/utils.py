@@ -2,11 +2,13 @@ import os
 import subprocess
 import tempfile
 from datetime import date, datetime
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
-import scrapy.http.response
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import scrapy.http.response
+
 load_dotenv()
 
 
@@ -31,12 +33,12 @@ def to_datetime_or_none(value: Optional[str | datetime | date]) -> Optional[date
     return datetime.fromisoformat(value)
 
 
-def open_in_browser(response: scrapy.http.response.Response):
+def open_in_browser(response: "scrapy.http.response.Response"):
     with tempfile.NamedTemporaryFile(suffix=".html", delete=False) as temp:
         temp.write(response.text.encode("utf-8"))
         temp.seek(0)
         subprocess.run(["open", temp.name])
 
 
-def multiline_css(response: scrapy.http.response.Response, selector: str, join_with: str = "\n") -> str | None:
+def multiline_css(response: "scrapy.http.response.Response", selector: str, join_with: str = "\n") -> str | None:
     return join_with.join(response.css(selector).getall()) or None
@@ -1,45 +1,37 @@
 import argparse
-import os
+import resource
+import time
+from collections import deque
 from datetime import date, datetime
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from dateutil import relativedelta
 from rich import print
 from rich.console import Console
 from rich.table import Table
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
 
-from planning_applications.db import get_earliest_date_for_lpa
-from planning_applications.settings import DEFAULT_DATE_FORMAT
+from planning_applications.settings import (
+    DEFAULT_DATE_FORMAT,
+    DEFAULT_FRONTIER_MAX_MISSES,
+    DEFAULT_SESSIONS,
+    SPOOL_DIR,
+)
+from planning_applications.spiders.registry import LPAS
+
+# Scrapy, the spiders and the database are imported by the functions that need them, so `--help` and argument errors
+# don't wait for them
 
 
 def get_spider_names(skip_not_working: bool = False) -> List[str]:
     spider_names = []
-    spiders_dir = "planning_applications/spiders/lpas"
-
-    # Skip __init__.py and get all .py files
-    for file in os.listdir(spiders_dir):
-        if file.endswith(".py") and file != "__init__.py":
-            spider_name = file[:-3]  # Remove .py extension
-            if skip_not_working:
-                module = __import__(f"planning_applications.spiders.lpas.{spider_name}", fromlist=["*"])
-                spider_class = next(
-                    (
-                        cls
-                        for name, cls in module.__dict__.items()
-                        if isinstance(cls, type)
-                        and name.endswith("Spider")
-                        and getattr(cls, "name", None) == spider_name
-                    ),
-                    None,
-                )
-                if spider_class and getattr(spider_class, "not_yet_working", False):
-                    print(f"[green]Skipping spider {spider_name} because it is not yet working[/green]")
-                    continue
-            spider_names.append(spider_name)
-
-    return sorted(spider_names)
+
+    for spec in LPAS:
+        if skip_not_working and spec.not_yet_working:
+            print(f"[green]Skipping spider {spec.name} because it is not yet working[/green]")
+            continue
+        spider_names.append(spec.name)
+
+    return spider_names
 
 
 def parse_date(date_str: str) -> date:
@@ -72,8 +64,15 @@ def parse_lpa_dates(lpa_dates: List[str]) -> List[Tuple[str, date, date]]:
 
 
 def get_spider_info(
-    name: str, from_earliest: bool = False, lpa_dates: Optional[List[Tuple[str, date, date]]] = None
+    name: str,
+    from_earliest: bool = False,
+    lpa_dates: Optional[List[Tuple[str, date, date]]] = None,
+    earliest_dates: Optional[Dict[str, date]] = None,
 ) -> Tuple[str, str, str | None, str, str] | None:
+    """
+    `earliest_dates` is the result of `get_earliest_dates_by_lpa`, which only needs to be fetched once for all
+    spiders. It's fetched for just this spider if it isn't passed.
+    """
     earliest_date = None
     start = None
     end = None
@@ -88,8 +87,13 @@ def get_spider_info(
             return None
 
     elif from_earliest:
+        if earliest_dates is None:
+            from planning_applications.db import get_earliest_dates_by_lpa
+
+            earliest_dates = get_earliest_dates_by_lpa()
+
         mode = "From Earliest"
-        earliest_date = get_earliest_date_for_lpa(name)
+        earliest_date = earliest_dates.get(name)
         if earliest_date:
             start = min(
                 earliest_date + relativedelta.relativedelta(months=1),
@@ -114,16 +118,200 @@ def get_spider_info(
     return name, mode, earliest_date_str, start_str, end_str
 
 
+def order_by_expected_runtime(spider_names: List[str], elapsed_times: Dict[str, float]) -> List[str]:
+    """
+    Order spiders longest first by how long their last run took, so the slow councils aren't left running on their
+    own at the end of a bounded run. Spiders that have never run come first, as they could take any time.
+    """
+    return sorted(spider_names, key=lambda name: -elapsed_times.get(name, float("inf")))
+
+
+def get_elapsed_times(process, spider_names: List[str]) -> Dict[str, float]:
+    """How long each spider's last run took, in seconds, from scraper_runs."""
+    from shared.db import get_connection, get_cursor, select_scraper_run_elapsed_times
+
+    connection = get_connection()
+    cursor = get_cursor(connection)
+    elapsed_by_run_name = select_scraper_run_elapsed_times(cursor)
+    cursor.close()
+    connection.close()
+
+    elapsed_times = {}
+    for name in spider_names:
+        spider_class = process.spider_loader.load(name)
+        run_name = f"{spider_class.__module__}.{spider_class.__name__}"
+        if run_name in elapsed_by_run_name:
+            elapsed_times[name] = elapsed_by_run_name[run_name]
+    return elapsed_times
+
+
+def crawl_with_limit(process, crawls: List[Tuple[str, Dict[str, str]]], max_concurrent_spiders: int) -> List:
+    """
+    Keep at most `max_concurrent_spiders` of `crawls` running, starting the next one in order each time one finishes.
+    Returns the list of crawlers, which grows as the crawls start.
+    """
+    queue = deque(crawls)
+    crawlers = []
+
+    def crawl_next(result=None):
+        if queue:
+            spider_name, spider_kwargs = queue.popleft()
+            crawler = process.create_crawler(spider_name)
+            crawlers.append(crawler)
+            d = process.crawl(crawler, **spider_kwargs)
+            d.addErrback(lambda failure: print(f"[red]Spider {spider_name} failed: {failure.value}[/red]"))
+            d.addBoth(crawl_next)
+
+    for _ in range(min(max_concurrent_spiders, len(queue))):
+        crawl_next()
+
+    return crawlers
+
+
+def print_freshness(crawlers: List) -> None:
+    """Print how long after validation each council's new applications reached the database."""
+    table = Table(title="Freshness")
+    table.add_column("Spider", style="cyan")
+    table.add_column("New Applications", justify="right")
+    table.add_column("Median Days Since Validation", justify="right")
+    table.add_column("Max Days Since Validation", justify="right")
+
+    for crawler in sorted(crawlers, key=lambda c: c.spidercls.name):
+        stats = crawler.stats.get_stats() if crawler.stats else {}
+        if not stats.get("freshness/new_applications"):
+            continue
+        table.add_row(
+            crawler.spidercls.name,
+            str(stats["freshness/new_applications"]),
+            str(stats.get("freshness/lag_days_p50")),
+            str(stats.get("freshness/lag_days_max")),
+        )
+
+    Console().print(table)
+
+
+def per_hour(items: Optional[int], elapsed_seconds: Optional[float]) -> Optional[float]:
+    if not items or not elapsed_seconds:
+        return None
+    return items / elapsed_seconds * 3600
+
+
+def summarise_run_trends(rows: List[Dict]) -> List[Dict]:
+    """
+    Throughput and cost per item for each spider from `select_scraper_run_trends`, with the change in items per hour
+    from the window before.
+    """
+    summaries = []
+    for row in rows:
+        if not row["runs"]:
+            continue
+
+        items = row["items"] or 0
+        items_per_hour = per_hour(items, row["elapsed_seconds"])
+        previous_items_per_hour = per_hour(row["previous_items"], row["previous_elapsed_seconds"])
+        change = None
+        if items_per_hour is not None and previous_items_per_hour:
+            change = items_per_hour / previous_items_per_hour - 1
+
+        summaries.append(
+            {
+                "spider_name": row["spider_name"],
+                "runs": row["runs"],
+                "items": items,
+                "items_per_hour": items_per_hour,
+                "items_per_hour_change": change,
+                "p95_elapsed_seconds": row["p95_elapsed_seconds"],
+                "requests_per_item": row["requests"] / items if items else None,
+                "kb_per_item": row["response_bytes"] / 1024 / items if items else None,
+                "errors": row["errors"] or 0,
+            }
+        )
+    return summaries
+
+
+def format_or_dash(value: Optional[float], spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def print_run_trends(days: int, spider_name: Optional[str] = None) -> None:
+    """Print each spider's throughput and cost per item over the last `days` days, from scraper_run_history."""
+    from shared.db import get_connection, get_cursor, select_scraper_run_trends
+
+    connection = get_connection()
+    cursor = get_cursor(connection)
+    rows = select_scraper_run_trends(cursor, days, spider_name)
+    cursor.close()
+    connection.close()
+
+    table = Table(title=f"Runs in the Last {days} Days")
+    table.add_column("Spider", style="cyan")
+    table.add_column("Runs", justify="right")
+    table.add_column("Items", justify="right")
+    table.add_column("Items/Hour", justify="right")
+    table.add_column(f"Change on Previous {days} Days", justify="right")
+    table.add_column("p95 Run Time (s)", justify="right")
+    table.add_column("Requests/Item", justify="right")
+    table.add_column("KB/Item", justify="right")
+    table.add_column("Errors", justify="right")
+
+    for summary in summarise_run_trends(rows):
+        table.add_row(
+            summary["spider_name"],
+            str(summary["runs"]),
+            str(summary["items"]),
+            format_or_dash(summary["items_per_hour"], ".0f"),
+            format_or_dash(summary["items_per_hour_change"], "+.0%"),
+            format_or_dash(summary["p95_elapsed_seconds"], ".0f"),
+            format_or_dash(summary["requests_per_item"], ".1f"),
+            format_or_dash(summary["kb_per_item"], ".0f"),
+            str(summary["errors"]),
+        )
+
+    Console().print(table)
+
+
 def run_spiders(
-    spider_names: List[str], from_earliest: bool = False, lpa_dates: Optional[List[Tuple[str, date, date]]] = None
+    spider_names: List[str],
+    from_earliest: bool = False,
+    lpa_dates: Optional[List[Tuple[str, date, date]]] = None,
+    max_concurrent_spiders: Optional[int] = None,
+    request_budget: Optional[int] = None,
+    log_profile: Optional[str] = None,
+    metrics_port: Optional[int] = None,
+    profile: Optional[str] = None,
+    spool: bool = False,
 ) -> None:
-    """Run multiple spiders using CrawlerProcess."""
+    """
+    Run multiple spiders using CrawlerProcess. With `max_concurrent_spiders`, only that many run at once, longest
+    expected runtime first. Otherwise they all run at once. `request_budget` caps the requests of all of them together.
+    `log_profile`, `metrics_port` and `profile` override LOG_PROFILE, METRICS_PORT and PROFILE, and `spool` sets
+    SPOOL_ENABLED.
+    """
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
     settings = get_project_settings()
+    if request_budget:
+        settings["REQUEST_BUDGET"] = request_budget
+    if log_profile:
+        settings["LOG_PROFILE"] = log_profile
+    if metrics_port:
+        settings["METRICS_PORT"] = metrics_port
+    if profile:
+        settings["PROFILE"] = profile
+    if spool:
+        settings["SPOOL_ENABLED"] = True
     process = CrawlerProcess(settings)
 
+    earliest_dates = None
+    if from_earliest and not lpa_dates:
+        from planning_applications.db import get_earliest_dates_by_lpa
+
+        earliest_dates = get_earliest_dates_by_lpa()
+
     spider_info = []
     for spider_name in spider_names:
-        row = get_spider_info(spider_name, from_earliest, lpa_dates)
+        row = get_spider_info(spider_name, from_earliest, lpa_dates, earliest_dates)
         if row:
             spider_info.append(row)
 
@@ -138,26 +326,111 @@ def run_spiders(
     console = Console()
     console.print(table)
 
-    for spider_name, mode, earliest_date, start, end in spider_info:
-        spider_kwargs = {}
-        spider_kwargs["start_date"], spider_kwargs["end_date"] = start, end
-        process.crawl(spider_name, **spider_kwargs)
+    crawls = {name: {"start_date": start, "end_date": end} for name, _, _, start, end in spider_info}
+
+    if max_concurrent_spiders:
+        elapsed_times = get_elapsed_times(process, list(crawls))
+        ordered = order_by_expected_runtime(list(crawls), elapsed_times)
+        crawlers = crawl_with_limit(process, [(name, crawls[name]) for name in ordered], max_concurrent_spiders)
+    else:
+        crawlers = []
+        for spider_name, spider_kwargs in crawls.items():
+            crawler = process.create_crawler(spider_name)
+            crawlers.append(crawler)
+            process.crawl(crawler, **spider_kwargs)
+
+    started_at = time.monotonic()
     process.start()
+    elapsed = time.monotonic() - started_at
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print_freshness(crawlers)
+    print(f"[green]Ran {len(crawls)} spiders in {elapsed:.0f}s, peak RSS {peak_rss_mb:.0f} MB[/green]")
 
 
 def run_appeals(
-    from_date: date,
-    to_date: date,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
     metadata_only: bool = False,
+    sessions: int = DEFAULT_SESSIONS,
+    frontier: bool = False,
+    frontier_max_misses: int = DEFAULT_FRONTIER_MAX_MISSES,
+    revisit: bool = False,
+    log_profile: Optional[str] = None,
+    metrics_port: Optional[int] = None,
+    profile: Optional[str] = None,
+    spool: bool = False,
 ) -> None:
-    """Run the planning appeals spider with the given dates."""
+    """
+    Run the planning appeals spider with the given dates, from the case ID frontier, or over the open appeals.
+    `log_profile`, `metrics_port` and `profile` override LOG_PROFILE, METRICS_PORT and PROFILE, and `spool` sets
+    SPOOL_ENABLED.
+    """
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
     settings = get_project_settings()
     settings["DOWNLOAD_FILES"] = not metadata_only
+    if log_profile:
+        settings["LOG_PROFILE"] = log_profile
+    if metrics_port:
+        settings["METRICS_PORT"] = metrics_port
+    if profile:
+        settings["PROFILE"] = profile
+    if spool:
+        settings["SPOOL_ENABLED"] = True
     process = CrawlerProcess(settings)
-    process.crawl("appeals", start_date=from_date, end_date=to_date)
+    if frontier:
+        process.crawl("appeals", frontier=True, frontier_max_misses=frontier_max_misses)
+    elif revisit:
+        process.crawl("appeals", revisit=True)
+    else:
+        process.crawl("appeals", start_date=from_date, end_date=to_date, sessions=sessions)
     process.start()
 
 
+def load_spool(spool_dir: str, workers: int, keep_segments: bool = False) -> bool:
+    """
+    Load the segments spooled to `spool_dir` into Postgres, with up to `workers` spiders' segments loading at once, and
+    print the rows loaded. Returns whether every segment was loaded.
+    """
+    from pathlib import Path
+
+    from planning_applications import spool
+
+    started_at = time.monotonic()
+    loads, errors = spool.load_spool(Path(spool_dir), workers, keep_segments)
+    elapsed = time.monotonic() - started_at
+
+    table = Table(title="Spool Loaded")
+    table.add_column("Segment", style="cyan")
+    table.add_column("Items", justify="right")
+    table.add_column("Rows", justify="right")
+    table.add_column("Rejected", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Rows/s", justify="right")
+    for load in sorted(loads, key=lambda load: load.name):
+        rows = sum(load.rows.values())
+        table.add_row(
+            load.name,
+            str(load.items),
+            "already loaded" if load.already_loaded else str(rows),
+            str(load.rejected),
+            f"{load.seconds:.1f}",
+            format_or_dash(rows / load.seconds if load.seconds and not load.already_loaded else None, ".0f"),
+        )
+    Console().print(table)
+
+    total_rows = sum(sum(load.rows.values()) for load in loads)
+    print(
+        f"[green]Loaded {len(loads)} segments, {total_rows} rows in {elapsed:.1f}s ({total_rows / elapsed:.0f}/s)[/green]"
+    )
+    for spider_name, error in errors.items():
+        print(f"[red]Error loading {spider_name}'s segments: {error}[/red]")
+    return not errors
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run planning application spiders")
     subparsers = parser.add_subparsers(help="sub-command help", dest="command")
@@ -169,20 +442,40 @@ def main():
     appeals_parser.add_argument(
         "--from-date",
         type=date.fromisoformat,
-        required=True,
-        help="Start date, inclusive (YYYY-MM-DD)",
+        help="Start date, inclusive (YYYY-MM-DD). Required unless --frontier is given",
     )
     appeals_parser.add_argument(
         "--to-date",
         type=date.fromisoformat,
-        required=True,
-        help="End date, inclusive (YYYY-MM-DD)",
+        help="End date, inclusive (YYYY-MM-DD). Required unless --frontier is given",
     )
     appeals_parser.add_argument(
         "--metadata-only",
         action="store_true",
         help="Do not download files to S3, just scrape the metadata",
     )
+    appeals_parser.add_argument(
+        "--sessions",
+        type=int,
+        default=DEFAULT_SESSIONS,
+        help="Number of search sessions to split the days across (default %(default)s)",
+    )
+    appeals_parser.add_argument(
+        "--frontier",
+        action="store_true",
+        help="Find new appeals by probing case IDs past the highest one in the database, instead of by date",
+    )
+    appeals_parser.add_argument(
+        "--frontier-max-misses",
+        type=int,
+        default=DEFAULT_FRONTIER_MAX_MISSES,
+        help="Stop after this many missing case IDs past the highest found (default %(default)s)",
+    )
+    appeals_parser.add_argument(
+        "--revisit",
+        action="store_true",
+        help="Re-scrape the appeals in the database that haven't been decided yet, soonest deadlines first",
+    )
 
     lpas_parser = subparsers.add_parser(
         "lpas",
@@ -206,24 +499,135 @@ def main():
         nargs="+",
         help="List of LPA,start_date,end_date (e.g., 'cambridge,2024-01-01,2024-02-01')",
     )
+    lpas_parser.add_argument(
+        "--max-concurrent-spiders",
+        type=int,
+        help="Run at most this many spiders at once, starting the ones that took longest last time first",
+    )
+    lpas_parser.add_argument(
+        "--request-budget",
+        type=int,
+        help="Stop after this many requests across all spiders, keeping the last part of it for recent windows",
+    )
     lpas_parser.add_argument(
         "--lpas-from-earliest",
         nargs="+",
         help="List of LPA names to run from their earliest dates (e.g., 'cambridge barnet')",
     )
+    stats_parser = subparsers.add_parser(
+        "stats",
+        description="Throughput and cost per item of each spider's recent runs, from scraper_run_history",
+    )
+    stats_parser.add_argument(
+        "--days",
+        type=int,
+        default=30,
+        help="Summarise the runs that finished in the last DAYS days, against the DAYS days before (default %(default)s)",
+    )
+    stats_parser.add_argument(
+        "--spider",
+        help="Only summarise this spider's runs (e.g. 'cambridge')",
+    )
+
+    load_parser = subparsers.add_parser(
+        "load",
+        description="Load the items spooled by runs with --spool into Postgres",
+    )
+    load_parser.add_argument(
+        "--spool-dir",
+        default=SPOOL_DIR,
+        help="The directory the items were spooled to (default %(default)s)",
+    )
+    load_parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Load this many spiders' segments at once (default %(default)s)",
+    )
+    load_parser.add_argument(
+        "--keep-segments",
+        action="store_true",
+        help="Keep the segments after loading them, instead of deleting them",
+    )
+
+    for subparser in (appeals_parser, lpas_parser):
+        subparser.add_argument(
+            "--log-profile",
+            choices=["debug", "production"],
+            help="Log everything (debug), or only progress and problems, with repeated lines sampled (production)",
+        )
+        subparser.add_argument(
+            "--metrics-port",
+            type=int,
+            help="Serve live metrics for Prometheus at http://127.0.0.1:PORT/metrics while the spiders run",
+        )
+        subparser.add_argument(
+            "--profile",
+            choices=["cpu", "mem"],
+            help="Profile each spider's callbacks and pipelines with cProfile (cpu) or tracemalloc (mem), to output/",
+        )
+        subparser.add_argument(
+            "--spool",
+            action="store_true",
+            help="Write the items to segments in output/spool instead of Postgres, to load later with `load`",
+        )
     args = parser.parse_args()
 
     if args.command == "appeals":
         appeals_args = vars(args)
         del appeals_args["command"]
+
+        by_case = appeals_args["frontier"] or appeals_args["revisit"]
+
+        if appeals_args["sessions"] < 1:
+            appeals_parser.error("--sessions must be at least 1")
+
+        if appeals_args["frontier_max_misses"] < 1:
+            appeals_parser.error("--frontier-max-misses must be at least 1")
+
+        if appeals_args["frontier"] and appeals_args["revisit"]:
+            appeals_parser.error("--frontier and --revisit can't be used together")
+
+        if by_case and (appeals_args["from_date"] or appeals_args["to_date"]):
+            appeals_parser.error("--from-date and --to-date can't be used with --frontier or --revisit")
+
+        if not by_case and not (appeals_args["from_date"] and appeals_args["to_date"]):
+            appeals_parser.error("--from-date and --to-date are required unless --frontier or --revisit is given")
+
         run_appeals(
             from_date=appeals_args["from_date"],
             to_date=appeals_args["to_date"],
             metadata_only=appeals_args.get("metadata_only", False),
+            sessions=appeals_args["sessions"],
+            frontier=appeals_args["frontier"],
+            frontier_max_misses=appeals_args["frontier_max_misses"],
+            revisit=appeals_args["revisit"],
+            log_profile=appeals_args["log_profile"],
+            metrics_port=appeals_args["metrics_port"],
+            profile=appeals_args["profile"],
+            spool=appeals_args["spool"],
         )
         return
 
+    if args.command == "stats":
+        if args.days < 1:
+            stats_parser.error("--days must be at least 1")
+
+        print_run_trends(args.days, args.spider)
+        return
+
+    if args.command == "load":
+        if args.workers < 1:
+            load_parser.error("--workers must be at least 1")
+
+        if not load_spool(args.spool_dir, args.workers, args.keep_segments):
+            raise SystemExit(1)
+        return
+
     if args.command == "lpas":
+        if args.max_concurrent_spiders is not None and args.max_concurrent_spiders < 1:
+            lpas_parser.error("--max-concurrent-spiders must be at least 1")
+
         all_spider_names = get_spider_names(skip_not_working=args.all)
 
         if args.lpas_from_earliest:
@@ -231,12 +635,39 @@ def main():
             if invalid_lpas:
                 print(f"[red]Error: Invalid LPA names: {', '.join(invalid_lpas)}[/red]")
                 return
-            run_spiders(args.lpas_from_earliest, from_earliest=True)
+            run_spiders(
+                args.lpas_from_earliest,
+                from_earliest=True,
+                max_concurrent_spiders=args.max_concurrent_spiders,
+                request_budget=args.request_budget,
+                log_profile=args.log_profile,
+                metrics_port=args.metrics_port,
+                profile=args.profile,
+                spool=args.spool,
+            )
         elif args.lpa_dates:
             lpa_dates = parse_lpa_dates(args.lpa_dates)
-            run_spiders(all_spider_names, lpa_dates=lpa_dates)
+            run_spiders(
+                all_spider_names,
+                lpa_dates=lpa_dates,
+                max_concurrent_spiders=args.max_concurrent_spiders,
+                request_budget=args.request_budget,
+                log_profile=args.log_profile,
+                metrics_port=args.metrics_port,
+                profile=args.profile,
+                spool=args.spool,
+            )
         else:
-            run_spiders(all_spider_names, from_earliest=args.from_earliest)
+            run_spiders(
+                all_spider_names,
+                from_earliest=args.from_earliest,
+                max_concurrent_spiders=args.max_concurrent_spiders,
+                request_budget=args.request_budget,
+                log_profile=args.log_profile,
+                metrics_port=args.metrics_port,
+                profile=args.profile,
+                spool=args.spool,
+            )
         return
 
     raise ValueError(f"Invalid command {args.command}")
@@ -1,14 +1,13 @@
 import json
+from datetime import datetime, timedelta, timezone
 
 import psycopg
 
 from planning_applications.utils import getenv, to_datetime_or_none
 
-database_url = getenv("DATABASE_URL")
-
 
 def get_connection():
-    return psycopg.connect(database_url)
+    return psycopg.connect(getenv("DATABASE_URL"))
 
 
 def get_cursor(connection):
@@ -40,3 +39,109 @@ def upsert_scraper_run(cursor: psycopg.Cursor, name: str, stats: dict):
     row = cursor.rowcount
     if row != 1:
         raise ValueError(f"Expected 1 row to be updated, but got {row}")
+
+
+def scraper_run_history_row(name: str, spider_name: str, stats: dict) -> tuple:
+    """The scraper_run_history columns for a run, from its crawl stats."""
+    return (
+        name,
+        spider_name,
+        to_datetime_or_none(stats.get("start_time")),
+        to_datetime_or_none(stats.get("finish_time")) or datetime.now(timezone.utc),
+        stats.get("elapsed_time_seconds"),
+        stats.get("finish_reason"),
+        stats.get("downloader/request_count", 0),
+        stats.get("downloader/response_bytes", 0),
+        stats.get("item_scraped_count", 0),
+        stats.get("log_count/ERROR", 0),
+        stats.get("retry/count", 0),
+        json.dumps(stats, default=str),
+    )
+
+
+def insert_scraper_run_history(cursor: psycopg.Cursor, name: str, spider_name: str, stats: dict):
+    cursor.execute(
+        """ INSERT INTO scraper_run_history (
+                name,
+                spider_name,
+                started_at,
+                finished_at,
+                elapsed_seconds,
+                finish_reason,
+                requests,
+                response_bytes,
+                items,
+                errors,
+                retries,
+                stats
+            ) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            """,
+        scraper_run_history_row(name, spider_name, stats),
+    )
+
+
+def select_scraper_run_trends(cursor: psycopg.Cursor, days: int, spider_name: str | None = None) -> list[dict]:
+    """
+    Each spider's runs that finished in the last `days` days, totalled, with the p95 run time and the items and
+    elapsed seconds of the `days` days before them to compare against. Both windows come from one range scan of
+    `finished_at`.
+    """
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    previous_since = since - timedelta(days=days)
+
+    spider_filter = "AND spider_name = %(spider_name)s" if spider_name else ""
+
+    cursor.execute(
+        f"""
+        SELECT
+            spider_name,
+            count(*) FILTER (WHERE finished_at >= %(since)s),
+            (sum(items) FILTER (WHERE finished_at >= %(since)s))::bigint,
+            sum(elapsed_seconds) FILTER (WHERE finished_at >= %(since)s),
+            percentile_cont(0.95) WITHIN GROUP (ORDER BY elapsed_seconds) FILTER (WHERE finished_at >= %(since)s),
+            (sum(requests) FILTER (WHERE finished_at >= %(since)s))::bigint,
+            (sum(response_bytes) FILTER (WHERE finished_at >= %(since)s))::bigint,
+            (sum(errors) FILTER (WHERE finished_at >= %(since)s))::bigint,
+            (sum(items) FILTER (WHERE finished_at < %(since)s))::bigint,
+            sum(elapsed_seconds) FILTER (WHERE finished_at < %(since)s)
+        FROM scraper_run_history
+        WHERE finished_at >= %(previous_since)s
+            {spider_filter}
+        GROUP BY spider_name
+        ORDER BY spider_name
+        """,
+        {"since": since, "previous_since": previous_since, "spider_name": spider_name},
+    )
+
+    columns = (
+        "spider_name",
+        "runs",
+        "items",
+        "elapsed_seconds",
+        "p95_elapsed_seconds",
+        "requests",
+        "response_bytes",
+        "errors",
+        "previous_items",
+        "previous_elapsed_seconds",
+    )
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def select_scraper_run_elapsed_times(cursor: psycopg.Cursor) -> dict[str, float]:
+    """How long each scraper's last run took, in seconds, keyed by scraper_runs name."""
+    cursor.execute(
+        """
+        SELECT name, (last_run_stats->>'elapsed_time_seconds')::float FROM scraper_runs
+        WHERE last_run_stats ? 'elapsed_time_seconds'
+        """
+    )
+    return {name: elapsed for name, elapsed in cursor.fetchall()}
+
+
+def select_scraper_run_stats(cursor: psycopg.Cursor, name: str) -> dict | None:
+    cursor.execute("SELECT last_run_stats FROM scraper_runs WHERE name = %s", (name,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    return row[0]
@@ -0,0 +1,46 @@
+import logging
+import time
+from collections import Counter
+from typing import Callable, Dict, Tuple
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate limits log records below WARNING from each function. The first `burst` records from a function in each
+    `interval` seconds are let through, then one in `rate`. The first record let through in the next interval says how
+    many were dropped.
+
+    Records are only formatted when they're emitted, so a dropped record logged with %-style arguments costs little.
+    """
+
+    def __init__(self, burst: int, interval: float, rate: int, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.rate = max(1, rate)
+        self.clock = clock
+        # (logger name, function name) -> (start of its interval, records in it, records dropped in it)
+        self.windows: Dict[Tuple[str, str], Tuple[float, int, int]] = {}
+        self.dropped: Counter[str] = Counter()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.funcName)
+        now = self.clock()
+        started, count, dropped = self.windows.get(key, (now, 0, 0))
+
+        if now - started >= self.interval:
+            if dropped:
+                record.msg = f"{record.msg} ({dropped} similar messages dropped in the last {self.interval:.0f}s)"
+            started, count, dropped = now, 0, 0
+
+        count += 1
+        keep = count <= self.burst or (count - self.burst) % self.rate == 0
+        if not keep:
+            dropped += 1
+            self.dropped[record.name] += 1
+
+        self.windows[key] = (started, count, dropped)
+        return keep
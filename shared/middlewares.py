@@ -3,7 +3,7 @@ import logging
 import scrapy
 from scrapy import signals
 
-from shared.db import get_connection, get_cursor, upsert_scraper_run
+from shared.db import get_connection, get_cursor, insert_scraper_run_history, upsert_scraper_run
 
 
 class LogScraperRunMiddleware:
@@ -28,6 +28,7 @@ class LogScraperRunMiddleware:
         spider_class = f"{spider.__class__.__module__}.{spider.__class__.__name__}"
 
         upsert_scraper_run(self.cursor, spider_class, stats)
+        insert_scraper_run_history(self.cursor, spider_class, spider.name, stats)
 
         self.connection.commit()
         self.cursor.close()
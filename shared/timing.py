@@ -0,0 +1,74 @@
+import functools
+import math
+import time
+from typing import Callable, Dict, Optional
+
+
+# Upper bounds of the buckets timings are counted in, in seconds
+TIMING_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, math.inf)
+
+TIMING_STAT = "timing"
+
+
+def bucket_label(seconds: float) -> str:
+    """The label of the bucket `seconds` is counted in, e.g. "0.25" or "inf"."""
+    return f"{next(bound for bound in TIMING_BUCKETS if seconds <= bound):g}"
+
+
+def bucket_quantile(histogram: Dict[str, int], q: float) -> Optional[float]:
+    """The upper bound of the bucket of `histogram` (bucket label -> count) holding the `q` quantile."""
+    count = sum(histogram.values())
+    if not count:
+        return None
+
+    rank = max(1, math.ceil(q * count))
+    seen = 0
+    for label in sorted(histogram, key=float):
+        seen += histogram[label]
+        if seen >= rank:
+            return float(label)
+    return None
+
+
+def record_timing(stats, kind: str, name: str, seconds: float, cpu_seconds: Optional[float] = None):
+    """
+    Count a timing in `stats` under `timing/<kind>/<name>/`: its count, total seconds, longest, and a histogram of
+    bucket label -> count. StageTiming adds the percentiles when the spider closes.
+    """
+    if stats is None:
+        return
+
+    prefix = f"{TIMING_STAT}/{kind}/{name}"
+    stats.inc_value(f"{prefix}/count")
+    stats.inc_value(f"{prefix}/seconds", seconds, start=0.0)
+    stats.max_value(f"{prefix}/max", seconds)
+    if cpu_seconds is not None:
+        stats.inc_value(f"{prefix}/cpu_seconds", cpu_seconds, start=0.0)
+
+    histogram = stats.get_value(f"{prefix}/histogram")
+    if histogram is None:
+        histogram = {}
+        stats.set_value(f"{prefix}/histogram", histogram)
+    label = bucket_label(seconds)
+    histogram[label] = histogram.get(label, 0) + 1
+
+
+def timed_process_item(process_item: Callable) -> Callable:
+    """
+    Decorates a pipeline's `process_item` to count its timings under `timing/pipeline/<pipeline class>/`, if
+    TIMING_ENABLED is set.
+    """
+
+    @functools.wraps(process_item)
+    def wrapper(self, item, spider):
+        crawler = getattr(spider, "crawler", None)
+        if crawler is None or not crawler.settings.getbool("TIMING_ENABLED"):
+            return process_item(self, item, spider)
+
+        started = time.perf_counter()
+        try:
+            return process_item(self, item, spider)
+        finally:
+            record_timing(crawler.stats, "pipeline", type(self).__name__, time.perf_counter() - started)
+
+    return wrapper
@@ -0,0 +1,36 @@
+from typing import Optional
+
+import pytest
+from scrapy import Spider
+from scrapy.crawler import Crawler
+from scrapy.utils.test import get_crawler
+
+
+class ExampleSpider(Spider):
+    name = "example"
+    allowed_domains = ["planning.example.gov.uk"]
+
+    def __init__(self, *args, last_run_stats: Optional[dict] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_run_stats = last_run_stats or {}
+
+    def get_last_run_stats(self) -> dict:
+        return self.last_run_stats
+
+    def parse_results(self, response):
+        yield {"url": response.url}
+
+
+@pytest.fixture
+def example_crawler():
+    """
+    Makes a crawler for a minimal spider with `settings_dict`, with its spider made from `spider_kwargs` as Scrapy
+    would.
+    """
+
+    def make(settings_dict: Optional[dict] = None, **spider_kwargs) -> Crawler:
+        crawler = get_crawler(ExampleSpider, settings_dict=settings_dict)
+        crawler.spider = ExampleSpider.from_crawler(crawler, **spider_kwargs)
+        return crawler
+
+    return make
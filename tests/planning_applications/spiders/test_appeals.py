@@ -1,13 +1,17 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from os import path
 
 import pytest
 from parsel import Selector
+from scrapy.http.request import Request
+from scrapy.http.request.form import FormRequest
 from scrapy.http.response.text import TextResponse
+from twisted.python.failure import Failure
 
 from planning_applications.items import PlanningApplicationAppeal
 from planning_applications.settings import DEFAULT_DATE_FORMAT
-from planning_applications.spiders.appeals import AppealsSpider
+from planning_applications.spiders import appeals
+from planning_applications.spiders.appeals import REVISIT_HORIZON_DAYS, AppealsSpider, revisit_priority
 
 
 def test_spider_initialization():
@@ -122,3 +126,214 @@ def test_parse_case_id_from_anchor():
 
         case_id = spider._parse_case_id_from_anchor(anchor)
         assert case_id == test["case_id"]
+
+
+SEARCH_RESULTS = """
+<html><body>
+    <form id="form1" method="post" action="./CaseSearch.aspx">
+        <input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="results-viewstate" />
+        <input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="results-eventvalidation" />
+        <input type="text" name="ctl00$cphMainContent$pdsReceived$txtDateSearch" value="01/01/2024" />
+        <input type="submit" name="ctl00$cphMainContent$cmdClear" value="Clear" />
+        <table id="cphMainContent_grdCaseResults">
+            <tr><td><a href="ViewCase.aspx?caseid=3300001&amp;CoID=0">APP/X/W/24/3300001</a></td></tr>
+        </table>
+    </form>
+</body></html>
+"""
+
+
+@pytest.fixture
+def no_finalised_appeals(monkeypatch):
+    monkeypatch.setattr(appeals, "get_finalised_appeal_case_ids", lambda: set())
+
+
+def test_splits_dates_across_search_sessions(no_finalised_appeals):
+    spider = AppealsSpider(start_date="2024-01-01", end_date="2024-01-10", sessions="3")
+
+    requests = list(spider.start_requests())
+
+    assert len(requests) == 3
+    assert [r.meta["cookiejar"] for r in requests] == [0, 1, 2]
+    assert [r.meta["date"] for r in requests] == [date(2024, 1, 1), date(2024, 1, 5), date(2024, 1, 8)]
+    assert [len(r.meta["dates"]) for r in requests] == [3, 2, 2]
+
+
+def test_chains_next_day_search_from_results_page(no_finalised_appeals):
+    spider = AppealsSpider(start_date="2024-01-01", end_date="2024-01-02", sessions="1")
+    form_request = next(spider.start_requests())
+    request = Request(
+        "https://acp.planninginspectorate.gov.uk/CaseSearch.aspx",
+        meta={**form_request.meta, "aspnet_blank_form": False},
+    )
+    response = TextResponse(url=request.url, body=SEARCH_RESULTS, encoding="utf-8", request=request)
+
+    results = list(spider.parse_search_results(response))
+
+    assert len(results) == 2
+    assert results[0].url == "https://acp.planninginspectorate.gov.uk/ViewCase.aspx?CaseID=3300001&CoID=0"
+    search = results[1]
+    assert isinstance(search, FormRequest)
+    assert search.meta["date"] == date(2024, 1, 2)
+    assert search.meta["dates"] == []
+    assert search.meta["cookiejar"] == 0
+    assert b"__VIEWSTATE=results-viewstate" in search.body
+    assert b"__EVENTVALIDATION=results-eventvalidation" in search.body
+    assert b"txtDateSearch=02%2F01%2F2024" in search.body
+    assert b"cmdClear" not in search.body
+
+
+def test_carries_on_with_next_day_when_a_search_fails(no_finalised_appeals):
+    spider = AppealsSpider(start_date="2024-01-01", end_date="2024-01-03", sessions="1")
+    form_request = next(spider.start_requests())
+    request = Request(
+        "https://acp.planninginspectorate.gov.uk/CaseSearch.aspx",
+        meta={**form_request.meta, "aspnet_blank_form": False},
+    )
+    response = TextResponse(url=request.url, body=SEARCH_RESULTS, encoding="utf-8", request=request)
+    search = list(spider.parse_search_results(response))[-1]
+    assert search.errback == spider._search_failed
+
+    failure = Failure(TimeoutError())
+    failure.request = search
+    results = list(spider._search_failed(failure))
+
+    assert len(results) == 1
+    assert results[0].url == spider.start_url
+    assert results[0].callback == spider.search_date
+    assert results[0].errback == spider._search_failed
+    assert results[0].meta["date"] == date(2024, 1, 3)
+    assert results[0].meta["dates"] == []
+    assert results[0].meta["cookiejar"] == 0
+
+
+def make_case_response(request: Request, found: bool) -> TextResponse:
+    case_id = request.url.split("CaseID=")[1].split("&")[0]
+    body = "<html><body></body></html>" if found else f"No case found with Case ID {case_id}"
+    return TextResponse(url=request.url, body=body, encoding="utf-8", request=request)
+
+
+def requested_case_ids(requests) -> list[int]:
+    return [
+        int(r.url.split("CaseID=")[1].split("&")[0]) for r in requests if isinstance(r, Request) and "CaseID=" in r.url
+    ]
+
+
+def test_frontier_scans_past_highest_case_and_gallops(monkeypatch):
+    monkeypatch.setattr(appeals, "get_max_appeal_case_id", lambda: 100)
+    spider = AppealsSpider(frontier="true", frontier_max_misses="3")
+
+    requests = list(spider.start_requests())
+    assert requested_case_ids(requests) == [101, 102, 103, 106]
+
+    # A hit inside the window extends the scan to 3 past it
+    results = list(spider.parse_frontier_case(make_case_response(requests[1], found=True)))
+    assert requested_case_ids(results) == [104, 105]
+
+    # A probe hit extends the scan past it and gallops twice as far
+    results = list(spider.parse_frontier_case(make_case_response(requests[3], found=True)))
+    assert requested_case_ids(results) == [107, 108, 109, 112]
+
+    # Misses don't request anything more
+    assert list(spider.parse_frontier_case(make_case_response(requests[2], found=False))) == []
+
+
+def test_frontier_rejects_case_ids_and_dates():
+    with pytest.raises(ValueError, match="must not be provided in frontier mode"):
+        AppealsSpider(frontier="true", start_date="2024-01-01", end_date="2024-01-31")
+
+
+def test_skips_finalised_appeals(monkeypatch):
+    monkeypatch.setattr(appeals, "get_finalised_appeal_case_ids", lambda: {12346})
+    spider = AppealsSpider(from_case_id="12345", to_case_id="12347")
+
+    assert requested_case_ids(spider.start_requests()) == [12345, 12347]
+
+
+def test_revisit_priority():
+    today = date(2025, 3, 1)
+
+    def appeal(**dates) -> PlanningApplicationAppeal:
+        return PlanningApplicationAppeal(
+            lpa="Example", url="https://example.com", reference="APP/1", case_id=1, **dates
+        )
+
+    # Nothing coming up
+    assert revisit_priority(appeal(), today) == 0
+    assert revisit_priority(appeal(statement_due_date=datetime(2025, 2, 1)), today) == 0
+    assert revisit_priority(appeal(statement_due_date=datetime(2026, 2, 1)), today) == 0
+
+    # Sooner deadlines come first
+    soon = revisit_priority(appeal(statement_due_date=datetime(2025, 3, 3)), today)
+    later = revisit_priority(appeal(final_comments_due_date=datetime(2025, 4, 1)), today)
+    assert soon == REVISIT_HORIZON_DAYS - 2
+    assert 0 < later < soon
+
+    # Events count double, including recent ones as the decision usually follows
+    assert revisit_priority(appeal(event_date=datetime(2025, 3, 3)), today) == 2 * (REVISIT_HORIZON_DAYS - 2)
+    assert revisit_priority(appeal(event_date=datetime(2025, 2, 27)), today) == 2 * (REVISIT_HORIZON_DAYS - 2)
+
+
+def test_revisits_open_appeals_by_priority(monkeypatch):
+    today = datetime.now()
+    monkeypatch.setattr(
+        appeals,
+        "get_open_appeals",
+        lambda: [
+            PlanningApplicationAppeal(lpa="Example", url="https://example.com", reference="APP/1", case_id=1),
+            PlanningApplicationAppeal(
+                lpa="Example", url="https://example.com", reference="APP/2", case_id=2, event_date=today
+            ),
+            PlanningApplicationAppeal(
+                lpa="Example",
+                url="https://example.com",
+                reference="APP/3",
+                case_id=3,
+                questionnaire_due_date=today + timedelta(days=7),
+            ),
+        ],
+    )
+    spider = AppealsSpider(revisit="true")
+
+    requests = list(spider.start_requests())
+
+    # The most urgent appeals are requested first
+    assert requested_case_ids(requests) == [2, 3, 1]
+    assert [r.priority for r in requests] == [2 * REVISIT_HORIZON_DAYS, REVISIT_HORIZON_DAYS - 7, 0]
+
+
+def test_requests_each_case_once_per_run(no_finalised_appeals):
+    spider = AppealsSpider(start_date="2024-01-01", end_date="2024-01-02", sessions="1")
+    form_request = next(spider.start_requests())
+    request = Request("https://acp.planninginspectorate.gov.uk/CaseSearch.aspx", meta=form_request.meta)
+    response = TextResponse(url=request.url, body=SEARCH_RESULTS, encoding="utf-8", request=request)
+
+    first_day = requested_case_ids(spider.parse_search_results(response))
+    second_day = requested_case_ids(spider.parse_search_results(response))
+
+    assert 3300001 in first_day
+    assert 3300001 not in second_day
+
+
+def test_follows_linked_cases_not_already_known(monkeypatch):
+    monkeypatch.setattr(appeals, "get_finalised_appeal_case_ids", lambda: set())
+    monkeypatch.setattr(appeals, "get_known_appeal_case_ids", lambda: {3300002})
+    spider = AppealsSpider(from_case_id="3360163", to_case_id="3360163", follow_linked_cases="true")
+    list(spider.start_requests())
+
+    with open(path.realpath("./tests/planning_applications/fixtures/appeals/case.html"), "r") as f:
+        html = f.read()
+    linked_cases = "".join(
+        f'<a id="cphMainContent_repLinkedCases_lnkLinkedCase_{i}" href="ViewCase.aspx?CaseID={case_id}&amp;CoID=0">'
+        f"Linked</a>"
+        for i, case_id in enumerate([3300001, 3300002, 3360163])
+    )
+    html = html.replace("</body>", f"{linked_cases}</body>")
+    response = TextResponse(
+        url="https://acp.planninginspectorate.gov.uk/ViewCase.aspx?CaseID=3360163&ColID=0", body=html, encoding="utf-8"
+    )
+
+    results = list(spider.parse_case(response))
+
+    # 3300002 is already in the database, and 3360163 is the case itself, which has already been requested
+    assert requested_case_ids(results) == [3300001]
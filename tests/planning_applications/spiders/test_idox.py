@@ -0,0 +1,374 @@
+from datetime import datetime
+from typing import List
+
+import pytest
+from scrapy.http.request import Request
+from scrapy.http.request.form import FormRequest
+from scrapy.http.response.html import HtmlResponse
+from scrapy.utils.test import get_crawler
+from twisted.python.failure import Failure
+
+from planning_applications.items import (
+    IdoxPlanningApplicationItem,
+    PlanningApplication,
+    PlanningApplicationDocument,
+    PlanningApplicationSearchResult,
+)
+from planning_applications.spiders import idox
+from planning_applications.spiders.idox import DEFAULT_RESULTS_PER_PAGE, RESULTS_PER_PAGE_STAT, IdoxSpider
+
+RESULTS_URL = "https://planning.example.gov.uk/online-applications/pagedSearchResults.do?action=firstPage"
+
+
+class ExampleIdoxSpider(IdoxSpider):
+    name = "example"
+    domain = "planning.example.gov.uk"
+    allowed_domains = [domain]
+    start_url = f"https://{domain}/online-applications/search.do?action=advanced"
+
+
+def make_spider(**kwargs) -> ExampleIdoxSpider:
+    return ExampleIdoxSpider(start_date="2024-01-01", end_date="2024-01-07", **kwargs)
+
+
+def make_results_page(count: int, next_page: bool = True, page_size_options: List[int] | None = None) -> str:
+    results = "".join(
+        f"""
+        <li class="searchresult">
+            <a href="/online-applications/applicationDetails.do?keyVal=KEY{i}&amp;activeTab=summary">
+                <div class="summaryLinkTextClamp">Erection of a shed {i}</div>
+            </a>
+            <p class="address">{i} High Street, Exampletown</p>
+            <p class="metaInfo">
+                Ref. No: 24/0000{i}/FUL <span class="divider">|</span>
+                Received: Mon 01 Jan 2024 <span class="divider">|</span>
+                Validated: Tue 02 Jan 2024 <span class="divider">|</span>
+                Status: Pending Consideration
+            </p>
+        </li>"""
+        for i in range(count)
+    )
+
+    page_size_form = ""
+    if page_size_options:
+        options = "".join(f'<option value="{size}">{size}</option>' for size in page_size_options)
+        page_size_form = f"""
+        <form id="searchResults" method="post" action="/online-applications/pagedSearchResults.do">
+            <input type="hidden" name="searchCriteria.page" value="1" />
+            <input type="hidden" name="action" value="page" />
+            <select name="searchCriteria.resultsPerPage">{options}</select>
+        </form>"""
+
+    next_link = ""
+    if next_page:
+        next_link = '<a class="next" href="/online-applications/pagedSearchResults.do?action=page&amp;searchCriteria.page=2">Next</a>'
+
+    return f"""
+    <html><body>
+        {page_size_form}
+        <ul id="searchresults">{results}</ul>
+        {next_link}
+    </body></html>"""
+
+
+def make_response(body: str, url: str = RESULTS_URL, request: Request | None = None) -> HtmlResponse:
+    return HtmlResponse(url=url, body=body, encoding="utf-8", request=request or Request(url))
+
+
+@pytest.fixture
+def no_existing_applications(monkeypatch):
+    monkeypatch.setattr(idox, "select_planning_application_by_url", lambda url: None)
+
+
+def test_requests_largest_offered_results_per_page():
+    spider = make_spider()
+    response = make_response(make_results_page(10, page_size_options=[10, 20, 50, 100]))
+
+    results = list(spider.parse_results(response))
+
+    assert len(results) == 1
+    request = results[0]
+    assert isinstance(request, FormRequest)
+    assert request.meta["results_per_page"] == 100
+    assert request.meta["unsized_response"] is response
+    assert b"searchCriteria.resultsPerPage=100" in request.body
+
+
+def test_does_not_resize_single_page_of_results(no_existing_applications):
+    spider = make_spider()
+    response = make_response(make_results_page(3, next_page=False, page_size_options=[10, 100]))
+
+    results = list(spider.parse_results(response))
+
+    assert all(r.meta.get("results_per_page") is None for r in results if isinstance(r, Request))
+
+
+def test_configured_results_per_page_uses_paging_url_without_selector():
+    spider = make_spider(results_per_page="50")
+    response = make_response(make_results_page(10))
+
+    results = list(spider.parse_results(response))
+
+    assert len(results) == 1
+    assert "searchCriteria.resultsPerPage=50" in results[0].url
+    assert "searchCriteria.page=1" in results[0].url
+
+
+def test_records_capped_results_per_page(no_existing_applications):
+    spider = make_spider()
+    unsized_response = make_response(make_results_page(10, page_size_options=[10, 100]))
+    request = Request(RESULTS_URL, meta={"results_per_page": 100, "unsized_response": unsized_response})
+    response = make_response(make_results_page(30), request=request)
+
+    results = list(spider.parse_results(response))
+
+    assert spider.results_per_page == 30
+    next_page_requests = [r for r in results if isinstance(r, Request) and "searchCriteria.page=2" in r.url]
+    assert len(next_page_requests) == 1
+    assert "unsized_response" not in next_page_requests[0].meta
+
+
+def test_falls_back_when_results_per_page_rejected(no_existing_applications):
+    spider = make_spider()
+    unsized_response = make_response(make_results_page(10, page_size_options=[10, 100]))
+    request = Request(RESULTS_URL, meta={"results_per_page": 100, "unsized_response": unsized_response})
+    response = make_response("<html><body><h1>An error has occurred</h1></body></html>", request=request)
+
+    results = list(spider.parse_results(response))
+
+    assert spider.results_per_page == DEFAULT_RESULTS_PER_PAGE
+    summary_requests = [r for r in results if isinstance(r, Request) and "activeTab=summary" in r.url]
+    assert len(summary_requests) == 10
+
+
+def test_fallback_results_per_page_is_not_carried_to_the_next_run(no_existing_applications):
+    crawler = get_crawler(ExampleIdoxSpider)
+    spider = ExampleIdoxSpider.from_crawler(crawler, start_date="2024-01-01", end_date="2024-01-07")
+    spider._last_run_stats = {RESULTS_PER_PAGE_STAT: 100}
+    list(spider.start_requests())
+    unsized_response = make_response(make_results_page(10, page_size_options=[10, 100]))
+    request = Request(RESULTS_URL, meta={"results_per_page": 100, "unsized_response": unsized_response})
+
+    list(spider.parse_results(make_response("<html><body>An error has occurred</body></html>", request=request)))
+
+    assert spider.results_per_page == DEFAULT_RESULTS_PER_PAGE
+    assert crawler.stats.get_value(RESULTS_PER_PAGE_STAT) == 100
+
+    # A council that really does cap the page size at the default keeps it
+    next_run = make_spider()
+    next_run._last_run_stats = {RESULTS_PER_PAGE_STAT: DEFAULT_RESULTS_PER_PAGE}
+    list(next_run.start_requests())
+
+    assert next_run.results_per_page == DEFAULT_RESULTS_PER_PAGE
+
+
+def make_tab_response(url: str, body: str, meta: dict) -> HtmlResponse:
+    return make_response(body, url=url, request=Request(url, meta=meta))
+
+
+SUMMARY_TAB = """
+<table id="simpleDetailsTable">
+    <tr><th>Reference</th><td>24/00000/FUL</td></tr>
+    <tr><th>Application Received</th><td>Mon 01 Jan 2024</td></tr>
+    <tr><th>Application Validated</th><td>Tue 02 Jan 2024</td></tr>
+    <tr><th>Address</th><td>0 High Street, Exampletown</td></tr>
+    <tr><th>Proposal</th><td>Erection of a shed 0</td></tr>
+    <tr><th>Status</th><td>Pending Consideration</td></tr>
+</table>
+"""
+
+DETAILS_TAB = """
+<table id="applicationDetails">
+    <tr><th>Application Type</th><td>Full Planning Permission</td></tr>
+</table>
+"""
+
+DOCUMENTS_TAB = """
+<table id="Documents">
+    <tr><th>Date Published</th><th>Document Type</th><th>Description</th><th>View</th></tr>
+    <tr><td>02 Jan 2024</td><td>Plans</td><td>Site plan</td><td><a href="/files/1.pdf">View</a></td></tr>
+</table>
+"""
+
+
+def test_application_only_skips_documents_and_arcgis(no_existing_applications):
+    spider = make_spider(object_types="application")
+    spider.arcgis_url = "https://planning.example.gov.uk/server/rest/services/FeatureServer/2/query"
+
+    results = list(spider.parse_results(make_response(make_results_page(1, next_page=False))))
+    summary_request = next(r for r in results if isinstance(r, Request) and r.meta.get("stage") == "summary")
+
+    details_request = next(
+        spider.parse_details_summary_tab(make_tab_response(summary_request.url, SUMMARY_TAB, summary_request.meta))
+    )
+    assert details_request.meta["stage"] == "details"
+
+    results = list(
+        spider.parse_details_further_information_tab(
+            make_tab_response(details_request.url, DETAILS_TAB, details_request.meta)
+        )
+    )
+
+    assert len(results) == 1
+    item = results[0]
+    assert isinstance(item, IdoxPlanningApplicationItem)
+    assert item["reference"] == "24/00000/FUL"
+    assert item["documents"] is None
+    assert item["geometry"] is None
+
+
+def test_documents_only_goes_straight_to_documents_tab(no_existing_applications):
+    spider = make_spider(object_types="document")
+
+    results = list(spider.parse_results(make_response(make_results_page(1, next_page=False))))
+    documents_requests = [r for r in results if isinstance(r, Request) and r.meta.get("stage")]
+
+    assert len(documents_requests) == 1
+    documents_request = documents_requests[0]
+    assert documents_request.meta["stage"] == "documents"
+    assert "activeTab=documents" in documents_request.url
+    assert documents_request.meta["reference"] == "24/00000/FUL"
+
+    results = list(
+        spider.parse_documents_tab(make_tab_response(documents_request.url, DOCUMENTS_TAB, documents_request.meta))
+    )
+
+    assert len(results) == 1
+    document = results[0]
+    assert isinstance(document, PlanningApplicationDocument)
+    assert document.application_reference == "24/00000/FUL"
+    assert document.url == "https://planning.example.gov.uk/files/1.pdf"
+
+
+def result_url(keyval: str) -> str:
+    return (
+        f"https://planning.example.gov.uk/online-applications/applicationDetails.do?keyVal={keyval}&activeTab=summary"
+    )
+
+
+def make_existing_application(keyval: str, application_type: str | None) -> PlanningApplication:
+    return PlanningApplication(
+        lpa="example",
+        reference="24/00000/FUL",
+        website_reference=keyval,
+        url=result_url(keyval),
+        submitted_date=datetime(2024, 1, 1),
+        validated_date=datetime(2024, 1, 2),
+        address="0 High Street, Exampletown",
+        application_status="Pending Consideration",
+        application_type=application_type,
+        is_active=True,
+    )
+
+
+def test_light_mode_builds_applications_from_result_rows(monkeypatch):
+    existing = make_existing_application("KEY0", "Full Planning Permission")
+    monkeypatch.setattr(
+        idox, "select_planning_application_by_url", lambda url: existing if url == existing.url else None
+    )
+    spider = make_spider(light="true")
+
+    results = list(spider.parse_results(make_response(make_results_page(2, next_page=False))))
+
+    search_results = [r for r in results if isinstance(r, PlanningApplicationSearchResult)]
+    assert [r.reference for r in search_results] == ["24/00000/FUL", "24/00001/FUL"]
+    assert search_results[0].website_reference == "KEY0"
+    assert search_results[0].submitted_date == datetime(2024, 1, 1)
+    assert search_results[0].validated_date == datetime(2024, 1, 2)
+    assert search_results[0].address == "0 High Street, Exampletown"
+    assert search_results[0].description == "Erection of a shed 0"
+    assert search_results[0].application_status == "Pending Consideration"
+
+    # Only the reference that isn't in the database yet gets its tabs scraped
+    summary_requests = [r for r in results if isinstance(r, Request) and r.meta.get("stage") == "summary"]
+    assert [r.meta["keyval"] for r in summary_requests] == ["KEY1"]
+
+
+def test_light_mode_scrapes_applications_whose_full_scrape_never_finished(monkeypatch):
+    # Saved from the search results by an earlier light run, but its tabs were never scraped
+    existing = make_existing_application("KEY0", None)
+    monkeypatch.setattr(idox, "select_planning_application_by_url", lambda url: existing)
+    spider = make_spider(light="true")
+
+    results = list(spider.parse_results(make_response(make_results_page(1, next_page=False))))
+
+    assert len([r for r in results if isinstance(r, PlanningApplicationSearchResult)]) == 1
+    summary_requests = [r for r in results if isinstance(r, Request) and r.meta.get("stage") == "summary"]
+    assert [r.meta["keyval"] for r in summary_requests] == ["KEY0"]
+
+
+def test_light_mode_scrapes_rows_without_a_validated_date(no_existing_applications):
+    spider = make_spider(light="true")
+    page = make_results_page(1, next_page=False).replace(
+        'Validated: Tue 02 Jan 2024 <span class="divider">|</span>', ""
+    )
+
+    results = list(spider.parse_results(make_response(page)))
+
+    assert not [r for r in results if isinstance(r, PlanningApplicationSearchResult)]
+    summary_requests = [r for r in results if isinstance(r, Request) and r.meta.get("stage") == "summary"]
+    assert [r.meta["keyval"] for r in summary_requests] == ["KEY0"]
+
+
+SEARCH_FORM = """
+<html><body>
+    <form id="advancedSearchForm" method="post" action="/online-applications/advancedSearchResults.do?action=firstPage">
+        <input type="hidden" name="_csrf" value="token" />
+        <input type="text" name="date(applicationValidatedStart)" />
+        <input type="text" name="date(applicationValidatedEnd)" />
+    </form>
+</body></html>
+"""
+
+
+def test_reuses_search_form_for_next_window():
+    spider = make_spider()
+    list(spider._start_new_period(make_response(SEARCH_FORM, url=spider.start_url)))
+
+    results = list(spider._maybe_schedule_previous_week(make_response(make_results_page(0, next_page=False))))
+
+    assert len(results) == 1
+    request = results[0]
+    assert isinstance(request, FormRequest)
+    assert request.meta["reused_search_form"] is True
+    assert b"_csrf=token" in request.body
+    assert b"date%28applicationValidatedStart%29=24%2F12%2F2023" in request.body
+
+
+def test_reused_search_form_is_not_retried_and_reloads_the_form_on_failure():
+    spider = make_spider()
+    list(spider._start_new_period(make_response(SEARCH_FORM, url=spider.start_url)))
+    request = next(spider._maybe_schedule_previous_week(make_response(make_results_page(0, next_page=False))))
+
+    assert request.meta["dont_retry"] is True
+
+    failure = Failure(TimeoutError())
+    failure.request = request
+    results = list(request.errback(failure))
+
+    assert len(results) == 1
+    assert results[0].url == spider.start_url
+    assert results[0].callback == spider._start_new_period
+
+
+def test_reloads_search_form_when_tokens_rejected():
+    spider = make_spider()
+    list(spider._start_new_period(make_response(SEARCH_FORM, url=spider.start_url)))
+    request = next(spider._maybe_schedule_previous_week(make_response(make_results_page(0, next_page=False))))
+
+    response = HtmlResponse(url=request.url, status=403, body=b"Forbidden", request=request)
+    results = list(spider.parse_results(response))
+
+    assert len(results) == 1
+    assert results[0].url == spider.start_url
+    assert results[0].callback == spider._start_new_period
+    assert spider._search_form is None
+
+
+def test_stops_searching_previous_weeks_at_earliest_date():
+    spider = make_spider(earliest_date="2023-12-28")
+    list(spider._start_new_period(make_response(SEARCH_FORM, url=spider.start_url)))
+    no_results = make_response(make_results_page(0, next_page=False))
+
+    assert len(list(spider._maybe_schedule_previous_week(no_results))) == 1
+    assert list(spider._maybe_schedule_previous_week(no_results)) == []
@@ -0,0 +1,64 @@
+from scrapy.http.request import Request
+from scrapy.utils.project import get_project_settings
+
+from planning_applications.spiderloader import LpaSpiderLoader
+from planning_applications.spiders.idox import IdoxSpider
+from planning_applications.spiders.registry import LPAS, LPAS_BY_NAME, build_spider_class
+from run_spiders import get_spider_names
+
+
+def test_lists_appeals_and_every_lpa():
+    loader = LpaSpiderLoader.from_settings(get_project_settings())
+
+    names = loader.list()
+
+    assert "appeals" in names
+    assert "cambridge" in names
+    assert "crawley" in names
+    assert len(names) == len(LPAS) + 1
+
+
+def test_generates_idox_spider_for_lpa():
+    loader = LpaSpiderLoader.from_settings(get_project_settings())
+
+    spider_class = loader.load("cambridge")
+
+    assert issubclass(spider_class, IdoxSpider)
+    assert spider_class.name == "cambridge"
+    assert spider_class.allowed_domains == ["applications.greatercambridgeplanning.org"]
+    assert (
+        spider_class.start_url
+        == "https://applications.greatercambridgeplanning.org/online-applications/search.do?action=advanced"
+    )
+    # Keeps the scraper_runs key it had as its own module
+    assert f"{spider_class.__module__}.{spider_class.__name__}" == (
+        "planning_applications.spiders.lpas.cambridge.CambridgeSpider"
+    )
+    assert loader.load("cambridge") is spider_class
+
+
+def test_finds_lpa_by_request():
+    loader = LpaSpiderLoader.from_settings(get_project_settings())
+
+    request = Request("https://applications.greatercambridgeplanning.org/online-applications/")
+
+    # South Cambridgeshire shares Cambridge's portal
+    assert sorted(loader.find_by_request(request)) == ["cambridge", "south_cambridgeshire"]
+
+
+def test_hand_written_spiders_match_registry():
+    for spec in LPAS:
+        if not spec.spider:
+            continue
+
+        spider_class = build_spider_class(spec)
+        assert spider_class.name == spec.name
+        assert getattr(spider_class, "not_yet_working", False) == spec.not_yet_working
+
+
+def test_spider_names_skip_not_working():
+    names = get_spider_names(skip_not_working=True)
+
+    assert "cambridge" in names
+    assert "carlisle" not in names
+    assert all(not LPAS_BY_NAME[name].not_yet_working for name in names)
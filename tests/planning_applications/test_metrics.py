@@ -0,0 +1,21 @@
+from planning_applications.metrics import CrawlMetrics, render_metrics
+from shared.timing import record_timing
+
+
+def test_renders_crawl_stats_and_timing_histograms(example_crawler):
+    crawler = example_crawler()
+    crawler.stats.set_value("item_scraped_count", 12)
+    crawler.stats.set_value("retry/count", 3)
+    record_timing(crawler.stats, "pipeline", "PostgresPipeline", 0.02)
+    record_timing(crawler.stats, "pipeline", "PostgresPipeline", 0.3)
+
+    metrics = render_metrics([CrawlMetrics(crawler)])
+
+    assert "# TYPE planning_applications_items_scraped_total counter" in metrics
+    assert 'planning_applications_items_scraped_total{spider="example"} 12\n' in metrics
+    assert 'planning_applications_retries_total{spider="example"} 3\n' in metrics
+    labels = 'spider="example",kind="pipeline",name="PostgresPipeline"'
+    assert f'planning_applications_timing_seconds_bucket{{{labels},le="0.025"}} 1\n' in metrics
+    assert f'planning_applications_timing_seconds_bucket{{{labels},le="0.5"}} 2\n' in metrics
+    assert f'planning_applications_timing_seconds_bucket{{{labels},le="+Inf"}} 2\n' in metrics
+    assert f"planning_applications_timing_seconds_count{{{labels}}} 2\n" in metrics
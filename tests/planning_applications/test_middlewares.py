@@ -0,0 +1,153 @@
+import pytest
+from scrapy.http.request import Request
+from scrapy.http.response import Response
+from twisted.internet.error import TimeoutError
+
+from planning_applications.extensions import StageTiming
+from planning_applications.middlewares import (
+    AdaptiveTimeoutMiddleware,
+    CallbackTimingMiddleware,
+    CIRCUIT_BREAKER_CLOSE_REASON,
+    CircuitBreakerMiddleware,
+    CircuitBreakerOpen,
+)
+
+
+SETTINGS = {
+    "CIRCUIT_BREAKER_ENABLED": True,
+    "CIRCUIT_BREAKER_THRESHOLD": 3,
+    "CIRCUIT_BREAKER_HTTP_CODES": [500, 502, 503, 504],
+}
+
+
+def make_middleware(monkeypatch, example_crawler, last_run_stats=None):
+    crawler = example_crawler(SETTINGS, last_run_stats=last_run_stats)
+    middleware = CircuitBreakerMiddleware.from_crawler(crawler)
+    closed = []
+    monkeypatch.setattr(middleware, "_close_spider", lambda: closed.append(True))
+    middleware.spider_opened(crawler.spider)
+    return middleware, closed
+
+
+REQUEST = Request("https://planning.example.gov.uk/online-applications/search.do")
+
+
+def test_opens_after_consecutive_failures_and_closes_spider(monkeypatch, example_crawler):
+    middleware, closed = make_middleware(monkeypatch, example_crawler)
+
+    middleware.process_exception(REQUEST, TimeoutError())
+    middleware.process_response(REQUEST, Response(REQUEST.url, status=503))
+    middleware.process_response(REQUEST, Response(REQUEST.url, status=200))
+    middleware.process_exception(REQUEST, TimeoutError())
+    middleware.process_exception(REQUEST, TimeoutError())
+    assert not closed
+
+    middleware.process_exception(REQUEST, TimeoutError())
+
+    assert closed
+    assert middleware.crawler.stats.get_value("circuit_breaker/opened_domain") == "planning.example.gov.uk"
+    with pytest.raises(CircuitBreakerOpen):
+        middleware.process_request(REQUEST)
+
+
+def test_half_open_after_breaker_opened_on_last_run(monkeypatch, example_crawler):
+    last_run_stats = {
+        "finish_reason": CIRCUIT_BREAKER_CLOSE_REASON,
+        "circuit_breaker/opened_domain": "planning.example.gov.uk",
+    }
+    middleware, closed = make_middleware(monkeypatch, example_crawler, last_run_stats)
+
+    middleware.process_exception(REQUEST, TimeoutError())
+
+    assert closed
+
+
+TIMEOUT_SETTINGS = {
+    "DOWNLOAD_TIMEOUT": 180,
+    "ADAPTIVE_TIMEOUT_ENABLED": True,
+    "ADAPTIVE_TIMEOUT_MULTIPLIER": 4.0,
+    "ADAPTIVE_TIMEOUT_MIN": 15.0,
+    "ADAPTIVE_TIMEOUT_MIN_SAMPLES": 20,
+}
+
+
+def make_timeout_middleware(example_crawler, last_run_stats=None):
+    crawler = example_crawler(TIMEOUT_SETTINGS, last_run_stats=last_run_stats)
+    middleware = AdaptiveTimeoutMiddleware.from_crawler(crawler)
+    middleware.spider_opened(crawler.spider)
+    return middleware
+
+
+def test_stage_timeouts_come_from_last_run_latency(example_crawler):
+    last_run_stats = {
+        "download_latency/search/count": 40,
+        "download_latency/search/p50": 1.2,
+        "download_latency/search/p99": 2.0,
+        "download_latency/documents/count": 300,
+        "download_latency/documents/p50": 9.0,
+        "download_latency/documents/p99": 60.0,
+        "download_latency/arcgis/count": 5,
+        "download_latency/arcgis/p50": 0.4,
+        "download_latency/arcgis/p99": 0.9,
+    }
+    middleware = make_timeout_middleware(example_crawler, last_run_stats)
+
+    search = Request(REQUEST.url)
+    documents = Request(REQUEST.url, meta={"stage": "documents"})
+    arcgis = Request(REQUEST.url, meta={"stage": "arcgis"})
+    own_timeout = Request(REQUEST.url, meta={"download_timeout": 30})
+    for request in (search, documents, arcgis, own_timeout):
+        middleware.process_request(request)
+
+    # Raised to the minimum, capped at DOWNLOAD_TIMEOUT, too few samples, and left alone
+    assert search.meta["download_timeout"] == 15.0
+    assert documents.meta["download_timeout"] == 180
+    assert arcgis.meta["download_timeout"] == 180
+    assert own_timeout.meta["download_timeout"] == 30
+    assert middleware.stats.get_value("adaptive_timeout/search") == 15.0
+
+
+def test_latency_is_recorded_with_timeouts_at_their_timeout(example_crawler):
+    middleware = make_timeout_middleware(example_crawler)
+
+    for latency in (1.0, 1.0, 1.0):
+        request = Request(REQUEST.url, meta={"stage": "summary", "download_latency": latency})
+        middleware.process_response(request, Response(request.url))
+    timed_out = Request(REQUEST.url, meta={"stage": "summary"})
+    middleware.process_request(timed_out)
+    middleware.process_exception(timed_out, TimeoutError())
+    middleware.spider_closed(middleware.crawler.spider)
+
+    stats = middleware.crawler.stats
+    assert stats.get_value("timing/download/summary/histogram") == {"1": 3, "300": 1}
+    assert stats.get_value("download_latency/summary/count") == 4
+    assert stats.get_value("download_latency/summary/p50") == pytest.approx(1.0, rel=0.25)
+    assert stats.get_value("download_latency/summary/p99") == 180
+    assert stats.get_value("adaptive_timeout/summary/timeouts") == 1
+
+
+def test_times_callbacks_and_adds_percentiles_on_close(example_crawler):
+    crawler = example_crawler({"TIMING_ENABLED": True})
+    middleware = CallbackTimingMiddleware.from_crawler(crawler)
+    download_middleware = AdaptiveTimeoutMiddleware.from_crawler(crawler)
+    stage_timing = StageTiming.from_crawler(crawler)
+
+    def parse_results(response):
+        yield Request(f"{REQUEST.url}?page=2")
+        yield {"reference": "24/00001/FUL"}
+
+    request = Request(REQUEST.url, callback=parse_results)
+    response = Response(REQUEST.url, request=request)
+    for _ in range(3):
+        assert len(list(middleware.process_spider_output(response, parse_results(response)))) == 2
+
+    summary = Request(REQUEST.url, meta={"stage": "summary", "download_latency": 0.3})
+    download_middleware.process_response(summary, Response(REQUEST.url))
+    stage_timing.spider_closed(crawler.spider)
+
+    stats = crawler.stats
+    assert stats.get_value("timing/callback/parse_results/count") == 3
+    assert stats.get_value("timing/callback/parse_results/cpu_seconds") >= 0
+    assert sum(stats.get_value("timing/callback/parse_results/histogram").values()) == 3
+    assert stats.get_value("timing/download/summary/histogram") == {"0.5": 1}
+    assert stats.get_value("timing/download/summary/p99") == 0.3
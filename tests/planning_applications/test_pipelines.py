@@ -0,0 +1,150 @@
+from datetime import datetime
+from typing import List, Optional
+
+import psycopg
+
+from planning_applications import pipelines
+from planning_applications.items import PlanningApplication, PlanningApplicationDocument, PlanningApplicationGeometry
+from planning_applications.pipelines import ApplicationUuidCache, PostgresPipeline
+
+
+def test_uuid_cache_keeps_the_most_recently_used_applications():
+    cache = ApplicationUuidCache(size=2)
+    cache.put("crawley", "CR/2024/0001/FUL", "uuid-1")
+    cache.put("crawley", "CR/2024/0002/FUL", "uuid-2")
+
+    assert cache.get("crawley", "CR/2024/0001/FUL") == "uuid-1"
+    cache.put("crawley", "CR/2024/0003/FUL", "uuid-3")
+
+    assert cache.get("crawley", "CR/2024/0002/FUL") is None
+    assert cache.get("crawley", "CR/2024/0001/FUL") == "uuid-1"
+    assert cache.get("crawley", "CR/2024/0003/FUL") == "uuid-3"
+    assert cache.get("horsham", "CR/2024/0001/FUL") is None
+    assert (cache.hits, cache.misses) == (3, 2)
+    assert cache.hit_rate == 0.6
+
+
+class FakeCursor:
+    """Records the statements run, returns `rows` in turn from fetchone, and fails on any row containing `fail_on`."""
+
+    def __init__(self, rows: Optional[List[tuple]] = None, fail_batches: bool = False, fail_on: Optional[str] = None):
+        self.rows = rows or []
+        self.fail_batches = fail_batches
+        self.fail_on = fail_on
+        self.executed: List[tuple] = []
+        self.batches: List[List[tuple]] = []
+
+    def execute(self, query: str, params: tuple = ()):
+        if self.fail_on is not None and self.fail_on in params:
+            raise psycopg.DataError(f"Can't insert {self.fail_on}")
+        self.executed.append(params)
+
+    def executemany(self, query: str, params_seq: List[tuple]):
+        if self.fail_batches:
+            raise psycopg.DataError("Can't insert the batch")
+        if params_seq:
+            self.batches.append(params_seq)
+
+    def fetchone(self) -> Optional[tuple]:
+        return self.rows.pop(0) if self.rows else ("row-uuid",)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor: FakeCursor):
+        self._cursor = cursor
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self) -> FakeCursor:
+        return self._cursor
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+def make_pipeline(monkeypatch, cursor: FakeCursor, batch_size: int) -> PostgresPipeline:
+    connection = FakeConnection(cursor)
+    monkeypatch.setattr(pipelines, "get_connection", lambda: connection)
+    return PostgresPipeline(batch_size=batch_size)
+
+
+APPLICATION = PlanningApplication(
+    lpa="example",
+    reference="24/00001/FUL",
+    website_reference="KEY1",
+    url="https://planning.example.gov.uk/1",
+    submitted_date=datetime(2024, 1, 2),
+    validated_date=datetime(2024, 1, 3),
+    address="1 High Street",
+    application_status="Pending",
+    is_active=True,
+)
+
+
+def make_document(name: str) -> PlanningApplicationDocument:
+    return PlanningApplicationDocument(
+        lpa="example",
+        application_reference=APPLICATION.reference,
+        url=f"https://planning.example.gov.uk/1/{name}.pdf",
+        date_published=datetime(2024, 1, 4),
+        document_type="Plans",
+    )
+
+
+GEOMETRY = PlanningApplicationGeometry(
+    lpa="example", application_reference=APPLICATION.reference, reference=APPLICATION.reference, geometry="POINT(0 52)"
+)
+
+
+def test_batches_documents_and_geometries_of_cached_applications(monkeypatch, example_crawler):
+    spider = example_crawler().spider
+    cursor = FakeCursor(rows=[("application-uuid", True)])
+    pipeline = make_pipeline(monkeypatch, cursor, batch_size=3)
+
+    pipeline.process_item(APPLICATION, spider)
+    pipeline.process_item(make_document("plans"), spider)
+    pipeline.process_item(GEOMETRY, spider)
+    assert cursor.batches == []
+
+    pipeline.process_item(make_document("elevations"), spider)
+    pipeline.process_item(make_document("decision"), spider)
+
+    # The application's uuid came from its upsert, so it's never SELECTed
+    assert len(cursor.executed) == 1
+    assert [[row[0] for row in batch] for batch in cursor.batches] == [["application-uuid"] * 2, ["application-uuid"]]
+    assert [row[-2] for row in cursor.batches[0]] == [make_document(name).url for name in ("plans", "elevations")]
+
+    pipeline.close_spider(spider)
+
+    assert [row[-2] for row in cursor.batches[-1]] == [make_document("decision").url]
+    assert pipeline.connection.commits == 3
+    assert spider.crawler.stats.get_value("postgres/uuid_cache/hits") == 4
+    assert spider.crawler.stats.get_value("postgres/uuid_cache/misses") == 0
+
+
+def test_writes_a_failed_batch_a_row_at_a_time(monkeypatch, example_crawler):
+    spider = example_crawler().spider
+    bad = make_document("bad")
+    cursor = FakeCursor(rows=[("application-uuid", True)], fail_batches=True, fail_on=bad.url)
+    pipeline = make_pipeline(monkeypatch, cursor, batch_size=100)
+
+    pipeline.process_item(APPLICATION, spider)
+    for item in (make_document("plans"), bad, make_document("decision"), GEOMETRY):
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+
+    written = cursor.executed[1:]
+    assert [row[-2] for row in written[:2]] == [make_document("plans").url, make_document("decision").url]
+    assert written[2] == ("application-uuid", GEOMETRY.reference, GEOMETRY.geometry)
+    # The batch, then the bad document
+    assert pipeline.connection.rollbacks == 2
+    assert pipeline.connection.commits == 4
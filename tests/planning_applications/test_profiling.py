@@ -0,0 +1,54 @@
+import pstats
+import sys
+import tracemalloc
+
+from scrapy import Request
+from scrapy.http.response.html import HtmlResponse
+
+from planning_applications.pipelines import ApplicationUuidCache
+from planning_applications.profiling import (
+    CallbackProfilingMiddleware,
+    allocations_by_project_code,
+    cpu_profile,
+    profiled_process_item,
+)
+
+
+class ExamplePipeline:
+    @profiled_process_item
+    def process_item(self, item, spider):
+        return item
+
+
+def test_profiles_callbacks_and_pipelines_by_spider(example_crawler):
+    crawler = example_crawler({"PROFILE": "cpu"})
+    spider = crawler.spider
+    middleware = CallbackProfilingMiddleware.from_crawler(crawler)
+    other_crawler = example_crawler({"PROFILE": "cpu"})
+
+    request = Request("https://planning.example.gov.uk/results", callback=spider.parse_results)
+    response = HtmlResponse(request.url, body=b"<html></html>", request=request)
+    for item in middleware.process_spider_output(response, spider.parse_results(response)):
+        ExamplePipeline().process_item(item, spider)
+
+    functions = {function for _, _, function in pstats.Stats(cpu_profile(crawler).profile).stats}
+    assert {"parse_results", "process_item"} <= functions
+    assert not cpu_profile(other_crawler).profile.getstats()
+
+
+def test_attributes_allocations_to_the_project_code_that_made_them():
+    references = [f"24/{number:05d}/FUL" for number in range(10_000)]
+    cache = ApplicationUuidCache(size=len(references))
+    tracemalloc.start(25)
+    try:
+        since = tracemalloc.take_snapshot()
+        for reference in references:
+            cache.put("example", reference, reference)
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    location, size, _ = allocations_by_project_code(snapshot, since, top_n=1)[0]
+
+    assert location.startswith("planning_applications/pipelines.py:")
+    assert size >= len(cache.uuids) * sys.getsizeof(("example", references[0]))
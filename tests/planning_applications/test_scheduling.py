@@ -0,0 +1,70 @@
+from datetime import date
+
+import pytest
+from scrapy.http.request import Request
+from scrapy.settings import Settings
+
+from planning_applications.scheduling import (
+    DEPTH_FIRST_STAGE_PRIORITIES,
+    RequestBudgetMiddleware,
+    RequestBudgetSpent,
+    SchedulingProfile,
+    StagePriorityMiddleware,
+    freshness_priority,
+)
+
+
+def test_spider_argument_picks_scheduling_profile(example_crawler):
+    crawler = example_crawler(scheduling_profile="depth_first")
+    settings = Settings({"SCHEDULING_PROFILE": "breadth_first", "DEPTH_PRIORITY": 1}, priority="project")
+
+    SchedulingProfile.from_crawler(crawler).update_settings(settings)
+
+    assert settings["SCHEDULING_PROFILE"] == "depth_first"
+    assert settings.getint("DEPTH_PRIORITY") == 0
+    assert settings["SCHEDULER_MEMORY_QUEUE"] == "scrapy.squeues.LifoMemoryQueue"
+
+
+def test_follow_on_stages_outrank_search_results(example_crawler):
+    crawler = example_crawler({"SCHEDULING_STAGE_PRIORITIES": DEPTH_FIRST_STAGE_PRIORITIES})
+    middleware = StagePriorityMiddleware.from_crawler(crawler)
+    requests = [
+        Request("https://example.com/next-page"),
+        Request("https://example.com/summary", meta={"stage": "summary"}),
+        Request("https://example.com/documents", meta={"stage": "documents"}),
+    ]
+
+    next_page, summary, documents = middleware.process_spider_output(None, requests)
+
+    assert next_page.priority < summary.priority < documents.priority
+
+
+def test_recent_windows_and_new_references_outrank_backfill():
+    today = date(2024, 6, 30)
+
+    this_week = freshness_priority(date(2024, 6, 30), False, today, horizon_days=28)
+    new_in_this_week = freshness_priority(date(2024, 6, 30), True, today, horizon_days=28)
+    last_month = freshness_priority(date(2024, 6, 10), False, today, horizon_days=28)
+    last_year = freshness_priority(date(2023, 6, 30), False, today, horizon_days=28)
+
+    assert new_in_this_week > this_week > last_month > last_year == 0
+
+
+def test_request_budget_keeps_reserve_for_recent_windows(monkeypatch, example_crawler):
+    monkeypatch.setattr(RequestBudgetMiddleware, "spent", 0)
+    crawler = example_crawler({"REQUEST_BUDGET": 10, "REQUEST_BUDGET_FRESH_RESERVE": 0.2})
+    middleware = RequestBudgetMiddleware.from_crawler(crawler)
+    backfill = Request("https://example.com/old-window", meta={"backfill": True})
+    fresh = Request("https://example.com/this-week", meta={"backfill": False})
+
+    for _ in range(8):
+        middleware.process_request(backfill)
+
+    with pytest.raises(RequestBudgetSpent):
+        middleware.process_request(backfill)
+
+    middleware.process_request(fresh)
+    middleware.process_request(fresh)
+
+    with pytest.raises(RequestBudgetSpent):
+        middleware.process_request(fresh)
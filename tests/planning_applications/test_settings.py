@@ -0,0 +1,62 @@
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+from scrapy.settings import Settings
+from scrapy.utils.test import get_crawler
+
+from planning_applications.extensions import LogProfile, RequiredSettings
+from shared.log import SamplingFilter
+
+
+def test_importing_needs_no_api_keys_or_optional_dependencies():
+    env = {k: v for k, v in os.environ.items() if k not in ("SCRAPEOPS_API_KEY", "ZYTE_API_KEY", "DATABASE_URL")}
+    code = (
+        "import sys, run_spiders, planning_applications.settings, planning_applications.pipelines, "
+        "planning_applications.spiders.lpas.wandsworth_single; "
+        "print(','.join(m for m in ('boto3', 'pyproj', 'scrapy_colorlog') if m in sys.modules))"
+    )
+
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
+
+
+def test_required_settings_stop_the_crawl():
+    crawler = get_crawler(settings_dict={"REQUIRED_SETTINGS": ["ZYTE_API_KEY"], "ZYTE_API_KEY": None})
+
+    with pytest.raises(ValueError, match="ZYTE_API_KEY is not set"):
+        RequiredSettings.from_crawler(crawler)
+
+
+def test_production_log_profile_quietens_logging():
+    settings = Settings({"LOG_PROFILE": "production", "LOG_LEVEL": "DEBUG", "COOKIES_DEBUG": True}, priority="project")
+
+    LogProfile().update_settings(settings)
+
+    assert settings["LOG_LEVEL"] == "INFO"
+    assert settings.getbool("COOKIES_DEBUG") is False
+    assert settings.getbool("LOG_SAMPLING_ENABLED") is True
+
+
+def test_sampling_filter_rate_limits_each_callback():
+    now = [0.0]
+    sampling_filter = SamplingFilter(burst=2, interval=60.0, rate=3, clock=lambda: now[0])
+
+    def record(func: str, level: int = logging.INFO) -> logging.LogRecord:
+        return logging.LogRecord("example", level, __file__, 1, "Found application: %s", ("shed",), None, func)
+
+    kept = [sampling_filter.filter(record("parse_results")) for _ in range(8)]
+
+    # The first two, then one in three
+    assert kept == [True, True, False, False, True, False, False, True]
+    assert sampling_filter.filter(record("parse_documents_tab"))
+    assert sampling_filter.filter(record("parse_results", logging.WARNING))
+    assert sampling_filter.dropped["example"] == 4
+
+    now[0] = 61.0
+    next_record = record("parse_results")
+    assert sampling_filter.filter(next_record)
+    assert "4 similar messages dropped" in next_record.getMessage()
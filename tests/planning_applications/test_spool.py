@@ -0,0 +1,203 @@
+import os
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+import psycopg
+import pytest
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+from scrapy.exceptions import NotConfigured
+
+from planning_applications import spool
+
+from planning_applications.items import (
+    PlanningApplication,
+    PlanningApplicationAppealDocument,
+    PlanningApplicationDocument,
+    PlanningApplicationGeometry,
+)
+from planning_applications.pipelines import PostgresPipeline
+from planning_applications.spool import (
+    SpoolPipeline,
+    load_segment,
+    parse_spool_line,
+    read_segment,
+    sealed_segments,
+    spool_line,
+)
+
+SCHEMA = Path(__file__).parents[2] / "db" / "db.sql"
+
+
+def make_application(number: int) -> PlanningApplication:
+    reference = f"24/{number:05d}/FUL"
+    return PlanningApplication(
+        lpa="example",
+        reference=reference,
+        website_reference=f"KEY{number}",
+        url=f"https://planning.example.gov.uk/{number}",
+        submitted_date=datetime(2024, 1, 2),
+        validated_date=datetime(2024, 1, 3),
+        address="1 High Street",
+        application_status="Pending",
+        is_active=True,
+        documents=[
+            PlanningApplicationDocument(
+                lpa="example",
+                application_reference=reference,
+                url=f"https://planning.example.gov.uk/{number}/plans.pdf",
+                date_published=datetime(2024, 1, 4),
+                document_type="Plans",
+            )
+        ],
+        geometry=PlanningApplicationGeometry(
+            lpa="example",
+            application_reference=reference,
+            reference=reference,
+            geometry='{"type": "Point", "coordinates": [0.1, 52.2]}',
+        ),
+    )
+
+
+def test_spools_items_to_segments_in_the_order_they_were_written(tmp_path, example_crawler):
+    crawler = example_crawler({"SPOOL_ENABLED": True, "SPOOL_DIR": str(tmp_path), "SPOOL_SEGMENT_BYTES": 2000})
+    spider = crawler.spider
+    pipeline = SpoolPipeline.from_crawler(crawler)
+    items = [make_application(number) for number in range(10)]
+    items.append(PlanningApplicationAppealDocument(appeal_case_id=1, reference="A/1", name="Decision", url="a.pdf"))
+
+    pipeline.open_spider(spider)
+    for item in items + [{"url": "not saved"}]:
+        pipeline.process_item(item, spider)
+    # The last segment isn't loaded until it's sealed
+    assert len(list((tmp_path / "example").glob("*.part"))) == 1
+    pipeline.close_spider(spider)
+
+    segments = sealed_segments(tmp_path)["example"]
+    assert len(segments) > 1
+    assert not list((tmp_path / "example").glob("*.part"))
+    assert [parse_spool_line(line) for path in segments for line in read_segment(path)] == items
+    assert crawler.stats.get_value("spool/items") == len(items)
+    assert crawler.stats.get_value("spool/segments") == len(segments)
+    assert crawler.stats.get_value("spool/bytes") == sum(path.stat().st_size for path in segments)
+
+
+def test_spooling_replaces_the_postgres_pipeline(example_crawler):
+    with pytest.raises(NotConfigured):
+        SpoolPipeline.from_crawler(example_crawler())
+
+    with pytest.raises(NotConfigured):
+        PostgresPipeline.from_crawler(example_crawler({"SPOOL_ENABLED": True}))
+
+
+class FakeConnection:
+    def transaction(self):
+        return nullcontext()
+
+    def cursor(self):
+        return nullcontext(object())
+
+
+def test_skips_segments_already_loaded(monkeypatch):
+    monkeypatch.setattr(spool, "claim_spool_segment", lambda cursor, name: False)
+    monkeypatch.setattr(spool, "copy_spooled_lines", pytest.fail)
+
+    load = load_segment(FakeConnection(), "example/1.jsonl.gz", [spool_line(make_application(1))])
+
+    assert load.already_loaded
+    assert load.rows == {}
+
+
+def test_loads_an_item_at_a_time_when_the_database_rejects_a_row(monkeypatch):
+    finished = []
+    monkeypatch.setattr(spool, "claim_spool_segment", lambda cursor, name: True)
+    monkeypatch.setattr(spool, "copy_spooled_lines", lambda cursor, lines: len(lines))
+    monkeypatch.setattr(spool, "finish_spool_segment", lambda cursor, *args: finished.append(args))
+
+    def merge_spooled_items(cursor):
+        raise psycopg.IntegrityError("null value in column")
+
+    def write_item(cursor, item):
+        if item.reference == "24/00002/FUL":
+            raise psycopg.DataError("invalid input syntax")
+        return ["planning_applications", "planning_application_documents"]
+
+    monkeypatch.setattr(spool, "merge_spooled_items", merge_spooled_items)
+    monkeypatch.setattr(spool, "write_item", write_item)
+    lines = [spool_line(make_application(number)) for number in range(1, 4)]
+
+    load = load_segment(FakeConnection(), "example/1.jsonl.gz", lines)
+
+    assert not load.already_loaded
+    assert load.rejected == 1
+    assert load.rows == {"planning_applications": 2, "planning_application_documents": 2}
+    assert finished == [("example/1.jsonl.gz", 3, 4)]
+
+
+@pytest.fixture
+def scratch_database():
+    """A scratch database with the schema in db/db.sql, on DATABASE_URL's server, dropped afterwards."""
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        pytest.skip("DATABASE_URL isn't set")
+
+    name = "planning_applications_test_spool"
+    with psycopg.connect(database_url, autocommit=True) as admin:
+        admin.execute(f'DROP DATABASE IF EXISTS "{name}"')
+        admin.execute(f'CREATE DATABASE "{name}"')
+    try:
+        with psycopg.connect(make_conninfo(**{**conninfo_to_dict(database_url), "dbname": name})) as connection:
+            connection.execute(SCHEMA.read_text())
+            connection.commit()
+            connection.autocommit = True
+            yield connection
+    finally:
+        with psycopg.connect(database_url, autocommit=True) as admin:
+            admin.execute(f'DROP DATABASE IF EXISTS "{name}"')
+
+
+def test_merges_a_segment_into_the_tables_once(scratch_database):
+    first, second = make_application(1), make_application(2)
+    updated = first.model_copy(update={"address": "2 High Street"})
+    document = PlanningApplicationDocument(
+        lpa="example",
+        application_reference=second.reference,
+        url="https://planning.example.gov.uk/2/decision.pdf",
+        date_published=datetime(2024, 2, 1),
+        document_type="Decision",
+    )
+    lines = [spool_line(item) for item in (first, second, updated, document)]
+
+    load = load_segment(scratch_database, "example/1.jsonl.gz", lines)
+    reloaded = load_segment(scratch_database, "example/1.jsonl.gz", lines)
+
+    assert (load.already_loaded, load.rejected) == (False, 0)
+    assert load.rows["planning_applications"] == 2
+    assert load.rows["planning_application_documents"] == 3
+    assert load.rows["planning_application_geometries"] == 2
+    assert reloaded.already_loaded
+    # The last of an application's items wins
+    assert scratch_database.execute(
+        "SELECT reference, address FROM planning_applications ORDER BY reference"
+    ).fetchall() == [
+        (first.reference, "2 High Street"),
+        (second.reference, "1 High Street"),
+    ]
+    assert scratch_database.execute("SELECT items, rows FROM spool_segments").fetchall() == [
+        (4, sum(load.rows.values()))
+    ]
+
+
+def test_loads_the_rest_of_a_segment_around_a_rejected_row(scratch_database):
+    application = make_application(1)
+    undated = PlanningApplicationDocument(
+        lpa="example", application_reference=application.reference, url="https://planning.example.gov.uk/1/undated.pdf"
+    )
+    lines = [spool_line(item) for item in (application, undated, make_application(2))]
+
+    load = load_segment(scratch_database, "example/1.jsonl.gz", lines)
+
+    assert load.rejected == 1
+    assert load.rows["planning_applications"] == 2
+    assert scratch_database.execute("SELECT count(*) FROM planning_application_documents").fetchone() == (2,)
+    assert scratch_database.execute("SELECT items FROM spool_segments").fetchone() == (3,)
@@ -0,0 +1,47 @@
+import pytest
+
+from run_spiders import order_by_expected_runtime, summarise_run_trends
+
+
+def test_orders_spiders_longest_expected_runtime_first():
+    elapsed_times = {"barnet": 120.0, "cambridge": 3600.0, "york": 600.0}
+
+    ordered = order_by_expected_runtime(["barnet", "cambridge", "new_council", "york"], elapsed_times)
+
+    assert ordered == ["new_council", "cambridge", "york", "barnet"]
+
+
+def test_summarises_throughput_and_cost_per_item_against_the_previous_window():
+    rows = [
+        {
+            "spider_name": "cambridge",
+            "runs": 4,
+            "items": 800,
+            "elapsed_seconds": 7200.0,
+            "p95_elapsed_seconds": 2400.0,
+            "requests": 4000,
+            "response_bytes": 80 * 1024 * 800,
+            "errors": 3,
+            "previous_items": 1000,
+            "previous_elapsed_seconds": 7200.0,
+        },
+        {
+            "spider_name": "york",
+            "runs": 0,
+            "items": None,
+            "elapsed_seconds": None,
+            "p95_elapsed_seconds": None,
+            "requests": None,
+            "response_bytes": None,
+            "errors": None,
+            "previous_items": 10,
+            "previous_elapsed_seconds": 60.0,
+        },
+    ]
+
+    (cambridge,) = summarise_run_trends(rows)
+
+    assert cambridge["items_per_hour"] == 400
+    assert cambridge["items_per_hour_change"] == pytest.approx(-0.2)
+    assert cambridge["requests_per_item"] == 5
+    assert cambridge["kb_per_item"] == 80